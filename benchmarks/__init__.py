@@ -0,0 +1,7 @@
+######################################################################################################################
+# Project...............: Yugioh Card Library
+# Author................: Ben Stearns
+# Date..................: 12-4-25
+# Project Description...: This application creates a digital database library for storing and managing Yugioh cards
+# File Description......: a blank file that tells python that the containing folder is a module that can be imported
+#######################################################################################################################
\ No newline at end of file
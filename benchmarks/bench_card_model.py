@@ -0,0 +1,88 @@
+######################################################################################################################
+# Project...............: Yugioh Card Library
+# Author................: Ben Stearns
+# Date..................: 12-4-25
+# Project Description...: This application creates a digital database library for storing and managing Yugioh cards
+# File Description......: benchmarks the slotted YugiohCard model against the plain row dictionaries the app used to
+#                         pass around, reporting the memory each cached card takes and the cost of converting cards
+#                         to and from rows and JSON
+#                         Run from the project root with: python -m benchmarks.bench_card_model [cards] [repeats]
+#######################################################################################################################
+
+import sys
+import time
+import tracemalloc
+
+from data_layer.Yugioh_Card import YugiohCard
+from utils.api_response import dumps
+
+#######################################################################################################################
+# Function that builds card rows shaped like the ones the database returns
+# Parameters: the number of rows
+# Returns: a list of row dictionaries
+#######################################################################################################################
+def make_rows(count):
+    return [{
+        "id": index + 1,
+        "name": f"Benchmark Card {index}",
+        "card_type": "Monster",
+        "monster_type": "Dragon",
+        "description": f"Benchmark card number {index} with a description of typical length.",
+        "attack": 100 * (index % 40),
+        "defense": 100 * (index % 30),
+        "attribute": "DARK",
+        "image_filename": f"{index:064x}.png",
+    } for index in range(count)]
+
+#######################################################################################################################
+# Function that measures the memory taken by a cache of cards, not counting the strings they share with the rows
+# Parameters: a function building the cached objects from the rows, and the rows
+# Returns: the bytes used per card
+#######################################################################################################################
+def memory_per_card(build, rows):
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    cache = {row["id"]: build(row) for row in rows}
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    used = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    del cache
+    return used / len(rows)
+
+#######################################################################################################################
+# Function that times a conversion over every item
+# Parameters: the conversion, the items and the number of times to repeat it
+# Returns: the average microseconds per item
+#######################################################################################################################
+def time_per_item(convert, items, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for item in items:
+            convert(item)
+    return (time.perf_counter() - start) / (repeats * len(items)) * 1e6
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    rows = make_rows(count)
+    cards = [YugiohCard.from_row(row) for row in rows]
+
+    print(f"{count} cards, {repeats} repeats\n")
+    print(f"{'memory per cached card':<28}{'dict':>10}{'YugiohCard':>12}")
+    print(f"{'bytes':<28}{memory_per_card(dict, rows):>10.0f}{memory_per_card(YugiohCard.from_row, rows):>12.0f}\n")
+
+    print(f"{'conversion':<28}{'us/card':>10}")
+    for label, convert, items in (
+        ("row -> dict copy", dict, rows),
+        ("row -> YugiohCard.from_row", YugiohCard.from_row, rows),
+        ("YugiohCard.to_row", YugiohCard.to_row, cards),
+        ("YugiohCard.to_dict", YugiohCard.to_dict, cards),
+        ("dict -> json", dumps, rows),
+        ("YugiohCard -> json", lambda card: dumps(card.to_dict()), cards),
+    ):
+        print(f"{label:<28}{time_per_item(convert, items, repeats):>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
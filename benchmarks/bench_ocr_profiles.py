@@ -0,0 +1,116 @@
+######################################################################################################################
+# Project...............: Yugioh Card Library
+# Author................: Ben Stearns
+# Date..................: 12-4-25
+# Project Description...: This application creates a digital database library for storing and managing Yugioh cards
+# File Description......: benchmarks the per-field OCR profiles against the generic configurations they replaced,
+#                         reporting the average latency and accuracy of each field on the sample cards
+#                         Run from the project root with: python -m benchmarks.bench_ocr_profiles [repeats]
+#######################################################################################################################
+
+import sys
+import time
+
+import pytesseract
+from PIL import Image
+
+from benchmarks.sample_truth import SAMPLE_CARDS, normalize, sample_paths
+from extractors.atkdef_extractor import fix_atkdef_labels, extract_atk_def_numbers
+from extractors.name_extractor import correct_chars_for_name
+from extractors.ocr_helpers import ocr_data, ocr_text_from_data
+from extractors.ocr_profiles import PROFILES, name_profile_config
+from extractors.type_extractor import match_monster_type
+from preprocessing.cropping import crop_regions
+from preprocessing.preprocess_atkdef import preprocess_atkdef
+from preprocessing.preprocess_description import preprocess_desc
+from preprocessing.preprocess_name import preprocess_name
+from preprocessing.preprocess_type import preprocess_type
+
+# the generic configurations the pipeline used before the field profiles
+BASELINE_CONFIGS = {
+    "name": "--psm 7",
+    "type": "--psm 7 -c tessedit_char_whitelist=ABCDEFGHIJKLMNOPQRSTUVWXYZ[]",
+    "description": "--psm 6",
+    "atkdef": "--psm 7",
+}
+
+# how each field's region is prepared for OCR
+PREPROCESSORS = {
+    "name": preprocess_name,
+    "type": preprocess_type,
+    "description": preprocess_desc,
+    "atkdef": preprocess_atkdef,
+}
+
+#######################################################################################################################
+# Function that runs OCR on one field and turns the output into the value the pipeline would save
+# Parameters: the field name, the preprocessed region and the tesseract configuration
+# Returns: the extracted value
+#######################################################################################################################
+def read_field(field, img, config):
+    if field == "atkdef":
+        raw = pytesseract.image_to_string(img, config=config).strip()
+        return extract_atk_def_numbers(fix_atkdef_labels(raw))
+    data = ocr_data(img, config=config)
+    if field == "name":
+        return correct_chars_for_name(ocr_text_from_data(data, min_conf=50))
+    if field == "type":
+        return match_monster_type(ocr_text_from_data(data, min_conf=45))
+    return ocr_text_from_data(data, min_conf=45)
+
+#######################################################################################################################
+# Function that checks an extracted value against the known value of the card
+# Parameters: the field name, the extracted value and the card's known values
+# Returns: True/False, or None when the field has no known value to compare against
+#######################################################################################################################
+def is_correct(field, value, truth):
+    if field == "name":
+        return normalize(value) == normalize(truth["name"])
+    if field == "type":
+        if not truth["monster_type"]:
+            return None
+        return normalize(value) == normalize(truth["monster_type"])
+    if field == "atkdef":
+        if truth["attack"] is None:
+            return None
+        return value == (truth["attack"], truth["defense"])
+    return None
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    samples = sample_paths()
+    results = {}  # (field, config label) -> {"seconds": [], "correct": int, "checked": int}
+
+    for path, truth in samples:
+        regions = crop_regions(Image.open(path))
+
+        # the name profile's user-words come from the rest of the library, never from the card being scanned
+        configs = {field: profile.config() for field, profile in PROFILES.items()}
+        configs["name"] = name_profile_config("bench", (card["name"] for card in SAMPLE_CARDS.values()
+                                                        if card is not truth))
+
+        for field, preprocess in PREPROCESSORS.items():
+            region = "description" if field == "description" else field
+            img = preprocess(regions[region])
+            for label, config in (("baseline", BASELINE_CONFIGS[field]), ("profile", configs[field])):
+                stats = results.setdefault((field, label), {"seconds": [], "correct": 0, "checked": 0})
+                for _ in range(repeats):
+                    start = time.perf_counter()
+                    value = read_field(field, img, config)
+                    stats["seconds"].append(time.perf_counter() - start)
+                correct = is_correct(field, value, truth)
+                if correct is not None:
+                    stats["checked"] += 1
+                    stats["correct"] += int(correct)
+
+    print(f"{len(samples)} sample cards, {repeats} repeat(s) per field\n")
+    print(f"{'field':<12} {'config':<9} {'avg ms':>8} {'accuracy':>10}")
+    for (field, label), stats in results.items():
+        average = sum(stats["seconds"]) / len(stats["seconds"]) * 1000
+        accuracy = f"{stats['correct']}/{stats['checked']}" if stats["checked"] else "n/a"
+        print(f"{field:<12} {label:<9} {average:>8.1f} {accuracy:>10}")
+
+
+if __name__ == "__main__":
+    main()
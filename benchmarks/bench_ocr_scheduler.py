@@ -0,0 +1,114 @@
+######################################################################################################################
+# Project...............: Yugioh Card Library
+# Author................: Ben Stearns
+# Date..................: 12-4-25
+# Project Description...: This application creates a digital database library for storing and managing Yugioh cards
+# File Description......: benchmarks how the cores are shared between concurrent OCR jobs. The sample cards are
+#                         scanned with every combination of concurrent jobs and tesseract threads per job (limited
+#                         through OMP_THREAD_LIMIT, or left to OpenMP's default of one per core), with and without
+#                         pinning each job to its own cores, and the throughput and latency of each are reported
+#                         Run from the project root with: python -m benchmarks.bench_ocr_scheduler [--repeats 2]
+#######################################################################################################################
+
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.sample_truth import sample_paths
+from tesseract import process_yugioh_card
+from utils.install_tesseract import ensure_tesseract
+from utils.ocr_scheduler import CoreLease, OcrScheduler, assigned_lease, available_cores, ocr_scheduler
+
+#######################################################################################################################
+# Function that lists the numbers of concurrent jobs worth comparing on this machine: 1, every power of two below
+# the core count, and the core count
+# Parameters: the number of cores
+# Returns: a sorted list of job counts
+#######################################################################################################################
+def job_counts(cores):
+    counts = {1, cores}
+    count = 2
+    while count < cores:
+        counts.add(count)
+        count *= 2
+    return sorted(counts)
+
+#######################################################################################################################
+# Function that lists the configurations to compare
+# Parameters: the cores, the job counts and whether to include pinned configurations
+# Returns: a list of (jobs, threads per job, pinned) tuples. threads of None leaves tesseract unlimited
+#######################################################################################################################
+def configurations(cores, jobs_list, pin):
+    configs = []
+    for jobs in jobs_list:
+        shares = sorted({1, max(1, len(cores) // jobs)})
+        configs.append((jobs, None, False))
+        configs.extend((jobs, threads, False) for threads in shares)
+        if pin:
+            configs.extend((jobs, threads, True) for threads in shares if threads * jobs <= len(cores))
+    return configs
+
+#######################################################################################################################
+# Function that scans every sample card repeatedly with a configuration
+# Parameters: the sample paths, the number of times each card is scanned, the cores and the configuration
+# Returns: a tuple of (cards per second, average milliseconds per card)
+#######################################################################################################################
+def run_configuration(paths, repeats, cores, jobs, threads, pinned):
+    scheduler = OcrScheduler(cores, jobs, threads_per_job=threads, pin=pinned)
+    latencies = []
+
+    def scan(path):
+        start = time.perf_counter()
+        if threads is None:
+            with assigned_lease(CoreLease(None)):
+                process_yugioh_card(path)
+        else:
+            with scheduler.job():
+                process_yugioh_card(path)
+        latencies.append(time.perf_counter() - start)
+
+    work = [path for path in paths for _ in range(repeats)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        list(pool.map(scan, work))
+    elapsed = time.perf_counter() - start
+    return len(work) / elapsed, sum(latencies) / len(latencies) * 1000
+
+
+def main():
+    cores = available_cores()
+    parser = argparse.ArgumentParser(description="Compare OCR throughput for each way of sharing the cores.")
+    parser.add_argument("--repeats", type=int, default=2, help="times each sample card is scanned per configuration")
+    parser.add_argument("--jobs", default=None, help="comma separated job counts (default: 1, powers of two, cores)")
+    parser.add_argument("--no-pin", action="store_true", help="skip the pinned configurations")
+    args = parser.parse_args()
+
+    if ensure_tesseract() is None:
+        print("tesseract isn't installed, so there's nothing to benchmark")
+        return
+
+    paths = [path for path, _ in sample_paths()]
+    jobs_list = [int(jobs) for jobs in args.jobs.split(",")] if args.jobs else job_counts(len(cores))
+    configs = configurations(cores, jobs_list, pin=not args.no_pin and hasattr(os, "sched_setaffinity"))
+
+    # warm up tesseract's models and the OS file cache so the first configuration isn't penalized
+    process_yugioh_card(paths[0])
+
+    print(f"{len(paths)} sample cards x {args.repeats} repeat(s) on {len(cores)} core(s)\n")
+    print(f"{'jobs':>5} {'threads':>8} {'pinned':>7} {'cards/s':>9} {'ms/card':>9}")
+    results = []
+    for jobs, threads, pinned in configs:
+        throughput, latency = run_configuration(paths, args.repeats, cores, jobs, threads, pinned)
+        results.append((throughput, jobs, threads, pinned))
+        print(f"{jobs:>5} {threads or 'all':>8} {'yes' if pinned else 'no':>7} {throughput:>9.2f} {latency:>9.1f}")
+
+    best = max(results, key=lambda result: result[0])
+    default = ocr_scheduler.max_jobs, ocr_scheduler.threads_per_job, ocr_scheduler.pin
+    print(f"\nfastest: {best[1]} job(s) x {best[2] or 'all'} thread(s){', pinned' if best[3] else ''}")
+    print(f"app default: {default[0]} job(s) x {default[1]} thread(s){', pinned' if default[2] else ''} "
+          f"(set OCR_MAX_CONCURRENT, OCR_THREADS_PER_JOB and OCR_PIN_CPUS to change it)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+######################################################################################################################
+# Project...............: Yugioh Card Library
+# Author................: Ben Stearns
+# Date..................: 12-4-25
+# Project Description...: This application creates a digital database library for storing and managing Yugioh cards
+# File Description......: benchmarks how preprocessed regions are handed to tesseract. For every region of the sample
+#                         cards it reports the time spent encoding and decoding the image as a temporary PNG file
+#                         (pytesseract's way) and as uncompressed PNM in memory, and, when tesseract is installed,
+#                         the full OCR call through each transport
+#                         Run from the project root with: python -m benchmarks.bench_ocr_transport [repeats]
+#######################################################################################################################
+
+import io
+import os
+import sys
+import tempfile
+import time
+
+from PIL import Image
+
+from benchmarks.sample_truth import sample_paths
+from extractors.ocr_profiles import PROFILES
+from extractors.ocr_transport import TRANSPORTS, encode_pnm, image_to_data
+from preprocessing.cropping import crop_regions
+from preprocessing.preprocess_atkdef import preprocess_atkdef
+from preprocessing.preprocess_description import preprocess_desc
+from preprocessing.preprocess_name import preprocess_name
+from preprocessing.preprocess_type import preprocess_type
+from utils.install_tesseract import ensure_tesseract
+
+# how each field's region is prepared for OCR
+PREPROCESSORS = {
+    "name": preprocess_name,
+    "type": preprocess_type,
+    "description": preprocess_desc,
+    "atkdef": preprocess_atkdef,
+}
+
+#######################################################################################################################
+# Function that times a function over several repeats
+# Parameters: the function and the number of repeats
+# Returns: the average milliseconds per call
+#######################################################################################################################
+def average_ms(function, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        function()
+    return (time.perf_counter() - start) / repeats * 1000
+
+#######################################################################################################################
+# Function that times saving a region as a temporary PNG file and decoding it again, like pytesseract and tesseract do
+# Parameters: the preprocessed region and the number of repeats
+# Returns: a tuple of (encode ms, decode ms, file size in bytes)
+#######################################################################################################################
+def time_png(img, repeats):
+    fd, path = tempfile.mkstemp(suffix=".png")
+    os.close(fd)
+    try:
+        encode = average_ms(lambda: img.save(path, format="PNG"), repeats)
+        decode = average_ms(lambda: Image.open(path).load(), repeats)
+        return encode, decode, os.path.getsize(path)
+    finally:
+        os.remove(path)
+
+#######################################################################################################################
+# Function that times encoding a region as PNM in memory and decoding it again
+# Parameters: the preprocessed region and the number of repeats
+# Returns: a tuple of (encode ms, decode ms, size in bytes)
+#######################################################################################################################
+def time_pnm(img, repeats):
+    data = encode_pnm(img)
+    encode = average_ms(lambda: encode_pnm(img), repeats)
+    decode = average_ms(lambda: Image.open(io.BytesIO(data)).load(), repeats)
+    return encode, decode, len(data)
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    samples = sample_paths()
+    has_tesseract = ensure_tesseract() is not None
+    results = {}  # field -> list of per-region measurements
+
+    for path, _ in samples:
+        regions = crop_regions(Image.open(path).convert("RGB"))
+        for field, preprocess in PREPROCESSORS.items():
+            img = preprocess(regions[field])
+            png = time_png(img, repeats)
+            pnm = time_pnm(img, repeats)
+            ocr = {}
+            if has_tesseract:
+                config = PROFILES[field].config()
+                for transport in TRANSPORTS:
+                    ocr[transport] = average_ms(lambda: image_to_data(img, config, transport), repeats)
+            results.setdefault(field, []).append((png, pnm, ocr))
+
+    print(f"{len(samples)} sample cards, {repeats} repeat(s) per region\n")
+    print(f"{'field':<12} {'png enc':>8} {'png dec':>8} {'png KB':>7} {'pnm enc':>8} {'pnm dec':>8} {'pnm KB':>7} "
+          f"{'saved ms':>9}")
+    for field, measurements in results.items():
+        count = len(measurements)
+        png = [sum(m[0][i] for m in measurements) / count for i in range(3)]
+        pnm = [sum(m[1][i] for m in measurements) / count for i in range(3)]
+        saved = png[0] + png[1] - pnm[0] - pnm[1]
+        print(f"{field:<12} {png[0]:>8.2f} {png[1]:>8.2f} {png[2] / 1024:>7.1f} {pnm[0]:>8.2f} {pnm[1]:>8.2f} "
+              f"{pnm[2] / 1024:>7.1f} {saved:>9.2f}")
+
+    if not has_tesseract:
+        print("\ntesseract isn't installed, so the full OCR calls weren't timed")
+        return
+
+    print(f"\n{'field':<12}" + "".join(f"{transport + ' ms':>12}" for transport in TRANSPORTS))
+    for field, measurements in results.items():
+        averages = [sum(m[2][transport] for m in measurements) / len(measurements) for transport in TRANSPORTS]
+        print(f"{field:<12}" + "".join(f"{average:>12.1f}" for average in averages))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+######################################################################################################################
+# Project...............: Yugioh Card Library
+# Author................: Ben Stearns
+# Date..................: 12-4-25
+# Project Description...: This application creates a digital database library for storing and managing Yugioh cards
+# File Description......: load tests the web app against the in-memory Supabase stand-in. A number of simulated users
+#                         send a weighted mix of /library, /view, /edit and /scan requests, and the throughput and
+#                         p50/p95/p99 latency of every route is reported. With --owners the cards are spread over
+#                         that many collections and every request picks one, to compare many collectors with one
+#                         Run from the project root with: python -m benchmarks.load_test [options]
+#######################################################################################################################
+
+import argparse                         # for the command line options
+import json                             # for the optional JSON report
+import math                             # for nearest-rank percentiles
+import os                               # for configuring the stand-in through environment variables
+import random                           # for picking routes and cards
+import shutil                           # for removing the temporary upload folder
+import tempfile                         # for keeping scanned images out of static/images/cards
+import threading                        # for the simulated users
+import time                             # for timing requests
+from io import BytesIO                  # for uploading sample images
+
+from benchmarks.sample_truth import sample_paths
+from utils.constants import KNOWN_ATTRIBUTES, KNOWN_TYPES
+
+# the default share of requests sent to each route
+DEFAULT_MIX = "library=50,view=35,edit=10,scan=5"
+
+# query strings a user might send to the library page
+LIBRARY_QUERIES = ["", "", "?card_type=Monster", "?attribute=DARK", "?atk_min=2000&sort=-attack",
+                   "?card_type=Spell", "?def_max=1000&sort=defense"]
+
+#######################################################################################################################
+# Function that parses a traffic mix like "library=50,view=35"
+# Parameters: the mix string
+# Returns: a dictionary of route name -> weight
+# Raises: ValueError for unknown routes or weights that aren't numbers
+#######################################################################################################################
+def parse_mix(raw):
+    mix = {}
+    for part in raw.split(","):
+        route, _, weight = part.partition("=")
+        route = route.strip()
+        if route not in ROUTES:
+            raise ValueError(f"Unknown route '{route}'. Choose from {', '.join(ROUTES)}")
+        mix[route] = float(weight)
+    return {route: weight for route, weight in mix.items() if weight > 0}
+
+#######################################################################################################################
+# Function that builds the synthetic cards the stand-in is seeded with
+# Parameters: how many cards to build and the owner of their collection
+# Returns: a list of card dictionaries
+#######################################################################################################################
+def make_cards(count, owner_id):
+    rng = random.Random(42)         # fixed seed so every run loads the same library
+    cards = []
+    for number in range(count):
+        card_type = rng.choices(["Monster", "Spell", "Trap"], weights=[6, 2, 2])[0]
+        is_monster = card_type == "Monster"
+        cards.append({
+            "owner_id": owner_id,
+            "name": f"Load Test Card {number:05d}",
+            "card_type": card_type,
+            "monster_type": rng.choice(KNOWN_TYPES) if is_monster else "",
+            "description": "A card generated for load testing. " * rng.randint(1, 6),
+            "attack": rng.randrange(0, 4100, 100) if is_monster else None,
+            "defense": rng.randrange(0, 4100, 100) if is_monster else None,
+            "attribute": rng.choice(KNOWN_ATTRIBUTES) if is_monster else card_type.upper(),
+            "image_filename": None,
+        })
+    return cards
+
+#######################################################################################################################
+# Functions that send one request of each route on behalf of a simulated user
+# Parameters: the user's Flask test client and random generator, the seeded cards, and the sample images to scan
+# Returns: the response
+#######################################################################################################################
+def library_request(client, rng, cards, samples):
+    return client.get("/library" + rng.choice(LIBRARY_QUERIES))
+
+
+def view_request(client, rng, cards, samples):
+    return client.get(f"/view/{rng.choice(cards)['id']}")
+
+
+def edit_request(client, rng, cards, samples):
+    card = rng.choice(cards)
+    form = {key: "" if value is None else str(value) for key, value in card.items() if key not in ("id", "owner_id")}
+    form["description"] = f"Edited during load testing ({rng.randint(0, 10 ** 6)})."
+    return client.post(f"/edit/{card['id']}", data=form)
+
+
+def scan_request(client, rng, cards, samples):
+    name, data = rng.choice(samples)
+    return client.post("/scan", data={"card_image": (BytesIO(data), name)}, content_type="multipart/form-data")
+
+
+# every route the load test can send, by name
+ROUTES = {
+    "library": library_request,
+    "view": view_request,
+    "edit": edit_request,
+    "scan": scan_request,
+}
+
+#######################################################################################################################
+# Function that returns the nearest-rank percentile of a sorted list
+# Parameters: the sorted values and the percentile (0-100)
+# Returns: the value, or 0.0 for an empty list
+#######################################################################################################################
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    return values[max(math.ceil(pct / 100 * len(values)) - 1, 0)]
+
+#######################################################################################################################
+# Function that summarizes the timings collected for each route
+# Parameters: a dictionary of route -> list of (seconds, status code), and the wall clock length of the test
+# Returns: a dictionary of route -> statistics, with an "all" entry for every request together
+#######################################################################################################################
+def summarize(results, elapsed):
+    every = [sample for samples in results.values() for sample in samples]
+    report = {}
+    for route, samples in list(sorted(results.items())) + [("all", every)]:
+        timings = sorted(seconds * 1000 for seconds, _ in samples)
+        statuses = {}
+        for _, status in samples:
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+        report[route] = {
+            "requests": len(samples),
+            "throughput_rps": round(len(samples) / elapsed, 2) if elapsed else 0.0,
+            "p50_ms": round(percentile(timings, 50), 2),
+            "p95_ms": round(percentile(timings, 95), 2),
+            "p99_ms": round(percentile(timings, 99), 2),
+            "max_ms": round(timings[-1], 2) if timings else 0.0,
+            "statuses": dict(sorted(statuses.items())),
+        }
+    return report
+
+#######################################################################################################################
+# Function that prints the report as a table
+# Parameters: the report from summarize(), the command line settings, the test length and stand-in round trips
+# Returns: void
+#######################################################################################################################
+def print_report(report, args, elapsed, round_trips):
+    print(f"\n{args.requests} requests from {args.users} users to {args.owners} collection(s) in {elapsed:.2f}s "
+          f"(database latency {args.latency_ms}ms + up to {args.jitter_ms}ms jitter, "
+          f"{round_trips} round trips, {round_trips / max(args.requests, 1):.2f} per request)\n")
+    print(f"{'route':<10}{'requests':>10}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}"
+          f"  statuses")
+    for route, stats in report.items():
+        statuses = " ".join(f"{status}x{count}" for status, count in stats["statuses"].items())
+        print(f"{route:<10}{stats['requests']:>10}{stats['throughput_rps']:>10}{stats['p50_ms']:>10}"
+              f"{stats['p95_ms']:>10}{stats['p99_ms']:>10}{stats['max_ms']:>10}  {statuses}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the web app against an in-memory Supabase stand-in")
+    parser.add_argument("--requests", type=int, default=500, help="total number of requests to send")
+    parser.add_argument("--users", type=int, default=8, help="number of simulated users sending at once")
+    parser.add_argument("--cards", type=int, default=200, help="number of cards each collection is seeded with")
+    parser.add_argument("--owners", type=int, default=1, help="number of collections to spread requests over")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"share of each route (default {DEFAULT_MIX})")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="simulated database round trip")
+    parser.add_argument("--jitter-ms", type=float, default=10.0, help="random extra latency per round trip")
+    parser.add_argument("--seed", type=int, default=1, help="seed for the simulated users' choices")
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+    mix = parse_mix(args.mix)
+
+    # the stand-in is chosen when the client module is first imported, so configure it before importing the app
+    os.environ["SUPABASE_FAKE"] = "1"
+    os.environ["SUPABASE_FAKE_LATENCY_MS"] = str(args.latency_ms)
+    os.environ["SUPABASE_FAKE_JITTER_MS"] = str(args.jitter_ms)
+    # the simulated users pick their collection with the owner header, like users behind a sign-in proxy
+    os.environ["TRUST_OWNER_HEADER"] = "1"
+    from data_layer.supabase_client import supabase
+    from main import app
+
+    # seed the collections without any simulated latency
+    latency_ms, supabase.latency_ms, supabase.jitter_ms = supabase.latency_ms, 0, 0
+    owners = ["default"] + [f"collector-{number}" for number in range(1, args.owners)]
+    collections = {owner: supabase.table("cards").insert(make_cards(args.cards, owner)).execute().data
+                   for owner in owners}
+    supabase.latency_ms, supabase.jitter_ms = latency_ms, args.jitter_ms
+    supabase.requests = 0
+
+    samples = []
+    for path, _ in sample_paths():
+        with open(path, "rb") as file:
+            samples.append((os.path.basename(path), file.read()))
+    if "scan" in mix and not samples:
+        raise SystemExit("No sample images found for scan traffic")
+
+    # scanned images go to a temporary folder instead of the real upload folder
+    upload_folder = tempfile.mkdtemp(prefix="load_test_")
+    app.config["UPLOAD_FOLDER"] = upload_folder
+
+    routes, weights = list(mix), list(mix.values())
+    results = {route: [] for route in routes}
+    results_lock = threading.Lock()
+    remaining = [args.requests]
+
+    # one simulated user: keeps sending requests until the shared budget runs out
+    def user(number):
+        rng = random.Random(args.seed * 1000 + number)
+        client = app.test_client()
+        while True:
+            with results_lock:
+                if remaining[0] <= 0:
+                    return
+                remaining[0] -= 1
+            route = rng.choices(routes, weights=weights)[0]
+            owner = rng.choice(owners)
+            client.environ_base["HTTP_X_OWNER_ID"] = owner
+            start = time.perf_counter()
+            try:
+                status = ROUTES[route](client, rng, collections[owner], samples).status_code
+            except Exception as e:
+                status = type(e).__name__
+            seconds = time.perf_counter() - start
+            with results_lock:
+                results[route].append((seconds, status))
+
+    threads = [threading.Thread(target=user, args=(number,)) for number in range(args.users)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    shutil.rmtree(upload_folder, ignore_errors=True)
+
+    report = summarize(results, elapsed)
+    print_report(report, args, elapsed, supabase.requests)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump({"settings": vars(args), "elapsed_seconds": round(elapsed, 3), "routes": report}, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
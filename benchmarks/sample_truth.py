@@ -0,0 +1,60 @@
+######################################################################################################################
+# Project...............: Yugioh Card Library
+# Author................: Ben Stearns
+# Date..................: 12-4-25
+# Project Description...: This application creates a digital database library for storing and managing Yugioh cards
+# File Description......: defines the known correct values of the cards in the samples folder, so benchmarks can
+#                         measure OCR accuracy as well as speed
+#######################################################################################################################
+
+import os
+import re
+
+# defines the folder holding the sample card images
+SAMPLES_DIR = "samples"
+
+# the values printed on each sample card. attack/defense of None means the card has none (or shows "?")
+SAMPLE_CARDS = {
+    "blue_eyes.png": {"name": "Blue-Eyes White Dragon", "attribute": "LIGHT", "monster_type": "DRAGON",
+                      "attack": 3000, "defense": 2500},
+    "change_of_heart.jpg": {"name": "Change of Heart", "attribute": "SPELL", "monster_type": "",
+                            "attack": None, "defense": None},
+    "crush_card.jpg": {"name": "Crush Card Virus", "attribute": "TRAP", "monster_type": "",
+                       "attack": None, "defense": None},
+    "dark_magician.png": {"name": "Dark Magician", "attribute": "DARK", "monster_type": "SPELLCASTER",
+                          "attack": 2500, "defense": 2100},
+    "dark_magician_girl.jpg": {"name": "Dark Magician Girl", "attribute": "DARK", "monster_type": "SPELLCASTER",
+                               "attack": 2000, "defense": 1700},
+    "dark_paladin.jpg": {"name": "Dark Paladin", "attribute": "DARK", "monster_type": "SPELLCASTER",
+                         "attack": 2900, "defense": 2400},
+    "kuriboh.jpg": {"name": "Kuriboh", "attribute": "DARK", "monster_type": "FIEND",
+                    "attack": 300, "defense": 200},
+    "mirror_force.png": {"name": "Mirror Force", "attribute": "TRAP", "monster_type": "",
+                         "attack": None, "defense": None},
+    "obelisk.jpg": {"name": "Obelisk the Tormentor", "attribute": "DIVINE", "monster_type": "DIVINE-BEAST",
+                    "attack": 4000, "defense": 4000},
+    "pot_of_greed.jpg": {"name": "Pot of Greed", "attribute": "SPELL", "monster_type": "",
+                         "attack": None, "defense": None},
+    "ra.jpg": {"name": "The Winged Dragon of Ra", "attribute": "DIVINE", "monster_type": "DIVINE-BEAST",
+               "attack": None, "defense": None},
+    "raigeki.png": {"name": "Raigeki", "attribute": "SPELL", "monster_type": "",
+                    "attack": None, "defense": None},
+    "slifer.jpg": {"name": "Slifer the Sky Dragon", "attribute": "DIVINE", "monster_type": "DIVINE-BEAST",
+                   "attack": None, "defense": None},
+}
+
+#######################################################################################################################
+# Function that normalizes text so OCR output and known values can be compared regardless of case and punctuation
+# Parameters: the text to normalize
+# Returns: upper case letters and digits only
+#######################################################################################################################
+def normalize(text):
+    return re.sub(r"[^A-Z0-9]", "", str(text or "").upper())
+
+#######################################################################################################################
+# Function that lists the sample images that have known values
+# Returns: a list of (filepath, known values) tuples
+#######################################################################################################################
+def sample_paths():
+    return [(os.path.join(SAMPLES_DIR, filename), truth) for filename, truth in sorted(SAMPLE_CARDS.items())
+            if os.path.exists(os.path.join(SAMPLES_DIR, filename))]
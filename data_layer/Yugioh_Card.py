@@ -3,24 +3,146 @@
 # Author................: Ben Stearns
 # Date..................: 12-4-25
 # Project Description...: This application creates a digital database library for storing and managing Yugioh cards
-# File Description......: defines the class structure for a Yugioh card object
+# File Description......: defines the class structure for a Yugioh card object. It is slotted (no per-card __dict__)
+#                         since the library cache holds every card in memory, validates cards built from user input,
+#                         and converts to and from database rows and JSON
 #######################################################################################################################
 
+# the card types a card can have
+CARD_TYPES = ("Monster", "Spell", "Trap")
+
+# the longest name and description the cards table accepts (name VARCHAR(32), description VARCHAR(500))
+NAME_MAX_LENGTH = 32
+DESCRIPTION_MAX_LENGTH = 500
+
+#######################################################################################################################
+# Function that converts a stat from a form, OCR or the database to a whole number
+# Parameters: the value and the stat's name for error messages
+# Returns: the number, or None for blanks
+# Raises: ValueError if the value isn't a whole number
+#######################################################################################################################
+def to_stat(value, label):
+    if value is None or isinstance(value, int):
+        return value
+    value = str(value).strip()
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"{label} must be a whole number")
+
+#######################################################################################################################
+# Function that cleans an optional text value
+# Parameters: the value
+# Returns: the stripped text, or None for blanks
+#######################################################################################################################
+def to_text(value):
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
 class YugiohCard:
-    # constructor for instantiating a Yugioh card object
+    # the card's fields, in the same order as the columns of the cards table
+    __slots__ = ("id", "name", "card_type", "monster_type", "description", "attack", "defense", "attribute",
+                 "image_filename")
+
+    # the fields saved to the database (the id is assigned by the database)
+    ROW_FIELDS = __slots__[1:]
+
+    # constructor for instantiating a Yugioh card object. text is stripped and ATK/DEF are converted to numbers
     def __init__(self,name,card_type,description,monster_type=None,attribute=None,
-                 attack=None,defense=None,image_filename=None):
-        self.name = name
-        self.description = description
-        self.attack = attack
-        self.defense = defense
-        self.card_type = card_type
-        self.attribute = attribute
-        self.monster_type = monster_type
-        self.image_filename = image_filename
+                 attack=None,defense=None,image_filename=None,id=None):
+        self.id = id
+        self.name = (name or "").strip()
+        self.description = (description or "").strip()
+        self.attack = to_stat(attack, "ATK")
+        self.defense = to_stat(defense, "DEF")
+        self.card_type = (card_type or "").strip()
+        self.attribute = to_text(attribute)
+        self.monster_type = to_text(monster_type)
+        self.image_filename = to_text(image_filename)
+
+    ###################################################################################################################
+    # Function that builds a card from a row the database returned. rows are already clean, so the constructor's
+    # conversions are skipped to keep loading the whole library cheap
+    # Parameters: the row dictionary (columns that weren't selected are left as None)
+    # Returns: the card
+    ###################################################################################################################
+    @classmethod
+    def from_row(cls, row):
+        card = cls.__new__(cls)
+        for field in cls.__slots__:
+            setattr(card, field, row.get(field))
+        return card
+
+    ###################################################################################################################
+    # Function that builds and validates a card from a submitted form
+    # Parameters: the form, an optional suffix on every field name (ex: "-3" for the fourth card of a sheet), and the
+    #             image filename and id to give the card
+    # Returns: the card
+    # Raises: ValueError with a message for the user if a field is missing or invalid
+    ###################################################################################################################
+    @classmethod
+    def from_form(cls, form, suffix="", image_filename=None, id=None):
+        card = cls(
+            name=form.get(f"name{suffix}"),
+            card_type=form.get(f"card_type{suffix}"),
+            description=form.get(f"description{suffix}"),
+            monster_type=form.get(f"monster_type{suffix}"),
+            attribute=form.get(f"attribute{suffix}"),
+            attack=form.get(f"attack{suffix}"),
+            defense=form.get(f"defense{suffix}"),
+            image_filename=image_filename,
+            id=id,
+        )
+        card.validate()
+        return card
+
+    ###################################################################################################################
+    # Function that checks the card against the rules of the cards table
+    # Returns: void
+    # Raises: ValueError with a message for the user if a field is missing or invalid
+    ###################################################################################################################
+    def validate(self):
+        if not self.name:
+            raise ValueError("Please enter the card's name")
+        if len(self.name) > NAME_MAX_LENGTH:
+            raise ValueError(f"Card names can be at most {NAME_MAX_LENGTH} characters")
+        if self.card_type not in CARD_TYPES:
+            raise ValueError(f"Please choose a card type ({', '.join(CARD_TYPES)})")
+        if len(self.description) > DESCRIPTION_MAX_LENGTH:
+            raise ValueError(f"Descriptions can be at most {DESCRIPTION_MAX_LENGTH} characters")
+        for label, stat in (("ATK", self.attack), ("DEF", self.defense)):
+            if stat is not None and stat < 0:
+                raise ValueError(f"{label} can't be negative")
+
+    ###################################################################################################################
+    # Function that converts the card to a row for inserting or updating
+    # Returns: a dictionary of every column except the id
+    ###################################################################################################################
+    def to_row(self):
+        return {field: getattr(self, field) for field in self.ROW_FIELDS}
+
+    ###################################################################################################################
+    # Function that converts the card to a dictionary for JSON responses
+    # Parameters: optional list of the fields to include (defaults to every field)
+    # Returns: the dictionary
+    ###################################################################################################################
+    def to_dict(self, fields=None):
+        return {field: getattr(self, field) for field in (fields or self.__slots__)}
+
+    # cards are equal when every field is equal
+    def __eq__(self, other):
+        if not isinstance(other, YugiohCard):
+            return NotImplemented
+        return all(getattr(self, field) == getattr(other, field) for field in self.__slots__)
 
     # define a function to return a string-friendly representation of a card object for debugging purposes if needed
     def __repr__(self):
-        return (f"YugiohCard(name='{self.name}', card_type='{self.card_type}', description='{self.description}', "
-                f"attribute='{self.attribute}, monster_type='{self.monster_type}', "
-                f"ATK={self.attack}, DEF={self.defense}', image_filename='{self.image_filename}')")
\ No newline at end of file
+        return (f"YugiohCard(id={self.id}, name='{self.name}', card_type='{self.card_type}', "
+                f"description='{self.description}', attribute='{self.attribute}', "
+                f"monster_type='{self.monster_type}', ATK={self.attack}, DEF={self.defense}, "
+                f"image_filename='{self.image_filename}')")
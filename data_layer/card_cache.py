@@ -0,0 +1,161 @@
+######################################################################################################################
+# Project...............: Yugioh Card Library
+# Author................: Ben Stearns
+# Date..................: 12-4-25
+# Project Description...: This application creates a digital database library for storing and managing Yugioh cards
+# File Description......: defines the in-memory cache of the whole library as YugiohCard objects. It is loaded from
+#                         the database the first time it's needed and kept current by every write, replacing the copy
+#                         of the library that used to be kept in each user's session cookie. Each owner's collection
+#                         has its own cache. Writes made by other copies of the app (or outside it) are picked up by
+#                         syncing the cache with the cards whose row_version is newer than the cache's version
+#######################################################################################################################
+
+import threading                        # for guarding the cache against concurrent requests
+import time                             # for spacing out the syncs with the database
+
+from data_layer.Yugioh_Card import YugiohCard
+from data_layer.owners import OwnerPartitions
+
+
+class CardCache:
+    # constructor for an empty cache. it is filled by ensure_loaded() and kept current by upsert() and remove()
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.loaded = False
+        self._cards = {}                # card id -> YugiohCard
+        self._by_name = None            # the cards ordered by name, rebuilt on first use after a write
+        self._by_image = None           # image filename -> the cards using it, rebuilt on first use after a write
+        self.version = 0                # the highest database row_version the cache has seen
+        self._synced_at = 0.0           # when the cache was last loaded or synced (time.monotonic)
+
+    ###################################################################################################################
+    # Function that loads the cache from the database the first time it's needed
+    # Parameters: a function returning every card row (with its row_version)
+    # Returns: void
+    ###################################################################################################################
+    def ensure_loaded(self, loader):
+        # the lock is held while querying so a write that lands during the load waits and is applied afterwards
+        with self._lock:
+            if self.loaded:
+                return
+            rows = loader()
+            self._cards = {row["id"]: YugiohCard.from_row(row) for row in rows}
+            self._by_name = self._by_image = None
+            self.version = max((row.get("row_version") or 0 for row in rows), default=0)
+            self._synced_at = time.monotonic()
+            self.loaded = True
+
+    ###################################################################################################################
+    # Function that starts a sync with the database if the last one is old enough. only one request syncs at a time,
+    # and the others keep using the cache as it is meanwhile
+    # Parameters: how many seconds the cache is trusted for after a load or sync
+    # Returns: the version to ask for changes since, or None if no sync is due
+    ###################################################################################################################
+    def begin_sync(self, max_age):
+        with self._lock:
+            now = time.monotonic()
+            if not self.loaded or now - self._synced_at < max_age:
+                return None
+            self._synced_at = now
+            return self.version
+
+    ###################################################################################################################
+    # Function that records the version a sync brought the cache up to. the changes themselves are applied with
+    # upsert() and remove() like any other write. writes made through this app don't move the version, since cards
+    # written by others with lower versions may not have been seen yet
+    # Parameters: the version returned with the last page of changes
+    # Returns: void
+    ###################################################################################################################
+    def finish_sync(self, version):
+        with self._lock:
+            if self.loaded:
+                self.version = max(self.version, version)
+
+    ###################################################################################################################
+    # Function that drops the cache so the next use reloads it from the database
+    # Returns: void
+    ###################################################################################################################
+    def invalidate(self):
+        with self._lock:
+            self.loaded = False
+            self._cards = {}
+            self._by_name = self._by_image = None
+            self.version = 0
+
+    ###################################################################################################################
+    # Function that adds a card to the cache or replaces it after an edit
+    # Parameters: the card row returned by the database (must include every column)
+    # Returns: void
+    ###################################################################################################################
+    def upsert(self, row):
+        with self._lock:
+            # writes before the first load are picked up by the load itself
+            if not self.loaded:
+                return
+            self._cards[row["id"]] = YugiohCard.from_row(row)
+            self._by_name = self._by_image = None
+
+    ###################################################################################################################
+    # Function that removes a card from the cache
+    # Parameters: the card's database id
+    # Returns: void
+    ###################################################################################################################
+    def remove(self, card_id):
+        with self._lock:
+            if self.loaded and self._cards.pop(card_id, None) is not None:
+                self._by_name = self._by_image = None
+
+    ###################################################################################################################
+    # Function that looks up a single card
+    # Parameters: the card's database id
+    # Returns: the YugiohCard, or None if there's no such card
+    ###################################################################################################################
+    def get(self, card_id):
+        with self._lock:
+            return self._cards.get(card_id)
+
+    ###################################################################################################################
+    # Function that lists every card ordered by name, like the library page shows them
+    # Returns: a tuple of YugiohCard. the tuple is shared, so callers must not change the cards in it
+    ###################################################################################################################
+    def by_name(self):
+        with self._lock:
+            if self._by_name is None:
+                self._by_name = tuple(sorted(self._cards.values(), key=lambda card: card.name or ""))
+            return self._by_name
+
+    # returns the map of image filename -> the cards using it, rebuilding it after writes. callers hold the lock
+    def _image_map(self):
+        if self._by_image is None:
+            by_image = {}
+            for card in self.by_name():
+                if card.image_filename:
+                    by_image.setdefault(card.image_filename, []).append(card)
+            self._by_image = {image: tuple(cards) for image, cards in by_image.items()}
+        return self._by_image
+
+    ###################################################################################################################
+    # Function that lists the cards using an image (several cards can share one content-addressed image)
+    # Parameters: the image filename
+    # Returns: a tuple of YugiohCard ordered by name, empty if no card uses the image
+    ###################################################################################################################
+    def with_image(self, filename):
+        with self._lock:
+            return self._image_map().get(filename, ())
+
+    ###################################################################################################################
+    # Function that lists the images used by the cached cards
+    # Returns: a tuple of image filenames
+    ###################################################################################################################
+    def image_filenames(self):
+        with self._lock:
+            return tuple(self._image_map())
+
+    # returns the number of cached cards
+    def __len__(self):
+        with self._lock:
+            return len(self._cards)
+
+
+# the caches shared by every request of the app, one per owner
+card_caches = OwnerPartitions(CardCache)
@@ -0,0 +1,230 @@
+######################################################################################################################
+# Project...............: Yugioh Card Library
+# Author................: Ben Stearns
+# Date..................: 12-4-25
+# Project Description...: This application creates a digital database library for storing and managing Yugioh cards
+# File Description......: defines materialized statistics of a card collection: how many cards there are of every
+#                         card type, attribute and monster type, the ATK/DEF values held, and how many cards have an
+#                         image. The counters are updated by every write instead of being recomputed from a scan of
+#                         the library, and a reconcile rebuilds them from the database to check they haven't drifted.
+#                         Each owner's collection has its own statistics
+#######################################################################################################################
+
+import math                             # for skipping NaN stats
+import threading                        # for guarding the counters against concurrent requests
+from collections import Counter         # for the per-value counters
+
+from data_layer.owners import OwnerPartitions
+from data_layer.facet_index import FACET_COLUMNS, normalize_facet_value
+from data_layer.numeric_index import NUMERIC_COLUMNS, to_column_value
+
+# the columns of the cards table the statistics are built from
+STATS_COLUMNS = ("id",) + FACET_COLUMNS + NUMERIC_COLUMNS + ("image_filename",)
+
+# the counted fields: the facet columns, the stats, and whether the card has an image
+COUNTED_FIELDS = FACET_COLUMNS + NUMERIC_COLUMNS + ("has_image",)
+
+# the width of the ATK/DEF distribution's buckets. values of MAX_STAT_BUCKET and above share the last bucket
+STAT_BUCKET_SIZE = 500
+MAX_STAT_BUCKET = 4000
+
+#######################################################################################################################
+# Function that converts an ATK/DEF value from the database to the whole number it is counted under
+# Parameters: the raw value
+# Returns: the value as an int, or None for cards without one (spells, traps and "?" stats)
+#######################################################################################################################
+def to_counted_stat(value):
+    value = to_column_value(value)
+    return None if math.isnan(value) else int(value)
+
+#######################################################################################################################
+# Function that finds the value of a sorted distribution at a fraction of its cards
+# Parameters: a list of (value, count) pairs sorted by value, the number of cards and the fraction (0.5 for median)
+# Returns: the value
+#######################################################################################################################
+def value_at_fraction(values, total, fraction):
+    target = fraction * (total - 1)
+    seen = 0
+    for value, count in values:
+        seen += count
+        if seen > target:
+            return value
+    return values[-1][0]
+
+#######################################################################################################################
+# Function that summarizes the counter of one stat for the dashboard
+# Parameters: the counter of value -> number of cards
+# Returns: a dictionary of the number of cards with and without the stat, min/max/mean/median and the bucket counts
+#######################################################################################################################
+def summarize_stat(counter):
+    values = sorted((value, count) for value, count in counter.items() if value is not None and count)
+    total = sum(count for _, count in values)
+    summary = {"cards": total, "missing": counter.get(None, 0), "min": None, "max": None, "mean": None,
+               "median": None, "buckets": []}
+    if not total:
+        return summary
+
+    summary["min"] = values[0][0]
+    summary["max"] = values[-1][0]
+    summary["mean"] = round(sum(value * count for value, count in values) / total, 1)
+    summary["median"] = value_at_fraction(values, total, 0.5)
+
+    # every bucket up to the highest value held is listed, even empty ones, so the histogram's gaps are visible
+    buckets = Counter()
+    for value, count in values:
+        buckets[min(value // STAT_BUCKET_SIZE * STAT_BUCKET_SIZE, MAX_STAT_BUCKET)] += count
+    for low in range(0, max(buckets) + 1, STAT_BUCKET_SIZE):
+        label = f"{low}+" if low == MAX_STAT_BUCKET else f"{low}-{low + STAT_BUCKET_SIZE - 1}"
+        summary["buckets"].append({"range": label, "cards": buckets.get(low, 0)})
+    return summary
+
+
+class CollectionStats:
+    # constructor for empty statistics. they are filled by ensure_loaded() and kept current by upsert() and remove()
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.loaded = False
+        self.reconciles = 0
+        self.last_drift = None
+        self._clear()
+
+    # resets every counter
+    def _clear(self):
+        self._cards, self._counts = {}, {field: Counter() for field in COUNTED_FIELDS}
+
+    # converts a row to the value counted for every field. fields whose column is missing from the row keep the
+    # value in previous
+    @staticmethod
+    def _counted_values(row, previous):
+        values = {}
+        for column in FACET_COLUMNS:
+            values[column] = normalize_facet_value(column, row[column]) if column in row else previous.get(column)
+        for column in NUMERIC_COLUMNS:
+            values[column] = to_counted_stat(row[column]) if column in row else previous.get(column)
+        if "image_filename" in row:
+            values["has_image"] = bool(row["image_filename"])
+        else:
+            values["has_image"] = previous.get("has_image", False)
+        return values
+
+    # builds the card and counter maps of a list of rows without touching the live ones
+    @classmethod
+    def _build(cls, rows):
+        cards, counts = {}, {field: Counter() for field in COUNTED_FIELDS}
+        for row in rows:
+            values = cls._counted_values(row, {})
+            cards[row["id"]] = values
+            for field, value in values.items():
+                counts[field][value] += 1
+        return cards, counts
+
+    ###################################################################################################################
+    # Function that builds the statistics from scratch the first time they're needed
+    # Parameters: a function returning every card row (with the columns in STATS_COLUMNS)
+    # Returns: void
+    ###################################################################################################################
+    def ensure_loaded(self, loader):
+        # the lock is held while querying so a write that lands during the load waits and is applied afterwards
+        with self._lock:
+            if self.loaded:
+                return
+            self._cards, self._counts = self._build(loader())
+            self.loaded = True
+
+    ###################################################################################################################
+    # Function that counts a new card or moves an edited card's counts to its new values
+    # Parameters: the card row (must include id. columns missing from the row keep their counted value)
+    # Returns: void
+    ###################################################################################################################
+    def upsert(self, row):
+        with self._lock:
+            # writes before the first load are picked up by the load itself
+            if not self.loaded:
+                return
+            previous = self._cards.get(row["id"], {})
+            values = self._counted_values(row, previous)
+            self._uncount(previous)
+            self._cards[row["id"]] = values
+            for field, value in values.items():
+                self._counts[field][value] += 1
+
+    ###################################################################################################################
+    # Function that stops counting a deleted card. cards that aren't counted are ignored, so removing a card twice
+    # (or one that belongs to another owner) leaves the counts alone
+    # Parameters: the card's database id
+    # Returns: void
+    ###################################################################################################################
+    def remove(self, card_id):
+        with self._lock:
+            if self.loaded:
+                self._uncount(self._cards.pop(card_id, {}))
+
+    # takes a card's values off the counters, dropping values no card holds anymore. callers hold the lock
+    def _uncount(self, values):
+        for field, value in values.items():
+            counter = self._counts[field]
+            counter[value] -= 1
+            if counter[value] <= 0:
+                del counter[value]
+
+    ###################################################################################################################
+    # Function that rebuilds the statistics from the database and compares them to the incrementally kept ones
+    # Parameters: a function returning every card row (with the columns in STATS_COLUMNS)
+    # Returns: a dictionary of the number of cards counted before and after, the ids counted by only one of them, and
+    #          for every field the values whose count differed as {value: [kept count, rebuilt count]}
+    ###################################################################################################################
+    def reconcile(self, loader):
+        # writes wait for the rebuild, so a write the query already saw is applied again afterwards. that's harmless
+        # since upsert() replaces a card's values instead of adding to them
+        with self._lock:
+            cards, counts = self._build(loader())
+            drift = {"cards_before": len(self._cards), "cards_after": len(cards),
+                     "missing_ids": sorted(cards.keys() - self._cards.keys()),
+                     "extra_ids": sorted(self._cards.keys() - cards.keys()), "fields": {}}
+            if self.loaded:
+                for field in COUNTED_FIELDS:
+                    kept, rebuilt = self._counts[field], counts[field]
+                    differences = {str(value): [kept.get(value, 0), rebuilt.get(value, 0)]
+                                   for value in kept.keys() | rebuilt.keys() if kept.get(value) != rebuilt.get(value)}
+                    if differences:
+                        drift["fields"][field] = differences
+            else:
+                # there was nothing to compare against, so only the rebuild is reported
+                drift["missing_ids"] = []
+            drift["drifted"] = bool(drift["missing_ids"] or drift["extra_ids"] or drift["fields"])
+
+            self._cards, self._counts = cards, counts
+            self.loaded = True
+            self.reconciles += 1
+            self.last_drift = drift
+            return drift
+
+    ###################################################################################################################
+    # Function that summarizes the counters for the dashboard and the JSON api
+    # Returns: a dictionary with the number of cards, the breakdown of every facet column, the ATK/DEF distributions
+    #          and the image coverage
+    ###################################################################################################################
+    def summary(self):
+        with self._lock:
+            total = len(self._cards)
+            breakdowns = {}
+            for column in FACET_COLUMNS:
+                counter = self._counts[column]
+                breakdowns[column] = {
+                    "values": dict(sorted((value, count) for value, count in counter.items() if value is not None)),
+                    "unset": counter.get(None, 0)
+                }
+            with_image = self._counts["has_image"].get(True, 0)
+            return {
+                "cards": total,
+                "breakdowns": breakdowns,
+                "stats": {column: summarize_stat(self._counts[column]) for column in NUMERIC_COLUMNS},
+                "images": {"with_image": with_image, "without_image": total - with_image,
+                           "coverage": round(100 * with_image / total, 1) if total else None},
+                "reconciles": self.reconciles,
+                "last_drift": self.last_drift["drifted"] if self.last_drift else None
+            }
+
+
+# the statistics shared by every request of the app, one per owner
+collection_stats = OwnerPartitions(CollectionStats)
@@ -0,0 +1,253 @@
+######################################################################################################################
+# Project...............: Yugioh Card Library
+# Author................: Ben Stearns
+# Date..................: 12-4-25
+# Project Description...: This application creates a digital database library for storing and managing Yugioh cards
+# File Description......: defines an asynchronous client for the database's PostgREST api. It keeps one pooled,
+#                         keep-alive HTTP session on its own event loop thread, so independent queries can be sent
+#                         at the same time instead of one after another, and adds operations the supabase query
+#                         builder can't do in a single round trip (like updating a card and returning its old row)
+#######################################################################################################################
+
+import asyncio                          # for running queries concurrently
+import atexit                           # for closing the session when the app exits
+import threading                        # for the event loop thread
+import httpx                            # for the pooled async HTTP session
+
+# HTTP/2 sends concurrent queries over a single connection, but needs the optional h2 package
+try:
+    import h2
+except ImportError:
+    h2 = None
+
+# the most connections the session opens to the api at once, and how long idle connections are kept open
+MAX_CONNECTIONS = 20
+KEEPALIVE_SECONDS = 60.0
+
+# how long a query may take before it fails
+TIMEOUT_SECONDS = 10.0
+
+# the operators a filter can use, written (column, operator, value). "in" takes a list of values
+FILTER_OPERATORS = ("eq", "neq", "gt", "gte", "lt", "lte", "in", "is")
+
+
+class DataClientError(Exception):
+    # constructor for an error reported by the api, with the same message and code attributes as postgrest's APIError
+    def __init__(self, message, code=None, status=None):
+        super().__init__(message)
+        self.message = message
+        self.code = code
+        self.status = status
+
+#######################################################################################################################
+# Function that writes a filter value the way PostgREST expects it in a query string
+# Parameters: the value
+# Returns: the value as text
+#######################################################################################################################
+def format_value(value):
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+#######################################################################################################################
+# Function that writes a value of an in.(...) list, quoting values holding characters that would end the list
+# Parameters: the value
+# Returns: the value as text
+#######################################################################################################################
+def format_list_value(value):
+    text = format_value(value)
+    if any(character in text for character in ',()"\\ '):
+        return '"' + text.replace("\\", "\\\\").replace('"', '\\"') + '"'
+    return text
+
+#######################################################################################################################
+# Function that converts filters into PostgREST query parameters
+# Parameters: a list of (column, operator, value) filters
+# Returns: a list of (parameter, value) tuples
+# Raises: ValueError for an unknown operator
+#######################################################################################################################
+def filter_params(filters):
+    params = []
+    for column, operator, value in filters:
+        if operator not in FILTER_OPERATORS:
+            raise ValueError(f"Unknown filter operator: {operator}")
+        if operator == "in":
+            params.append((column, f"in.({','.join(format_list_value(item) for item in value)})"))
+        else:
+            params.append((column, f"{operator}.{format_value(value)}"))
+    return params
+
+
+class DataClient:
+    # constructor for a client of the project at url. nothing is opened until the first query runs
+    def __init__(self, url, key, max_connections=MAX_CONNECTIONS, timeout=TIMEOUT_SECONDS):
+        self.rest_url = f"{url.rstrip('/')}/rest/v1"
+        self._headers = {"apikey": key, "Authorization": f"Bearer {key}"}
+        self._limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections,
+                                    keepalive_expiry=KEEPALIVE_SECONDS)
+        self._timeout = timeout
+        self._lock = threading.Lock()
+        self._loop = None
+        self._session = None
+        self._missing_functions = set()         # database functions the api reported missing (PGRST202)
+
+    # starts the event loop thread the first time a query runs
+    def _event_loop(self):
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="data-client", daemon=True).start()
+                atexit.register(self.close)
+            return self._loop
+
+    # returns the pooled session, opening it the first time. only called on the event loop thread
+    def _http(self):
+        if self._session is None:
+            self._session = httpx.AsyncClient(base_url=self.rest_url, headers=self._headers, limits=self._limits,
+                                              timeout=self._timeout, http2=h2 is not None)
+        return self._session
+
+    ###################################################################################################################
+    # Function that runs a query (or any coroutine using this client) on the client's event loop and waits for it
+    # Parameters: the coroutine, ex: client.select("cards")
+    # Returns: the coroutine's result
+    # Raises: whatever the coroutine raises, like DataClientError
+    ###################################################################################################################
+    def run(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self._event_loop()).result()
+
+    ###################################################################################################################
+    # Function that sends several independent queries at the same time and waits for all of them, so they take about
+    # one round trip instead of one each
+    # Parameters: the coroutines, and whether a failed query should be returned as its exception instead of raised
+    # Returns: a list of the results, in the same order as the coroutines
+    ###################################################################################################################
+    def run_all(self, coroutines, return_exceptions=False):
+        async def gather():
+            return await asyncio.gather(*coroutines, return_exceptions=return_exceptions)
+        return self.run(gather())
+
+    ###################################################################################################################
+    # Function that closes the pooled session and stops the event loop
+    # Returns: void
+    ###################################################################################################################
+    def close(self):
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+        if self._session is not None:
+            asyncio.run_coroutine_threadsafe(self._session.aclose(), loop).result()
+            self._session = None
+        loop.call_soon_threadsafe(loop.stop)
+
+    ###################################################################################################################
+    # Function that sends a request to the api
+    # Parameters: the method, the path under /rest/v1, optional query parameters, JSON body and Prefer header
+    # Returns: the decoded JSON response, or None for an empty response
+    # Raises: DataClientError if the api answers with an error
+    ###################################################################################################################
+    async def request(self, method, path, params=None, body=None, prefer=None):
+        headers = {"Prefer": prefer} if prefer else None
+        response = await self._http().request(method, path, params=params, json=body, headers=headers)
+        if response.status_code >= 400:
+            try:
+                error = response.json()
+            except ValueError:
+                error = {"message": response.text}
+            raise DataClientError(error.get("message") or response.reason_phrase, error.get("code"),
+                                  response.status_code)
+        return response.json() if response.content else None
+
+    ###################################################################################################################
+    # Functions that run the basic queries on a table. the writes return the rows they wrote, like the supabase
+    # client does
+    # Parameters: the table, the columns to select, a list of (column, operator, value) filters, an ordering column
+    #             (prefixed with "-" for descending), a row limit and offset, and the rows or changes to write
+    # Returns: a list of row dictionaries
+    ###################################################################################################################
+    async def select(self, table, columns="*", filters=(), order=None, limit=None, offset=None):
+        params = [("select", columns)] + filter_params(filters)
+        if order:
+            params.append(("order", f"{order[1:]}.desc" if order.startswith("-") else f"{order}.asc"))
+        if limit is not None:
+            params.append(("limit", str(limit)))
+        if offset:
+            params.append(("offset", str(offset)))
+        return await self.request("GET", f"/{table}", params=params)
+
+    async def insert(self, table, rows):
+        return await self.request("POST", f"/{table}", body=rows, prefer="return=representation")
+
+    async def update(self, table, changes, filters):
+        return await self.request("PATCH", f"/{table}", params=filter_params(filters), body=changes,
+                                  prefer="return=representation")
+
+    async def delete(self, table, filters):
+        return await self.request("DELETE", f"/{table}", params=filter_params(filters), prefer="return=representation")
+
+    ###################################################################################################################
+    # Function that calls a database function through the api
+    # Parameters: the function name and its arguments
+    # Returns: the function's result
+    ###################################################################################################################
+    async def rpc(self, function, arguments):
+        return await self.request("POST", f"/rpc/{function}", body=arguments)
+
+    ###################################################################################################################
+    # Function that updates a card and returns the row as it was before the update, in a single round trip. It calls
+    # the update_card_returning_previous database function (created by data_layer/recreate_dupabase_db.py and
+    # data_layer/migrate_supabase_db.py), which locks the row, so the previous row is exactly the one the update
+    # replaced. Databases that don't have the function yet get the select and update it replaces instead
+    # Parameters: the card's id, the columns to change and the id of the owner the card must belong to
+    # Returns: a tuple of (the previous row, the updated row), or (None, None) if the owner has no such card
+    # Raises: DataClientError if the update fails (for example on a name the owner already uses)
+    ###################################################################################################################
+    async def update_card_returning_previous(self, card_id, changes, owner_id):
+        if "update_card_returning_previous" not in self._missing_functions:
+            try:
+                result = await self.rpc("update_card_returning_previous",
+                                        {"card_id": card_id, "changes": changes, "card_owner": owner_id})
+            except DataClientError as e:
+                if e.code != "PGRST202":
+                    raise
+                # the function is only looked for again once the app restarts, after the database was migrated
+                print("update_card_returning_previous is missing, run python -m data_layer.migrate_supabase_db")
+                self._missing_functions.add("update_card_returning_previous")
+            else:
+                if not result:
+                    return None, None
+                return result["previous"], result["current"]
+
+        # two round trips, and the row isn't locked in between, so an edit landing meanwhile can be missed
+        filters = [("id", "eq", card_id), ("owner_id", "eq", owner_id)]
+        previous = await self.select("cards", filters=filters)
+        if not previous:
+            return None, None
+        changes = {column: value for column, value in changes.items() if column not in ("id", "owner_id")}
+        current = await self.update("cards", changes, filters)
+        if not current:
+            return None, None
+        return previous[0], current[0]
+
+    ###################################################################################################################
+    # Function that lists an owner's cards written and deleted after a version, oldest first. It calls the
+    # card_changes database function, which reads the cards and their tombstones in one snapshot
+    # Parameters: the version the caller has synced up to (0 for a new copy of the library), the most changes to
+    #             return and the owner id
+    # Returns: a dictionary of the changes, the version to ask from next time and whether more changes are waiting,
+    #          or {"reset": True} if deletions after the version were already pruned
+    ###################################################################################################################
+    async def card_changes(self, since, max_rows, owner_id):
+        return await self.rpc("card_changes", {"since": since, "max_rows": max_rows, "card_owner": owner_id})
+
+    ###################################################################################################################
+    # Function that drops the tombstones of cards deleted more than keep_seconds ago, of every owner. Mirrors that
+    # synced before the dropped tombstones are told to start over on their next sync
+    # Parameters: how many seconds of tombstones to keep
+    # Returns: the number of tombstones dropped
+    ###################################################################################################################
+    async def prune_card_tombstones(self, keep_seconds):
+        return await self.rpc("prune_card_tombstones", {"keep_seconds": keep_seconds})
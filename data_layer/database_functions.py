@@ -0,0 +1,178 @@
+######################################################################################################################
+# Project...............: Yugioh Card Library
+# Author................: Ben Stearns
+# Date..................: 12-4-25
+# Project Description...: This application creates a digital database library for storing and managing Yugioh cards
+# File Description......: defines the SQL of the database functions the app calls and of the change tracking behind
+#                         them. Every statement can be run again on a database that already has what it creates, so
+#                         the recreate script (which builds a new database) and the migrate script (which upgrades an
+#                         existing one in place) share them
+#######################################################################################################################
+
+# Updates a card and returns the row before and after the update in one round trip (used by the edit page through
+# the async data client). The row is locked first so the previous row is exactly the one the update replaced. Only
+# cards of the given owner are updated, and a card never moves to another owner
+UPDATE_CARD_FUNCTION_SQL = """
+CREATE OR REPLACE FUNCTION update_card_returning_previous(card_id INTEGER, changes JSONB, card_owner VARCHAR)
+RETURNS JSONB
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    previous cards;
+    current cards;
+BEGIN
+    SELECT * INTO previous FROM cards WHERE id = card_id AND owner_id = card_owner FOR UPDATE;
+    IF NOT FOUND THEN
+        RETURN NULL;
+    END IF;
+
+    UPDATE cards SET
+        name = updated.name,
+        card_type = updated.card_type,
+        monster_type = updated.monster_type,
+        description = updated.description,
+        attack = updated.attack,
+        defense = updated.defense,
+        attribute = updated.attribute,
+        image_filename = updated.image_filename
+    FROM jsonb_populate_record(previous, changes) AS updated
+    WHERE cards.id = card_id
+    RETURNING cards.* INTO current;
+
+    RETURN jsonb_build_object('previous', to_jsonb(previous), 'current', to_jsonb(current));
+END;
+$$;
+"""
+
+# Every insert or update gives the card the next row_version and the current time, and every delete leaves a tombstone
+# with its own version, so library mirrors can ask for only what changed since the version they last saw
+# (GET /api/cards/changes?since=<version>), each for its own owner's collection. Versions are shared by every owner.
+# Writers take a lock on their card's owner while they hold a new version, so an owner's versions become visible in
+# order and a mirror never skips a lower version that commits late. Writers to different owners don't wait on each
+# other, since a mirror only reads one owner's versions. Old tombstones are dropped with prune_card_tombstones(),
+# which the app runs every TOMBSTONE_PRUNE_SECONDS; mirrors that synced before them are told to start over. The cards
+# table must already have its row_version and updated_at columns
+CHANGE_TRACKING_SQL = """
+CREATE SEQUENCE IF NOT EXISTS card_row_version_seq;
+
+CREATE TABLE IF NOT EXISTS card_tombstones (
+    card_id INTEGER PRIMARY KEY,
+    owner_id VARCHAR(64) NOT NULL,
+    row_version BIGINT NOT NULL,
+    deleted_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS card_sync_state (
+    pruned_version BIGINT NOT NULL
+);
+INSERT INTO card_sync_state SELECT 0 WHERE NOT EXISTS (SELECT 1 FROM card_sync_state);
+
+CREATE INDEX IF NOT EXISTS cards_owner_id_row_version_idx ON cards (owner_id, row_version);
+CREATE INDEX IF NOT EXISTS card_tombstones_owner_id_row_version_idx ON card_tombstones (owner_id, row_version);
+CREATE INDEX IF NOT EXISTS card_tombstones_deleted_at_idx ON card_tombstones (deleted_at);
+
+DROP FUNCTION IF EXISTS next_card_row_version();
+
+CREATE OR REPLACE FUNCTION next_card_row_version(card_owner VARCHAR)
+RETURNS BIGINT
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    -- held until the transaction ends, so the owner's versions commit in the order they were handed out
+    PERFORM pg_advisory_xact_lock(hashtext('card_row_version_seq'), hashtext(card_owner));
+    RETURN nextval('card_row_version_seq');
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION stamp_card_version()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    NEW.row_version := next_card_row_version(NEW.owner_id);
+    NEW.updated_at := now();
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS cards_stamp_version ON cards;
+CREATE TRIGGER cards_stamp_version
+BEFORE INSERT OR UPDATE ON cards
+FOR EACH ROW EXECUTE FUNCTION stamp_card_version();
+
+CREATE OR REPLACE FUNCTION record_card_tombstone()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    INSERT INTO card_tombstones (card_id, owner_id, row_version)
+    VALUES (OLD.id, OLD.owner_id, next_card_row_version(OLD.owner_id))
+    ON CONFLICT (card_id) DO UPDATE SET owner_id = EXCLUDED.owner_id, row_version = EXCLUDED.row_version,
+                                        deleted_at = EXCLUDED.deleted_at;
+    RETURN OLD;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS cards_record_tombstone ON cards;
+CREATE TRIGGER cards_record_tombstone
+AFTER DELETE ON cards
+FOR EACH ROW EXECUTE FUNCTION record_card_tombstone();
+
+CREATE OR REPLACE FUNCTION card_changes(since BIGINT, max_rows INTEGER, card_owner VARCHAR)
+RETURNS JSONB
+LANGUAGE plpgsql
+STABLE
+AS $$
+DECLARE
+    page JSONB;
+    last_version BIGINT;
+    more BOOLEAN;
+BEGIN
+    -- tombstones newer than the caller's version were pruned, so it can't tell which cards were deleted
+    IF since > 0 AND since < (SELECT pruned_version FROM card_sync_state) THEN
+        RETURN jsonb_build_object('reset', true);
+    END IF;
+
+    WITH everything AS (
+        SELECT row_version AS version,
+               jsonb_build_object('op', 'upsert', 'version', row_version, 'updated_at', updated_at,
+                                  'card', to_jsonb(cards) - 'owner_id' - 'row_version' - 'updated_at') AS change
+        FROM cards WHERE owner_id = card_owner AND row_version > since
+        UNION ALL
+        -- a new copy of the library (since = 0) has nothing to delete
+        SELECT row_version, jsonb_build_object('op', 'delete', 'version', row_version, 'id', card_id,
+                                               'deleted_at', deleted_at)
+        FROM card_tombstones WHERE owner_id = card_owner AND row_version > since AND since > 0
+    ), numbered AS (
+        SELECT version, change, row_number() OVER (ORDER BY version) AS position
+        FROM (SELECT * FROM everything ORDER BY version LIMIT max_rows + 1) AS candidates
+    )
+    SELECT coalesce(jsonb_agg(change ORDER BY version) FILTER (WHERE position <= max_rows), '[]'::jsonb),
+           max(version) FILTER (WHERE position <= max_rows),
+           count(*) > max_rows
+    INTO page, last_version, more
+    FROM numbered;
+
+    RETURN jsonb_build_object('changes', page, 'version', coalesce(last_version, since), 'more', more);
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION prune_card_tombstones(keep_seconds INTEGER)
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    pruned_through BIGINT;
+    pruned INTEGER;
+BEGIN
+    WITH removed AS (
+        DELETE FROM card_tombstones WHERE deleted_at < now() - make_interval(secs => keep_seconds)
+        RETURNING row_version
+    )
+    SELECT max(row_version), count(*) INTO pruned_through, pruned FROM removed;
+
+    UPDATE card_sync_state SET pruned_version = greatest(pruned_version, coalesce(pruned_through, 0));
+    RETURN pruned;
+END;
+$$;
+"""
@@ -0,0 +1,196 @@
+######################################################################################################################
+# Project...............: Yugioh Card Library
+# Author................: Ben Stearns
+# Date..................: 12-4-25
+# Project Description...: This application creates a digital database library for storing and managing Yugioh cards
+# File Description......: defines an in-memory inverted bitmap index over the library's low-cardinality columns
+#                         (attribute, card_type and monster_type). Every card gets a bit position, and every value of
+#                         a column gets a Python int whose set bits are the cards holding that value, so filters and
+#                         facet counts are a handful of bitwise ANDs/ORs and popcounts instead of a database scan.
+#                         Each owner's collection has its own index, so bitmaps only span that owner's cards
+#######################################################################################################################
+
+import threading                        # for guarding the index against concurrent requests
+
+from data_layer.owners import OwnerPartitions
+
+# the columns the index covers
+FACET_COLUMNS = ("attribute", "card_type", "monster_type")
+
+#######################################################################################################################
+# Function that normalizes a column value so "Dark", "DARK " and "dark" land in the same bitmap
+# Parameters: the column name and its raw value from the database or a form
+# Returns: the normalized value, or None for blanks and the "-" placeholder used by seed data
+#######################################################################################################################
+def normalize_facet_value(column, value):
+    if value is None:
+        return None
+    value = str(value).strip()
+    if value in ("", "-"):
+        return None
+    # card types are shown as Monster/Spell/Trap, attributes and monster types are upper case like the constants
+    return value.capitalize() if column == "card_type" else value.upper()
+
+#######################################################################################################################
+# Function that yields the bit positions set in a bitmap, lowest first
+# Parameters: the bitmap as an int
+# Returns: a generator of bit positions
+#######################################################################################################################
+def iter_bits(bitmap):
+    while bitmap:
+        lowest = bitmap & -bitmap
+        yield lowest.bit_length() - 1
+        bitmap ^= lowest
+
+
+class FacetIndex:
+    # constructor for an empty index. it is filled by ensure_loaded() and kept current by upsert() and remove()
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.loaded = False
+        self._clear()
+
+    # resets every structure of the index
+    def _clear(self):
+        self._positions = {}                                   # card id -> bit position
+        self._ids = []                                         # bit position -> card id (None once freed)
+        self._free = []                                        # freed bit positions to reuse
+        self._values = {}                                      # card id -> {column: normalized value}
+        self._bitmaps = {column: {} for column in FACET_COLUMNS}  # column -> value -> bitmap of cards
+        self._all = 0                                          # bitmap of every indexed card
+
+    ###################################################################################################################
+    # Function that builds the index from scratch the first time it's needed
+    # Parameters: a function returning every card row (with id and the facet columns)
+    # Returns: void
+    ###################################################################################################################
+    def ensure_loaded(self, loader):
+        # the lock is held while querying so a write that lands during the load waits and is applied afterwards
+        with self._lock:
+            if self.loaded:
+                return
+            self._clear()
+            for row in loader():
+                self._insert(row)
+            self.loaded = True
+
+    ###################################################################################################################
+    # Function that drops the index so the next use rebuilds it from the database
+    # Returns: void
+    ###################################################################################################################
+    def invalidate(self):
+        with self._lock:
+            self.loaded = False
+            self._clear()
+
+    ###################################################################################################################
+    # Function that adds a card to the index or moves it to its new values after an edit
+    # Parameters: the card row (must include id. columns missing from the row keep their indexed value)
+    # Returns: void
+    ###################################################################################################################
+    def upsert(self, row):
+        with self._lock:
+            # writes before the first load are picked up by the load itself
+            if not self.loaded:
+                return
+            previous = self._values.get(row["id"], {})
+            merged = {column: row.get(column, previous.get(column)) for column in FACET_COLUMNS}
+            self._remove(row["id"])
+            self._insert(dict(merged, id=row["id"]))
+
+    ###################################################################################################################
+    # Function that removes a card from the index
+    # Parameters: the card's database id
+    # Returns: void
+    ###################################################################################################################
+    def remove(self, card_id):
+        with self._lock:
+            if self.loaded:
+                self._remove(card_id)
+
+    # adds a row to every bitmap it belongs to. callers hold the lock
+    def _insert(self, row):
+        card_id = row["id"]
+        position = self._free.pop() if self._free else len(self._ids)
+        if position == len(self._ids):
+            self._ids.append(card_id)
+        else:
+            self._ids[position] = card_id
+        self._positions[card_id] = position
+
+        bit = 1 << position
+        self._all |= bit
+        values = {}
+        for column in FACET_COLUMNS:
+            value = normalize_facet_value(column, row.get(column))
+            values[column] = value
+            if value is not None:
+                bitmaps = self._bitmaps[column]
+                bitmaps[value] = bitmaps.get(value, 0) | bit
+        self._values[card_id] = values
+
+    # clears a card's bit from every bitmap and frees its position. callers hold the lock
+    def _remove(self, card_id):
+        position = self._positions.pop(card_id, None)
+        if position is None:
+            return
+        bit = 1 << position
+        self._all &= ~bit
+        for column, value in self._values.pop(card_id).items():
+            if value is None:
+                continue
+            bitmaps = self._bitmaps[column]
+            bitmaps[value] &= ~bit
+            if not bitmaps[value]:
+                del bitmaps[value]
+        self._ids[position] = None
+        self._free.append(position)
+
+    # builds the bitmap matching the filters, leaving out one column when computing that column's facet counts
+    def _match(self, filters, skip_column=None):
+        result = self._all
+        for column, wanted in filters.items():
+            if column == skip_column or not wanted:
+                continue
+            # several values for the same column are OR'd together, different columns are AND'ed
+            column_bitmap = 0
+            for value in wanted:
+                column_bitmap |= self._bitmaps[column].get(normalize_facet_value(column, value), 0)
+            result &= column_bitmap
+        return result
+
+    ###################################################################################################################
+    # Function that finds the cards matching a set of filters
+    # Parameters: a dictionary of column -> list of accepted values
+    # Returns: a list of matching card ids
+    ###################################################################################################################
+    def filter_ids(self, filters):
+        with self._lock:
+            return [self._ids[position] for position in iter_bits(self._match(filters))]
+
+    ###################################################################################################################
+    # Function that counts how many cards each facet value would match given the other active filters
+    # Parameters: a dictionary of column -> list of accepted values
+    # Returns: a dictionary of column -> {value: count}, with values sorted alphabetically
+    ###################################################################################################################
+    def facet_counts(self, filters):
+        with self._lock:
+            counts = {}
+            for column in FACET_COLUMNS:
+                # a column's own filter is ignored for its counts so the user can see the alternatives to switch to
+                base = self._match(filters, skip_column=column)
+                counts[column] = {value: (bitmap & base).bit_count()
+                                  for value, bitmap in sorted(self._bitmaps[column].items())}
+            return counts
+
+    ###################################################################################################################
+    # Function that counts every indexed card
+    # Returns: the number of cards in the index
+    ###################################################################################################################
+    def __len__(self):
+        with self._lock:
+            return self._all.bit_count()
+
+
+# the indexes shared by every request of the app, one per owner
+facet_indexes = OwnerPartitions(FacetIndex)
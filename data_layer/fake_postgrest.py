@@ -0,0 +1,265 @@
+######################################################################################################################
+# Project...............: Yugioh Card Library
+# Author................: Ben Stearns
+# Date..................: 12-4-25
+# Project Description...: This application creates a digital database library for storing and managing Yugioh cards
+# File Description......: defines a local HTTP server that answers PostgREST requests (/rest/v1/<table> and
+#                         /rest/v1/rpc/<function>) from the in-memory supabase stand-in, so the async data client,
+#                         and the supabase client itself, can be tested over real keep-alive connections without
+#                         touching the hosted project
+#                         Run from the project root with: python -m data_layer.fake_postgrest [--port 54321]
+#                         and point SUPABASE_URL at http://127.0.0.1:54321
+#######################################################################################################################
+
+import argparse                                             # for the command line options
+import json                                                 # for the request and response bodies
+import threading                                            # for serving in the background
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+from data_layer.fake_supabase import FakeApiError, FakeSupabase
+
+# the REST api's path prefix
+REST_PREFIX = "/rest/v1/"
+
+# columns whose filter values are compared as numbers. query strings only carry text, and the in-memory tables keep
+# the types the rows were written with
+INTEGER_COLUMNS = {"cards": ("id", "attack", "defense", "row_version"), "card_tombstones": ("card_id", "row_version")}
+
+# the filter operators the server understands, and the FakeQuery method each one runs
+FILTER_METHODS = {"eq": "eq", "neq": "neq", "gt": "gt", "gte": "gte", "lt": "lt", "lte": "lte", "in": "in_",
+                  "is": "is_"}
+
+# query parameters that aren't filters
+RESERVED_PARAMS = ("select", "order", "limit", "offset", "columns", "on_conflict")
+
+# the HTTP status of each error code, like PostgREST answers them
+ERROR_STATUS = {"23505": 409, "PGRST116": 406, "PGRST202": 404}
+
+
+class BadRequest(Exception):
+    # raised for requests the server can't understand, answered with a 400
+    pass
+
+#######################################################################################################################
+# Function that splits the values of an in.(...) filter, honouring double-quoted values
+# Parameters: the text between the parentheses
+# Returns: a list of the values as text
+#######################################################################################################################
+def split_list(text):
+    values, current, quoted, escaped, was_quoted = [], [], False, False, False
+    for character in text:
+        if escaped:
+            current.append(character)
+            escaped = False
+        elif character == "\\" and quoted:
+            escaped = True
+        elif character == '"':
+            quoted = not quoted
+            was_quoted = True
+        elif character == "," and not quoted:
+            values.append("".join(current) if was_quoted else "".join(current).strip())
+            current, was_quoted = [], False
+        else:
+            current.append(character)
+    if current or was_quoted or values:
+        values.append("".join(current) if was_quoted else "".join(current).strip())
+    return values
+
+#######################################################################################################################
+# Function that converts a filter value from the query string to the type stored in the column
+# Parameters: the table, the column and the value as text
+# Returns: the converted value
+# Raises: BadRequest for a value that doesn't fit a number column
+#######################################################################################################################
+def convert_value(table, column, text):
+    if text == "null":
+        return None
+    if column in INTEGER_COLUMNS.get(table, ()):
+        try:
+            return int(text)
+        except ValueError:
+            raise BadRequest(f'invalid input syntax for type integer: "{text}"')
+    return text
+
+#######################################################################################################################
+# Function that applies the filters and modifiers of a request's query string to a fake query
+# Parameters: the FakeQuery, the table and the query parameters
+# Returns: the query
+# Raises: BadRequest for filters the server doesn't understand
+#######################################################################################################################
+def apply_params(query, table, params):
+    for column, condition in params:
+        if column in RESERVED_PARAMS:
+            continue
+        operator, _, text = condition.partition(".")
+        if operator not in FILTER_METHODS:
+            raise BadRequest(f'"failed to parse filter ({condition})"')
+        method = getattr(query, FILTER_METHODS[operator])
+        if operator == "in":
+            if not (text.startswith("(") and text.endswith(")")):
+                raise BadRequest(f'"failed to parse filter ({condition})"')
+            method(column, [convert_value(table, column, value) for value in split_list(text[1:-1])])
+        else:
+            method(column, convert_value(table, column, text))
+
+    values = dict(params)
+    for ordering in filter(None, values.get("order", "").split(",")):
+        column, *options = ordering.split(".")
+        query.order(column, desc="desc" in options)
+    offset = int(values.get("offset", 0))
+    if "limit" in values:
+        query.range(offset, offset + int(values["limit"]) - 1)
+    elif offset:
+        query.range(offset, 2 ** 31)
+    return query
+
+
+class PostgrestHandler(BaseHTTPRequestHandler):
+    # keep connections open between requests, like the real api. the headers and body are written separately, so
+    # Nagle's algorithm would hold the body back until the client acknowledges the headers
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    # the fake client the requests are answered from, set on the subclass made by make_server()
+    client = None
+
+    # ---------- request dispatch ----------
+    def do_GET(self):
+        self._handle("select")
+
+    def do_POST(self):
+        self._handle("insert")
+
+    def do_PATCH(self):
+        self._handle("update")
+
+    def do_DELETE(self):
+        self._handle("delete")
+
+    # quiet the per-request log lines
+    def log_message(self, format, *args):
+        pass
+
+    # answers a request, turning errors into PostgREST's JSON error responses
+    def _handle(self, operation):
+        try:
+            # the body is read up front so an error response never leaves it behind on the kept-alive connection
+            self.body = self._body()
+            url = urlsplit(self.path)
+            if not url.path.startswith(REST_PREFIX):
+                self._send(404, {"code": "PGRST125", "message": "Invalid path specified in request URL"})
+                return
+            params = parse_qsl(url.query, keep_blank_values=True)
+            name = url.path[len(REST_PREFIX):]
+            if name.startswith("rpc/"):
+                self._call(name[len("rpc/"):])
+            else:
+                self._query(operation, name, params)
+        except FakeApiError as e:
+            self._send(ERROR_STATUS.get(e.code, 400), {"code": e.code, "message": e.message, "details": None,
+                                                       "hint": None})
+        except (BadRequest, ValueError) as e:
+            self._send(400, {"code": "PGRST100", "message": str(e), "details": None, "hint": None})
+
+    # runs a table request
+    def _query(self, operation, table, params):
+        query = self.client.table(table)
+        values = dict(params)
+        body = self.body
+        if operation == "select":
+            query.select(values.get("select", "*"), count="exact" if "count=exact" in self._prefer() else None)
+        elif operation == "insert":
+            query.insert(body)
+        elif operation == "update":
+            query.update(body)
+        else:
+            query.delete()
+
+        # only selects honour ?select=, the writes return whole rows
+        response = apply_params(query, table, params).execute()
+        rows = response.data
+        if operation != "select" and values.get("select", "*").strip() != "*":
+            columns = [column.strip() for column in values["select"].split(",")]
+            rows = [{column: row.get(column) for column in columns} for row in rows]
+
+        headers = {}
+        if response.count is not None:
+            headers["Content-Range"] = f"0-{max(len(rows) - 1, 0)}/{response.count}" if rows else f"*/{response.count}"
+        if "vnd.pgrst.object" in self.headers.get("Accept", ""):
+            if len(rows) != 1:
+                raise FakeApiError("JSON object requested, multiple (or no) rows returned", "PGRST116")
+            rows = rows[0]
+
+        if operation == "select":
+            self._send(200, rows, headers)
+        elif "return=representation" in self._prefer():
+            self._send(201 if operation == "insert" else 200, rows, headers)
+        else:
+            self._send(201 if operation == "insert" else 204, None, headers)
+
+    # runs a database function
+    def _call(self, function):
+        try:
+            result = self.client.rpc(function, self.body or {}).execute().data
+        except TypeError:
+            raise BadRequest(f"Wrong arguments for the function public.{function}")
+        self._send(200, result)
+
+    # reads the JSON body of the request
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length)) if length else None
+
+    # returns the request's Prefer header
+    def _prefer(self):
+        return self.headers.get("Prefer", "")
+
+    # sends a JSON response (or an empty one for None)
+    def _send(self, status, data, headers=None):
+        body = b"" if data is None else json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for header, value in (headers or {}).items():
+            self.send_header(header, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+#######################################################################################################################
+# Function that makes a server answering PostgREST requests from a fake client
+# Parameters: the FakeSupabase, and the host and port to listen on (port 0 picks a free port)
+# Returns: the server, not yet serving
+#######################################################################################################################
+def make_server(client, host="127.0.0.1", port=0):
+    handler = type("BoundPostgrestHandler", (PostgrestHandler,), {"client": client})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+#######################################################################################################################
+# Function that serves PostgREST requests from a fake client on a background thread
+# Parameters: the FakeSupabase, and the host and port to listen on (port 0 picks a free port)
+# Returns: the URL of the server, to use as SUPABASE_URL
+#######################################################################################################################
+def start_server(client, host="127.0.0.1", port=0):
+    server = make_server(client, host, port)
+    threading.Thread(target=server.serve_forever, name="fake-postgrest", daemon=True).start()
+    return f"http://{server.server_address[0]}:{server.server_address[1]}"
+
+
+# if the file is run directly, serve an empty in-memory database until stopped
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a local PostgREST stand-in backed by in-memory tables.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=54321)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="simulated round trip per request")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="extra random latency per request")
+    args = parser.parse_args()
+
+    server = make_server(FakeSupabase(args.latency_ms, args.jitter_ms), args.host, args.port)
+    print(f"Serving a PostgREST stand-in at http://{args.host}:{server.server_address[1]} (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,370 @@
+######################################################################################################################
+# Project...............: Yugioh Card Library
+# Author................: Ben Stearns
+# Date..................: 12-4-25
+# Project Description...: This application creates a digital database library for storing and managing Yugioh cards
+# File Description......: defines an in-process stand-in for the supabase client. It keeps tables in memory, supports
+#                         the parts of the supabase.table(...) query builder the app uses, and sleeps for a
+#                         configurable latency on every request so load tests see realistic round trips without
+#                         touching the hosted project
+#######################################################################################################################
+
+import copy                             # for handing out copies of rows instead of the stored rows themselves
+from datetime import datetime, timezone # for the updated_at and deleted_at timestamps
+import itertools                        # for generating row ids
+import random                           # for latency jitter
+import threading                        # for guarding the tables against concurrent requests
+import time                             # for simulating round trip latency
+
+# groups of columns whose values must be unique together in each table, mirroring the constraints of the real
+# database (card names are unique within each owner's collection)
+UNIQUE_COLUMNS = {"cards": (("owner_id", "name"),)}
+
+# the values of columns that inserts leave out, like the column defaults of the real database
+COLUMN_DEFAULTS = {"cards": {"owner_id": "default"}}
+
+# tables whose rows get a row_version and updated_at on every write, and the table recording their deletions, like
+# the triggers of the real database
+TOMBSTONE_TABLES = {"cards": "card_tombstones"}
+
+
+class FakeApiError(Exception):
+    # constructor for the error raised where the real client would raise a postgrest APIError
+    def __init__(self, message, code=None):
+        super().__init__(message)
+        self.message = message
+        self.code = code
+
+
+class FakeResponse:
+    # constructor for the object returned by execute(), with the same data and count attributes as the real one
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+class FakeQuery:
+    # constructor for a query against one table of the fake client
+    def __init__(self, client, table):
+        self._client = client
+        self._table = table
+        self._operation = "select"
+        self._columns = "*"
+        self._count = None
+        self._payload = None
+        self._filters = []
+        self._order = []
+        self._range = None
+        self._limit = None
+        self._single = False
+        self._maybe_single = False
+
+    # ---------- operations ----------
+    def select(self, columns="*", count=None):
+        self._operation, self._columns, self._count = "select", columns, count
+        return self
+
+    def insert(self, payload):
+        self._operation, self._payload = "insert", payload
+        return self
+
+    def update(self, payload):
+        self._operation, self._payload = "update", payload
+        return self
+
+    def delete(self):
+        self._operation = "delete"
+        return self
+
+    # ---------- filters ----------
+    def eq(self, column, value):
+        return self._filter(lambda row: row.get(column) == value)
+
+    def neq(self, column, value):
+        return self._filter(lambda row: row.get(column) != value)
+
+    def gt(self, column, value):
+        return self._filter(lambda row: row.get(column) is not None and row.get(column) > value)
+
+    def gte(self, column, value):
+        return self._filter(lambda row: row.get(column) is not None and row.get(column) >= value)
+
+    def lt(self, column, value):
+        return self._filter(lambda row: row.get(column) is not None and row.get(column) < value)
+
+    def lte(self, column, value):
+        return self._filter(lambda row: row.get(column) is not None and row.get(column) <= value)
+
+    def in_(self, column, values):
+        values = set(values)
+        return self._filter(lambda row: row.get(column) in values)
+
+    def is_(self, column, value):
+        value = None if value in (None, "null") else value
+        return self._filter(lambda row: row.get(column) is value)
+
+    # ---------- modifiers ----------
+    def order(self, column, desc=False):
+        self._order.append((column, desc))
+        return self
+
+    def range(self, start, end):
+        self._range = (start, end)
+        return self
+
+    def limit(self, size):
+        self._limit = size
+        return self
+
+    def single(self):
+        self._single = True
+        return self
+
+    def maybe_single(self):
+        self._maybe_single = True
+        return self
+
+    # adds a row predicate to the query
+    def _filter(self, predicate):
+        self._filters.append(predicate)
+        return self
+
+    # returns a copy of a row holding only the selected columns
+    def _project(self, row):
+        if self._columns.strip() == "*":
+            return copy.copy(row)
+        return {column.strip(): row.get(column.strip()) for column in self._columns.split(",")}
+
+    ###################################################################################################################
+    # Function that runs the query against the in-memory table after the simulated round trip
+    # Returns: a FakeResponse
+    # Raises: FakeApiError for broken unique constraints and single() queries that don't match exactly one row
+    ###################################################################################################################
+    def execute(self):
+        self._client.wait()
+        with self._client.lock:
+            rows = self._client.tables.setdefault(self._table, [])
+            matched = [row for row in rows if all(predicate(row) for predicate in self._filters)]
+            return getattr(self, f"_execute_{self._operation}")(rows, matched)
+
+    # runs a select on the matched rows
+    def _execute_select(self, rows, matched):
+        for column, desc in reversed(self._order):
+            # rows without a value sort last ascending and first descending, like postgres
+            matched.sort(key=lambda row: (row.get(column) is None, row.get(column)), reverse=desc)
+        total = len(matched)
+        if self._range is not None:
+            matched = matched[self._range[0]:self._range[1] + 1]
+        if self._limit is not None:
+            matched = matched[:self._limit]
+        data = [self._project(row) for row in matched]
+
+        if self._single or self._maybe_single:
+            if len(data) > 1 or (self._single and not data):
+                raise FakeApiError("JSON object requested, multiple (or no) rows returned", "PGRST116")
+            return FakeResponse(data[0] if data else None)
+        return FakeResponse(data, total if self._count else None)
+
+    # inserts one row or a list of rows
+    def _execute_insert(self, rows, matched):
+        payload = self._payload if isinstance(self._payload, list) else [self._payload]
+        payload = [dict(COLUMN_DEFAULTS.get(self._table, {}), **values) for values in payload]
+
+        # the keys already taken are collected once, so inserting many rows doesn't rescan the table for every row.
+        # every row is checked before any is added, so a failing insert leaves the table alone like postgres does
+        taken = {columns: {tuple(row.get(column) for column in columns) for row in rows}
+                 for columns in UNIQUE_COLUMNS.get(self._table, ())}
+        for values in payload:
+            for columns, keys in taken.items():
+                key = tuple(values.get(column) for column in columns)
+                if key in keys:
+                    raise self._duplicate_key(columns)
+                keys.add(key)
+
+        inserted = []
+        for values in payload:
+            row = dict(values, id=next(self._client.ids))
+            self._client.stamp(self._table, row)
+            rows.append(row)
+            inserted.append(copy.copy(row))
+        return FakeResponse(inserted)
+
+    # updates the matched rows
+    def _execute_update(self, rows, matched):
+        for row in matched:
+            self._check_unique(rows, self._payload, ignore=row)
+        for row in matched:
+            row.update(self._payload)
+            self._client.stamp(self._table, row)
+        return FakeResponse([copy.copy(row) for row in matched])
+
+    # deletes the matched rows
+    def _execute_delete(self, rows, matched):
+        doomed = {id(row) for row in matched}
+        rows[:] = [row for row in rows if id(row) not in doomed]
+        for row in matched:
+            self._client.bury(self._table, row)
+        return FakeResponse([copy.copy(row) for row in matched])
+
+    # raises the same duplicate key error as postgres when values would break a unique group of columns. ignore is
+    # the row being updated, whose current values fill in the columns the update doesn't change
+    def _check_unique(self, rows, values, ignore=None):
+        for columns in UNIQUE_COLUMNS.get(self._table, ()):
+            if not any(column in values for column in columns):
+                continue
+            key = tuple(values[column] if column in values else (ignore or {}).get(column) for column in columns)
+            if any(row is not ignore and tuple(row.get(column) for column in columns) == key for row in rows):
+                raise self._duplicate_key(columns)
+
+    # builds the error postgres raises for a value that breaks a unique group of columns
+    def _duplicate_key(self, columns):
+        return FakeApiError(f'duplicate key value violates unique constraint '
+                            f'"{self._table}_{"_".join(columns)}_key"', "23505")
+
+
+class FakeRpc:
+    # constructor for a call of one of the database functions the fake client implements
+    def __init__(self, client, function, params):
+        self._client = client
+        self._function = function
+        self._params = params
+
+    ###################################################################################################################
+    # Function that runs the database function after the simulated round trip
+    # Returns: a FakeResponse holding the function's result
+    # Raises: FakeApiError for unknown functions and errors raised by the function
+    ###################################################################################################################
+    def execute(self):
+        function = FAKE_FUNCTIONS.get(self._function)
+        if function is None:
+            raise FakeApiError(f"Could not find the function public.{self._function}", "PGRST202")
+        self._client.wait()
+        with self._client.lock:
+            return FakeResponse(function(self._client, **self._params))
+
+#######################################################################################################################
+# Function that mirrors the update_card_returning_previous database function: it updates a card and returns the row
+# as it was before the update along with the updated row
+# Parameters: the fake client (whose lock the caller holds), the card's id, the columns to change and the owner the
+#             card must belong to
+# Returns: a dictionary of the previous and current rows, or None if the owner has no such card
+# Raises: FakeApiError if the changes would break a unique column
+#######################################################################################################################
+def update_card_returning_previous(client, card_id, changes, card_owner):
+    rows = client.tables.setdefault("cards", [])
+    row = next((row for row in rows if row.get("id") == card_id and row.get("owner_id") == card_owner), None)
+    if row is None:
+        return None
+    changes = {column: value for column, value in changes.items() if column not in ("id", "owner_id")}
+    FakeQuery(client, "cards")._check_unique(rows, changes, ignore=row)
+    previous = copy.copy(row)
+    row.update(changes)
+    client.stamp("cards", row)
+    return {"previous": previous, "current": copy.copy(row)}
+
+#######################################################################################################################
+# Function that mirrors the card_changes database function: it lists an owner's cards written and deleted after a
+# version, oldest first
+# Parameters: the fake client (whose lock the caller holds), the version the caller has synced up to (0 for a new
+#             copy of the library, which only needs the current cards), the most changes to return and the owner
+# Returns: a dictionary of the changes, the version to ask from next time and whether more changes are waiting, or
+#          {"reset": True} if tombstones the caller hasn't seen were already pruned
+#######################################################################################################################
+def card_changes(client, since, max_rows, card_owner):
+    if 0 < since < client.pruned_version:
+        return {"reset": True}
+    hidden = ("owner_id", "row_version", "updated_at")
+    changes = [{"op": "upsert", "version": row["row_version"], "updated_at": row["updated_at"],
+                "card": {column: value for column, value in row.items() if column not in hidden}}
+               for row in client.tables.get("cards", [])
+               if row["row_version"] > since and row.get("owner_id") == card_owner]
+    if since > 0:
+        changes += [{"op": "delete", "version": row["row_version"], "id": row["card_id"],
+                     "deleted_at": row["deleted_at"]}
+                    for row in client.tables.get("card_tombstones", [])
+                    if row["row_version"] > since and row["owner_id"] == card_owner]
+    changes.sort(key=lambda change: change["version"])
+    page = copy.deepcopy(changes[:max_rows])
+    return {"changes": page, "version": page[-1]["version"] if page else since, "more": len(changes) > max_rows}
+
+#######################################################################################################################
+# Function that mirrors the prune_card_tombstones database function: it drops old tombstones, after which callers
+# that synced before them are told to start over
+# Parameters: the fake client (whose lock the caller holds) and how many seconds of tombstones to keep
+# Returns: the number of tombstones dropped
+#######################################################################################################################
+def prune_card_tombstones(client, keep_seconds):
+    tombstones = client.tables.setdefault("card_tombstones", [])
+    cutoff = datetime.now(timezone.utc).timestamp() - keep_seconds
+    pruned = [row for row in tombstones if datetime.fromisoformat(row["deleted_at"]).timestamp() < cutoff]
+    tombstones[:] = [row for row in tombstones if row not in pruned]
+    client.pruned_version = max([client.pruned_version] + [row["row_version"] for row in pruned])
+    return len(pruned)
+
+
+# the database functions the fake client can call with rpc()
+FAKE_FUNCTIONS = {
+    "update_card_returning_previous": update_card_returning_previous,
+    "card_changes": card_changes,
+    "prune_card_tombstones": prune_card_tombstones,
+}
+
+
+class FakeSupabase:
+    # constructor for a fake client. every request waits latency_ms plus up to jitter_ms extra milliseconds
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.tables = {}
+        self.ids = itertools.count(1)
+        self.versions = itertools.count(1)
+        self.pruned_version = 0
+        self.lock = threading.Lock()
+        self.requests = 0
+
+    ###################################################################################################################
+    # Function that starts a query on a table, like supabase.table("cards")
+    # Parameters: the table name
+    # Returns: a FakeQuery
+    ###################################################################################################################
+    def table(self, name):
+        return FakeQuery(self, name)
+
+    ###################################################################################################################
+    # Function that starts a call of a database function, like supabase.rpc("update_card_returning_previous", {...})
+    # Parameters: the function name and its arguments
+    # Returns: a FakeRpc
+    ###################################################################################################################
+    def rpc(self, function, params=None):
+        return FakeRpc(self, function, params or {})
+
+    ###################################################################################################################
+    # Functions that mirror the real database's change tracking triggers: every written row of a tracked table gets
+    # the next row version and the current time, and every deleted row leaves a tombstone. callers hold the lock
+    # Parameters: the table and the written or deleted row
+    # Returns: void
+    ###################################################################################################################
+    def stamp(self, table, row):
+        if table in TOMBSTONE_TABLES:
+            row["row_version"] = next(self.versions)
+            row["updated_at"] = datetime.now(timezone.utc).isoformat()
+
+    def bury(self, table, row):
+        if table in TOMBSTONE_TABLES:
+            self.tables.setdefault(TOMBSTONE_TABLES[table], []).append({
+                "card_id": row["id"],
+                "owner_id": row.get("owner_id"),
+                "row_version": next(self.versions),
+                "deleted_at": datetime.now(timezone.utc).isoformat(),
+            })
+
+    ###################################################################################################################
+    # Function that sleeps for one simulated round trip
+    # Returns: void
+    ###################################################################################################################
+    def wait(self):
+        with self.lock:
+            self.requests += 1
+        delay = self.latency_ms + random.uniform(0, self.jitter_ms)
+        if delay > 0:
+            time.sleep(delay / 1000)
@@ -0,0 +1,320 @@
+######################################################################################################################
+# Project...............: Yugioh Card Library
+# Author................: Ben Stearns
+# Date..................: 12-4-25
+# Project Description...: This application creates a digital database library for storing and managing Yugioh cards
+# File Description......: defines the nearest-neighbour index of card image embeddings. The embeddings are kept in an
+#                         append-only matrix on disk (one row per stored image) so they are only computed once, and
+#                         are searched in memory: exactly for small libraries, and through an inverted file index
+#                         (the images are grouped into k-means cells and only the cells nearest the query are
+#                         scored) once exact search would get slow
+#                         Run from the project root with: python -m data_layer.image_index to (re)build the index
+#######################################################################################################################
+
+import os                               # for the index files and reading the index folder from the environment
+import threading                        # for guarding the index against concurrent requests
+import numpy as np                      # for the embedding matrix and vectorized scoring
+
+from extractors.image_embedding import EMBEDDING_SIZE, EMBEDDING_VERSION
+
+# libraries up to this many images are searched exactly (well under a millisecond). past it, only the images in the
+# cells nearest the query are scored
+EXACT_SEARCH_LIMIT = 20000
+
+# the index uses CELLS_PER_ROOT * sqrt(images) cells and scores the PROBED_CELLS cells nearest each query. more probed
+# cells find more of the true neighbours at the cost of scoring more images
+CELLS_PER_ROOT = 4
+PROBED_CELLS = 16
+
+# the cells are trained on a sample of at most TRAINING_PER_CELL images per cell, for TRAINING_ROUNDS rounds
+TRAINING_PER_CELL = 16
+TRAINING_ROUNDS = 8
+
+# the training sample is drawn from a fixed seed so the same images always give the same cells
+TRAINING_SEED = 42
+
+# how many rows the matrix holds before it first needs to grow
+INITIAL_CAPACITY = 256
+
+
+class ImageIndex:
+    # constructor for an empty index whose files live in the given folder. it is filled by ensure_loaded() and kept
+    # current by add()
+    def __init__(self, folder):
+        self.folder = folder
+        self._lock = threading.RLock()
+        self.loaded = False
+        self._exact_queries = 0
+        self._approximate_queries = 0
+        self._backfill_pending = 0
+        self._clear()
+
+    # resets every in-memory structure of the index
+    def _clear(self):
+        self._size = 0                                                 # number of rows in use
+        self._matrix = np.empty((INITIAL_CAPACITY, EMBEDDING_SIZE), dtype=np.float32)
+        self._filenames = []                                           # row -> image filename
+        self._positions = {}                                           # image filename -> row
+        self._centroids = None                                         # cell -> mean embedding, trained on demand
+        self._cells = None                                             # cell -> rows in the cell
+        self._trained_size = 0                                         # the number of rows when the cells were trained
+
+    # the files holding the embedding matrix and the image filename of each row. the embedding version is part of
+    # the names, so a change to the features starts a new index instead of mixing old and new vectors
+    def _paths(self):
+        return (os.path.join(self.folder, f"vectors-v{EMBEDDING_VERSION}.f32"),
+                os.path.join(self.folder, f"filenames-v{EMBEDDING_VERSION}.txt"))
+
+    ###################################################################################################################
+    # Function that loads the saved embeddings the first time the index is needed. images that were never embedded
+    # are added by backfill(), and searches only see the images embedded so far
+    # Returns: true if this call loaded the index, false if it was already loaded
+    ###################################################################################################################
+    def ensure_loaded(self):
+        # the lock is held while loading so an image added meanwhile waits and is added afterwards
+        with self._lock:
+            if self.loaded:
+                return False
+            self._clear()
+            self._read_files()
+            self.loaded = True
+            return True
+
+    ###################################################################################################################
+    # Function that embeds every library image the index doesn't hold yet (images stored before the index existed).
+    # images are embedded without holding the lock, so searches keep running while a large library is backfilled
+    # Parameters: a function returning the image filenames of the library, and a function that embeds an image
+    #             filename (returning None for images that can't be read)
+    # Returns: the number of images added
+    ###################################################################################################################
+    def backfill(self, loader, embed):
+        missing = [filename for filename in dict.fromkeys(loader()) if filename and filename not in self]
+        with self._lock:
+            self._backfill_pending = len(missing)
+        added = 0
+        try:
+            for filename in missing:
+                added += self.add(filename, embed(filename))
+                with self._lock:
+                    self._backfill_pending -= 1
+        finally:
+            with self._lock:
+                self._backfill_pending = 0
+        return added
+
+    # reads the saved matrix and filenames. a write that was interrupted between the two files is cut off, so the
+    # next append lines up again
+    def _read_files(self):
+        vectors_path, filenames_path = self._paths()
+        if not (os.path.exists(vectors_path) and os.path.exists(filenames_path)):
+            return
+        with open(filenames_path, encoding="utf-8") as file:
+            filenames = file.read().splitlines()
+        vectors = np.fromfile(vectors_path, dtype=np.float32)
+        count = min(len(filenames), vectors.size // EMBEDDING_SIZE)
+        if vectors.size != count * EMBEDDING_SIZE:
+            os.truncate(vectors_path, count * EMBEDDING_SIZE * vectors.itemsize)
+        if len(filenames) != count:
+            with open(filenames_path, "w", encoding="utf-8") as file:
+                file.write("".join(filename + "\n" for filename in filenames[:count]))
+        vectors = vectors[:count * EMBEDDING_SIZE].reshape(count, EMBEDDING_SIZE)
+        for filename, vector in zip(filenames, vectors):
+            if filename not in self._positions:
+                self._insert(filename, vector)
+
+    ###################################################################################################################
+    # Function that adds the embedding of a newly saved image to the index and to the files on disk
+    # Parameters: the image filename and its embedding (None is ignored)
+    # Returns: true if the image was added, false if it was already indexed, unreadable or the index isn't loaded
+    ###################################################################################################################
+    def add(self, filename, vector):
+        with self._lock:
+            # images saved before the first load are picked up by the load itself
+            if not self.loaded:
+                return False
+            return self._add(filename, vector)
+
+    # adds an image in memory and appends it to the files. callers hold the lock
+    def _add(self, filename, vector):
+        if vector is None or filename in self._positions:
+            return False
+        vector = np.asarray(vector, dtype=np.float32)
+        os.makedirs(self.folder, exist_ok=True)
+        vectors_path, filenames_path = self._paths()
+        # the vector is written before its filename, so a crash in between leaves a row that _read_files() ignores
+        with open(vectors_path, "ab") as file:
+            file.write(vector.tobytes())
+        with open(filenames_path, "a", encoding="utf-8") as file:
+            file.write(filename + "\n")
+        self._insert(filename, vector)
+        return True
+
+    # adds a row to the matrix and to its cell. callers hold the lock
+    def _insert(self, filename, vector):
+        if self._size == len(self._matrix):
+            self._matrix = np.resize(self._matrix, (2 * len(self._matrix), EMBEDDING_SIZE))
+        row = self._size
+        self._matrix[row] = vector
+        self._filenames.append(filename)
+        self._positions[filename] = row
+        self._size += 1
+        if self._cells is not None:
+            cell = int(np.argmax(self._centroids @ vector))
+            self._cells[cell] = np.append(self._cells[cell], row)
+
+    # groups the rows into cells with spherical k-means (embeddings are unit length, so the nearest centroid is the one
+    # with the largest dot product). the cells are trained again each time the index doubles in size, so they keep up
+    # with the images being added. callers hold the lock
+    def _train_cells(self):
+        matrix = self._matrix[:self._size]
+        count = max(1, int(CELLS_PER_ROOT * np.sqrt(self._size)))
+        rng = np.random.default_rng(TRAINING_SEED)
+        sample = matrix[rng.choice(self._size, min(self._size, TRAINING_PER_CELL * count), replace=False)]
+        centroids = sample[rng.choice(len(sample), count, replace=False)].copy()
+        for _ in range(TRAINING_ROUNDS):
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, np.argmax(sample @ centroids.T, axis=1), sample)
+            norms = np.linalg.norm(sums, axis=1)
+            # cells that attracted no images keep their old centroid
+            centroids[norms > 0] = sums[norms > 0] / norms[norms > 0, None]
+
+        assignments = np.argmax(matrix @ centroids.T, axis=1)
+        order = np.argsort(assignments, kind="stable")
+        starts = np.searchsorted(assignments[order], np.arange(count + 1))
+        self._centroids = centroids
+        self._cells = [order[starts[cell]:starts[cell + 1]] for cell in range(count)]
+        self._trained_size = self._size
+
+    ###################################################################################################################
+    # Function that finds the indexed images most similar to an embedding
+    # Parameters: the query embedding, how many images to return, image filenames to leave out of the results, and
+    #             optionally the only image filenames to consider (one owner's collection). restricted searches only
+    #             score those images, so their cost follows the size of the collection rather than of the whole index
+    # Returns: a list of (image filename, similarity) tuples, most similar first
+    ###################################################################################################################
+    def search(self, vector, k, exclude=(), within=None):
+        vector = np.asarray(vector, dtype=np.float32)
+        wanted = k + len(exclude)
+        with self._lock:
+            allowed = None
+            if within is not None:
+                allowed = np.fromiter((self._positions[filename] for filename in within if filename in self._positions),
+                                      dtype=np.int64)
+                if len(allowed) == 0:
+                    return []
+
+            size = self._size if allowed is None else len(allowed)
+            if size <= EXACT_SEARCH_LIMIT:
+                rows = allowed
+                self._exact_queries += 1
+            else:
+                rows = self._candidates(vector)
+                if allowed is not None:
+                    rows = np.intersect1d(rows, allowed, assume_unique=True)
+                # too few candidates means the query fell in sparse cells, so score everything instead
+                if len(rows) < wanted:
+                    rows = allowed
+                    self._exact_queries += 1
+                else:
+                    self._approximate_queries += 1
+            scores = (self._matrix[:self._size] if rows is None else self._matrix[rows]) @ vector
+            top = np.argpartition(-scores, wanted - 1)[:wanted] if wanted < len(scores) else np.arange(len(scores))
+            top = top[np.argsort(-scores[top])]
+            matches = top if rows is None else rows[top]
+            results = [(self._filenames[row], float(score)) for row, score in zip(matches, scores[top])]
+            return [(filename, score) for filename, score in results if filename not in exclude][:k]
+
+    # collects the rows of the cells nearest the query. callers hold the lock
+    def _candidates(self, vector):
+        if self._cells is None or self._size >= 2 * self._trained_size:
+            self._train_cells()
+        scores = self._centroids @ vector
+        probed = min(PROBED_CELLS, len(scores))
+        nearest = np.argpartition(-scores, probed - 1)[:probed]
+        return np.concatenate([self._cells[cell] for cell in nearest])
+
+    ###################################################################################################################
+    # Function that looks up the saved embedding of an image
+    # Parameters: the image filename
+    # Returns: a copy of the embedding, or None if the image isn't indexed
+    ###################################################################################################################
+    def vector(self, filename):
+        with self._lock:
+            row = self._positions.get(filename)
+            return None if row is None else self._matrix[row].copy()
+
+    ###################################################################################################################
+    # Function that rewrites the files with only the given images, dropping the embeddings of removed images
+    # Parameters: the image filenames to keep
+    # Returns: the number of embeddings dropped
+    ###################################################################################################################
+    def compact(self, keep):
+        keep = set(keep)
+        with self._lock:
+            rows = [row for row, filename in enumerate(self._filenames) if filename in keep]
+            dropped = self._size - len(rows)
+            vectors = self._matrix[rows].copy()
+            filenames = [self._filenames[row] for row in rows]
+
+            # write the new files next to the old ones and swap them in, so a crash never loses the index
+            os.makedirs(self.folder, exist_ok=True)
+            vectors_path, filenames_path = self._paths()
+            vectors.tofile(vectors_path + ".tmp")
+            with open(filenames_path + ".tmp", "w", encoding="utf-8") as file:
+                file.write("".join(filename + "\n" for filename in filenames))
+            os.replace(vectors_path + ".tmp", vectors_path)
+            os.replace(filenames_path + ".tmp", filenames_path)
+
+            self._clear()
+            for filename, vector in zip(filenames, vectors):
+                self._insert(filename, vector)
+            return dropped
+
+    ###################################################################################################################
+    # Function that copies the index's metrics for reporting
+    # Returns: a dictionary of the number of indexed images, how many are still waiting to be backfilled and how many
+    #          searches were exact or approximate
+    ###################################################################################################################
+    def snapshot(self):
+        with self._lock:
+            return {
+                "images": self._size,
+                "backfill_pending": self._backfill_pending,
+                "exact_searches": self._exact_queries,
+                "approximate_searches": self._approximate_queries,
+            }
+
+    # returns true if the image is indexed
+    def __contains__(self, filename):
+        with self._lock:
+            return filename in self._positions
+
+    # returns the number of indexed images
+    def __len__(self):
+        with self._lock:
+            return self._size
+
+
+# the index shared by every request of the app
+image_index = ImageIndex(os.getenv("IMAGE_INDEX_DIR", os.path.join("data_layer", "image_index")))
+
+
+# if the file is run directly, embed every library image that isn't indexed yet and drop the embeddings of images
+# no card uses anymore
+if __name__ == "__main__":
+    from data_layer.supabase_client import supabase
+    from data_layer.image_store import image_path
+    from extractors.image_embedding import embed_file
+
+    upload_folder = os.path.join("static", "images", "cards")
+    rows = supabase.table("cards").select("image_filename").execute().data or []
+    library_images = sorted({row["image_filename"] for row in rows if row.get("image_filename")})
+
+    def embed(filename):
+        path = image_path(filename, upload_folder)
+        return embed_file(path) if path else None
+
+    image_index.ensure_loaded()
+    image_index.backfill(lambda: library_images, embed)
+    dropped = image_index.compact(library_images)
+    print(f"Indexed {len(image_index)} image(s), dropped {dropped} unused embedding(s).")
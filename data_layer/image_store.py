@@ -0,0 +1,200 @@
+######################################################################################################################
+# Project...............: Yugioh Card Library
+# Author................: Ben Stearns
+# Date..................: 12-4-25
+# Project Description...: This application creates a digital database library for storing and managing Yugioh cards
+# File Description......: defines a content-addressed storage layer for card images. Images are saved under the
+#                         sha256 hash of their bytes inside sharded sub-folders (ab/cd/abcd....png), so identical
+#                         uploads are only stored once and two different files can never overwrite each other
+#######################################################################################################################
+
+import hashlib                                  # for hashing image bytes into a content address
+import os                                       # for file operations
+import sys                                      # for reading command line arguments when run as a script
+import tempfile                                 # for writing new images atomically
+import time                                     # for the garbage collection grace period
+from concurrent.futures import ThreadPoolExecutor   # for releasing the images of bulk deletes in the background
+
+# defines how many hex characters each shard folder uses and how many levels of shard folders there are
+SHARD_WIDTH = 2
+SHARD_DEPTH = 2
+
+# defines how old (in seconds) an unreferenced image must be before garbage collection removes it
+# scanned images are saved before the user confirms them, so fresh files are given time to be claimed by a row
+GC_GRACE_SECONDS = 60 * 60
+
+# a single background thread releases the images of bulk writes and embeds images for the image index, so passes
+# never race each other over the same file and an image is always embedded before a later write releases it
+_image_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="image-work")
+
+#######################################################################################################################
+# Function that builds the relative, sharded path an image is stored under
+# Parameters: the sha256 hex digest of the image and the image's file extension
+# Returns: the relative path using forward slashes so it can be used directly in a static url
+#######################################################################################################################
+def content_path(digest, extension):
+    shards = [digest[i * SHARD_WIDTH:(i + 1) * SHARD_WIDTH] for i in range(SHARD_DEPTH)]
+    return "/".join(shards + [f"{digest}.{extension}"])
+
+#######################################################################################################################
+# Function that checks whether a stored image filename is content-addressed rather than a legacy flat filename
+# Parameters: the image filename saved in a card row
+# Returns: true if the filename lives inside the shard folders
+#######################################################################################################################
+def is_content_addressed(filename):
+    return bool(filename) and filename.count("/") == SHARD_DEPTH
+
+#######################################################################################################################
+# Function that stores raw image bytes under their content hash
+# Parameters: the image bytes, the file extension to save with, and the root upload folder
+# Returns: a tuple of (relative filename, True if the file was newly written / False if it already existed)
+#######################################################################################################################
+def store_bytes(data, extension, upload_folder):
+    digest = hashlib.sha256(data).hexdigest()
+    relative = content_path(digest, extension.lower())
+    full_path = os.path.join(upload_folder, *relative.split("/"))
+
+    # identical bytes are already stored, so there is nothing to write
+    if os.path.exists(full_path):
+        return relative, False
+
+    # write to a temporary file in the same folder and rename it so readers never see a half written image
+    folder = os.path.dirname(full_path)
+    os.makedirs(folder, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=folder, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as tmp:
+            tmp.write(data)
+        os.replace(tmp_path, full_path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return relative, True
+
+#######################################################################################################################
+# Function that stores an uploaded werkzeug file under its content hash
+# Parameters: the uploaded file object and the root upload folder
+# Returns: a tuple of (relative filename, True if the file was newly written / False if it already existed)
+#######################################################################################################################
+def store_upload(file, upload_folder):
+    # only the extension of the user's filename is kept (already checked by allowed_file). the rest of the name is
+    # replaced by the content hash, so no sanitizing of the original filename is needed
+    extension = file.filename.rsplit(".", 1)[1].lower()
+    return store_bytes(file.read(), extension, upload_folder)
+
+#######################################################################################################################
+# Function that returns the full path on disk of a stored image
+# Parameters: the relative image filename saved in a card row and the root upload folder
+# Returns: the full filepath, or None if the filename would point outside the upload folder
+#######################################################################################################################
+def image_path(filename, upload_folder):
+    # filenames can come back from hidden form fields, so never follow one out of the upload folder
+    root = os.path.abspath(upload_folder)
+    full_path = os.path.abspath(os.path.join(root, *filename.split("/")))
+    if not full_path.startswith(root + os.sep):
+        return None
+    return full_path
+
+#######################################################################################################################
+# Function that removes an image file from disk (and any shard folders left empty) without checking references
+# Parameters: the relative image filename and the root upload folder
+# Returns: true if a file was removed
+#######################################################################################################################
+def discard_image(filename, upload_folder):
+    if not filename:
+        return False
+    full_path = image_path(filename, upload_folder)
+    if full_path is None or not os.path.exists(full_path):
+        return False
+    os.remove(full_path)
+
+    # tidy up shard folders that no longer hold any images
+    folder = os.path.dirname(full_path)
+    root = os.path.abspath(upload_folder)
+    while os.path.abspath(folder) != root and not os.listdir(folder):
+        os.rmdir(folder)
+        folder = os.path.dirname(folder)
+    return True
+
+#######################################################################################################################
+# Function that releases many images at once after their rows were deleted or changed. One query finds which of the
+# images are still referenced by other rows, and every other image is removed
+# Parameters: the supabase client, the relative image filenames and the root upload folder
+# Returns: a list of the relative filenames that were removed
+#######################################################################################################################
+def release_images(client, filenames, upload_folder):
+    filenames = {filename for filename in filenames if filename}
+    if not filenames:
+        return []
+    rows = client.table("cards").select("image_filename").in_("image_filename", sorted(filenames)).execute().data
+    referenced = {row["image_filename"] for row in rows or []}
+    return [filename for filename in sorted(filenames - referenced) if discard_image(filename, upload_folder)]
+
+#######################################################################################################################
+# Function that runs release_images() on the background thread so the request that deleted the rows returns at once.
+# Images a failed pass leaves behind are picked up by the next garbage collection
+# Parameters: the supabase client, the relative image filenames and the root upload folder
+# Returns: a future holding the list of removed filenames
+#######################################################################################################################
+def release_images_later(client, filenames, upload_folder):
+    def release():
+        try:
+            return release_images(client, filenames, upload_folder)
+        except Exception as e:
+            print(f"IMAGE RELEASE ERROR: {e}")
+            return []
+    return _image_executor.submit(release)
+
+#######################################################################################################################
+# Function that runs other work on stored images (like embedding them for the image index) on the same background
+# thread as the releases, in the order it was queued
+# Parameters: a function taking no arguments and a label for its error messages
+# Returns: a future holding the function's result, or None if it failed
+#######################################################################################################################
+def run_image_task_later(task, label):
+    def run():
+        try:
+            return task()
+        except Exception as e:
+            print(f"{label} ERROR: {e}")
+            return None
+    return _image_executor.submit(run)
+
+#######################################################################################################################
+# Function that removes content-addressed images no card row references. Legacy flat files in the root of the
+# upload folder are left alone since they were not created by this storage layer
+# Parameters: the supabase client, the root upload folder, and the grace period for recently written files
+# Returns: a list of the relative filenames that were removed
+#######################################################################################################################
+def collect_garbage(client, upload_folder, grace_seconds=GC_GRACE_SECONDS):
+    # fetch every image filename that is still referenced by a card
+    rows = client.table("cards").select("image_filename").execute().data or []
+    referenced = {row["image_filename"] for row in rows if row.get("image_filename")}
+
+    removed = []
+    cutoff = time.time() - grace_seconds
+    for folder, _, filenames in os.walk(upload_folder):
+        relative_folder = os.path.relpath(folder, upload_folder).replace(os.sep, "/")
+        if relative_folder.count("/") != SHARD_DEPTH - 1 or relative_folder == ".":
+            continue
+        for filename in filenames:
+            relative = f"{relative_folder}/{filename}"
+            full_path = os.path.join(folder, filename)
+            # skip referenced images and images too new to have been confirmed by the user yet
+            if relative in referenced or os.path.getmtime(full_path) > cutoff:
+                continue
+            # leftover temporary files from an interrupted write are removed the same way as orphans
+            discard_image(relative, upload_folder)
+            removed.append(relative)
+    return removed
+
+
+# if the file is run directly, garbage collect orphaned images. pass --now to skip the grace period
+if __name__ == "__main__":
+    from data_layer.supabase_client import supabase
+    grace = 0 if "--now" in sys.argv else GC_GRACE_SECONDS
+    orphans = collect_garbage(supabase, os.path.join("static", "images", "cards"), grace)
+    print(f"Removed {len(orphans)} orphaned image(s).")
+    for orphan in orphans:
+        print(f"  {orphan}")
@@ -0,0 +1,75 @@
+######################################################################################################################
+# Project...............: Yugioh Card Library
+# Author................: Ben Stearns
+# Date..................: 12-4-25
+# Project Description...: This application creates a digital database library for storing and managing Yugioh cards
+# File Description......: defines the version of each owner's card library that pages built from it are validated
+#                         against. It is the highest row_version the database has handed out to the owner's cards
+#                         (so every copy of the app agrees on it), plus a count of the writes this copy made since,
+#                         until the next sync with the database takes them in. A write to one collection leaves the
+#                         cached pages of every other one valid
+#######################################################################################################################
+
+import threading                        # for guarding the versions against concurrent requests
+import time                             # for recording when a library last changed
+import uuid                             # for telling local writes from different runs of the app apart
+
+# the local write counts live in this process, so the boot id is part of the tags that include one. that way another
+# copy of the app, or a restarted one, never confirms a tag whose local writes it hasn't made
+BOOT_ID = uuid.uuid4().hex[:8]
+
+_lock = threading.Lock()
+_started = time.time()
+_versions = {}                          # owner id -> [database version, local writes, unix time of last change]
+
+#######################################################################################################################
+# Function that reads an owner's version entry, adding it if needed. the caller holds the lock
+# Parameters: the owner id
+# Returns: the owner's [database version, local writes, last change] list
+#######################################################################################################################
+def _entry(owner_id):
+    return _versions.setdefault(owner_id, [0, 0, _started])
+
+#######################################################################################################################
+# Function that records a write this copy of the app made to an owner's library
+# Parameters: the owner id
+# Returns: the number of local writes since the database version last moved
+#######################################################################################################################
+def bump_library_version(owner_id):
+    with _lock:
+        entry = _entry(owner_id)
+        entry[1] += 1
+        entry[2] = time.time()
+        return entry[1]
+
+#######################################################################################################################
+# Function that records the database version an owner's library was loaded or synced up to. local writes are always
+# given a newer row_version, so a sync that takes them in moves the version and their count starts over
+# Parameters: the owner id and the highest row_version the owner's card cache has seen
+# Returns: void
+#######################################################################################################################
+def record_database_version(owner_id, version):
+    with _lock:
+        entry = _entry(owner_id)
+        if entry[0] != version:
+            entry[:] = [version, 0, time.time()]
+
+#######################################################################################################################
+# Function that reads the current version of an owner's library
+# Parameters: the owner id
+# Returns: a tuple of (database version, local writes, unix timestamp of the last change, or of the app's start)
+#######################################################################################################################
+def current_library_version(owner_id):
+    with _lock:
+        return tuple(_entry(owner_id))
+
+#######################################################################################################################
+# Function that builds a version tag that is unique across owners, copies and restarts of the app. without local
+# writes it only depends on the database, so every copy of the app validates the others' tags
+# Parameters: the owner id and optional extra parts (like a card id) that make the tag specific to one page
+# Returns: the tag as a string
+#######################################################################################################################
+def library_version_tag(owner_id, *parts):
+    version, local_writes, _ = current_library_version(owner_id)
+    tag = [owner_id, str(version)] + ([f"{BOOT_ID}.{local_writes}"] if local_writes else [])
+    return "-".join(tag + [str(part) for part in parts])
@@ -0,0 +1,98 @@
+################################################################################
+# Supabase Database Migration Script
+# Upgrades an existing Supabase 'cards' table in place to the schema the app
+# expects, keeping every card. Each step can be run again safely, so the script
+# can be re-run after any update of the app
+# Run from the project root with: python -m data_layer.migrate_supabase_db
+################################################################################
+
+from data_layer.supabase_client import supabase   # your connection file
+from data_layer.database_functions import UPDATE_CARD_FUNCTION_SQL, CHANGE_TRACKING_SQL
+
+print("Migrating Supabase 'cards' table...\n")
+
+# ------------------------------------------------------------------------------
+# 1. OWNERS
+# Every card belongs to one owner's collection, and names are only unique
+# within a collection. Cards saved before collections existed (and their
+# tombstones) belong to 'default'. The functions taking no owner are dropped
+# since the ones created below have a new signature, and the version indexes
+# are replaced by per-owner ones
+# ------------------------------------------------------------------------------
+
+owners_sql = """
+ALTER TABLE cards ADD COLUMN IF NOT EXISTS owner_id VARCHAR(64) NOT NULL DEFAULT 'default';
+ALTER TABLE cards DROP CONSTRAINT IF EXISTS cards_name_key;
+
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'cards_owner_id_name_key') THEN
+        ALTER TABLE cards ADD CONSTRAINT cards_owner_id_name_key UNIQUE (owner_id, name);
+    END IF;
+END;
+$$;
+
+-- image files are shared by every owner, so their references are counted across owners before one is removed
+CREATE INDEX IF NOT EXISTS cards_image_filename_idx ON cards (image_filename);
+
+ALTER TABLE IF EXISTS card_tombstones ADD COLUMN IF NOT EXISTS owner_id VARCHAR(64) NOT NULL DEFAULT 'default';
+ALTER TABLE IF EXISTS card_tombstones ALTER COLUMN owner_id DROP DEFAULT;
+
+DROP FUNCTION IF EXISTS update_card_returning_previous(INTEGER, JSONB);
+DROP FUNCTION IF EXISTS card_changes(BIGINT, INTEGER);
+DROP INDEX IF EXISTS cards_row_version_idx;
+DROP INDEX IF EXISTS card_tombstones_row_version_idx;
+"""
+
+supabase.rpc("exec_sql", {"sql": owners_sql}).execute()
+print("Added 'owner_id' and made names unique per owner.")
+
+# ------------------------------------------------------------------------------
+# 2. UPDATE FUNCTION
+# The edit page updates a card and gets back the row it replaced in one round
+# trip. Without the function it falls back to a select and an update
+# ------------------------------------------------------------------------------
+
+supabase.rpc("exec_sql", {"sql": UPDATE_CARD_FUNCTION_SQL}).execute()
+print("Created function 'update_card_returning_previous'.")
+
+# ------------------------------------------------------------------------------
+# 3. ROW VERSIONS
+# Adds the row_version and updated_at columns the change feed reads. Cards saved
+# before them are numbered from the version sequence in id order, so a mirror
+# syncing from 0 receives them like any other write
+# ------------------------------------------------------------------------------
+
+row_versions_sql = """
+ALTER TABLE cards ADD COLUMN IF NOT EXISTS row_version BIGINT NOT NULL DEFAULT 0;
+ALTER TABLE cards ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT now();
+
+CREATE SEQUENCE IF NOT EXISTS card_row_version_seq;
+
+UPDATE cards SET row_version = numbered.version
+FROM (
+    SELECT id, nextval('card_row_version_seq') AS version
+    FROM (SELECT id FROM cards WHERE row_version = 0 ORDER BY id) AS unversioned
+) AS numbered
+WHERE cards.id = numbered.id;
+"""
+
+supabase.rpc("exec_sql", {"sql": row_versions_sql}).execute()
+print("Added and backfilled 'row_version' and 'updated_at'.")
+
+# ------------------------------------------------------------------------------
+# 4. CHANGE TRACKING
+# The tombstone tables, the triggers stamping every write and 'card_changes',
+# which GET /api/cards/changes calls
+# ------------------------------------------------------------------------------
+
+supabase.rpc("exec_sql", {"sql": CHANGE_TRACKING_SQL}).execute()
+print("Created change tracking (row versions, tombstones and 'card_changes').")
+
+# ------------------------------------------------------------------------------
+# 5. REFRESH SCHEMA
+# PostgREST caches the functions it can call, so it is told to reload them
+# ------------------------------------------------------------------------------
+
+supabase.rpc("exec_sql", {"sql": "NOTIFY pgrst, 'reload schema';"}).execute()
+print("\nMigration complete.")
@@ -0,0 +1,198 @@
+######################################################################################################################
+# Project...............: Yugioh Card Library
+# Author................: Ben Stearns
+# Date..................: 12-4-25
+# Project Description...: This application creates a digital database library for storing and managing Yugioh cards
+# File Description......: defines an in-memory columnar mirror of the library's numeric fields (attack and defense).
+#                         Each column is a NumPy array with a lazily rebuilt sorted index, so range filters, top-k
+#                         and multi-key sorts are answered without a round trip to the database. Each owner's
+#                         collection has its own index
+#######################################################################################################################
+
+import threading                        # for guarding the index against concurrent requests
+import numpy as np                      # for the column arrays and vectorized filtering/sorting
+
+from data_layer.owners import OwnerPartitions
+
+# the columns the index covers
+NUMERIC_COLUMNS = ("attack", "defense")
+
+# how many rows the arrays hold before they first need to grow
+INITIAL_CAPACITY = 64
+
+#######################################################################################################################
+# Function that converts a database value into the float stored in a column. cards without a value (spells, traps
+# and monsters with "?" stats) are stored as NaN, which never matches a range and always sorts last
+# Parameters: the raw value
+# Returns: the value as a float or NaN
+#######################################################################################################################
+def to_column_value(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+class NumericIndex:
+    # constructor for an empty index. it is filled by ensure_loaded() and kept current by upsert() and remove()
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.loaded = False
+        self._clear()
+
+    # resets every structure of the index
+    def _clear(self):
+        self._size = 0                                         # number of live rows at the front of the arrays
+        self._ids = np.empty(INITIAL_CAPACITY, dtype=np.int64)
+        self._columns = {column: np.empty(INITIAL_CAPACITY, dtype=np.float64) for column in NUMERIC_COLUMNS}
+        self._positions = {}                                   # card id -> row in the arrays
+        self._sorted = {}                                      # column -> row order sorted by value
+
+    ###################################################################################################################
+    # Function that builds the index from scratch the first time it's needed
+    # Parameters: a function returning every card row (with id, attack and defense)
+    # Returns: void
+    ###################################################################################################################
+    def ensure_loaded(self, loader):
+        # the lock is held while querying so a write that lands during the load waits and is applied afterwards
+        with self._lock:
+            if self.loaded:
+                return
+            self._clear()
+            for row in loader():
+                self._set_row(row)
+            self.loaded = True
+
+    ###################################################################################################################
+    # Function that drops the index so the next use rebuilds it from the database
+    # Returns: void
+    ###################################################################################################################
+    def invalidate(self):
+        with self._lock:
+            self.loaded = False
+            self._clear()
+
+    ###################################################################################################################
+    # Function that adds a card to the index or updates its values after an edit
+    # Parameters: the card row (must include id. columns missing from the row keep their indexed value)
+    # Returns: void
+    ###################################################################################################################
+    def upsert(self, row):
+        with self._lock:
+            # writes before the first load are picked up by the load itself
+            if self.loaded:
+                self._set_row(row)
+
+    ###################################################################################################################
+    # Function that removes a card from the index by moving the last row into its place
+    # Parameters: the card's database id
+    # Returns: void
+    ###################################################################################################################
+    def remove(self, card_id):
+        with self._lock:
+            if not self.loaded:
+                return
+            position = self._positions.pop(card_id, None)
+            if position is None:
+                return
+            last = self._size - 1
+            if position != last:
+                moved_id = int(self._ids[last])
+                self._ids[position] = moved_id
+                for column in NUMERIC_COLUMNS:
+                    self._columns[column][position] = self._columns[column][last]
+                self._positions[moved_id] = position
+            self._size = last
+            self._sorted.clear()
+
+    # writes a row into the arrays, growing them when full. callers hold the lock
+    def _set_row(self, row):
+        position = self._positions.get(row["id"])
+        if position is None:
+            if self._size == len(self._ids):
+                self._grow()
+            position = self._size
+            self._size += 1
+            self._ids[position] = row["id"]
+            self._positions[row["id"]] = position
+            for column in NUMERIC_COLUMNS:
+                self._columns[column][position] = np.nan
+        for column in NUMERIC_COLUMNS:
+            if column in row:
+                self._columns[column][position] = to_column_value(row[column])
+        self._sorted.clear()
+
+    # doubles the capacity of every array. callers hold the lock
+    def _grow(self):
+        capacity = len(self._ids) * 2
+        self._ids = np.resize(self._ids, capacity)
+        for column in NUMERIC_COLUMNS:
+            self._columns[column] = np.resize(self._columns[column], capacity)
+
+    # returns the live rows of a column ordered by value (NaN last), rebuilding it after writes. callers hold the lock
+    def _sorted_rows(self, column):
+        order = self._sorted.get(column)
+        if order is None:
+            order = np.argsort(self._columns[column][:self._size], kind="stable")
+            self._sorted[column] = order
+        return order
+
+    # builds a boolean mask of the rows whose value falls within [low, high]. callers hold the lock
+    def _range_mask(self, column, low, high):
+        order = self._sorted_rows(column)
+        values = self._columns[column][order]
+
+        # NaN sorts to the end, so binary search only the part of the sorted values that holds numbers
+        valid = len(values) - int(np.count_nonzero(np.isnan(values)))
+        start = 0 if low is None else int(np.searchsorted(values[:valid], low, side="left"))
+        stop = valid if high is None else int(np.searchsorted(values[:valid], high, side="right"))
+
+        mask = np.zeros(self._size, dtype=bool)
+        mask[order[start:stop]] = True
+        return mask
+
+    ###################################################################################################################
+    # Function that filters and sorts the library by its numeric columns
+    # Parameters: ranges     - a dictionary of column -> (low, high). either bound may be None for an open range
+    #             candidates - optional card ids to restrict the result to (for example the facet index's matches)
+    #             sort       - a list of (column, descending) pairs. the first pair is the primary sort key
+    #             limit      - optional number of cards to return. a single sort key uses a partial sort (top-k)
+    # Returns: a list of card ids. ties and unsorted results are ordered by card id
+    ###################################################################################################################
+    def query(self, ranges=None, candidates=None, sort=(), limit=None):
+        with self._lock:
+            mask = np.ones(self._size, dtype=bool)
+            for column, (low, high) in (ranges or {}).items():
+                mask &= self._range_mask(column, low, high)
+            if candidates is not None:
+                mask &= np.isin(self._ids[:self._size], np.fromiter(candidates, dtype=np.int64))
+
+            # start from the matching rows ordered by id so ties come out in a stable, predictable order
+            rows = np.flatnonzero(mask)
+            rows = rows[np.argsort(self._ids[rows], kind="stable")]
+
+            if sort:
+                # NaN is replaced by +inf after negating descending columns so cards without a value always sort last
+                keys = []
+                for column, descending in sort:
+                    values = self._columns[column][rows]
+                    values = -values if descending else values.copy()
+                    values[np.isnan(values)] = np.inf
+                    keys.append(values)
+
+                if limit is not None and len(sort) == 1 and limit < len(rows):
+                    # top-k: partition out the best k rows first, then only sort those
+                    best = np.argpartition(keys[0], limit - 1)[:limit]
+                    best = best[np.lexsort((best, keys[0][best]))]
+                    rows = rows[best]
+                else:
+                    # np.lexsort treats the last key as the primary one, so the keys are passed in reverse
+                    rows = rows[np.lexsort(tuple(reversed(keys)))]
+
+            if limit is not None:
+                rows = rows[:limit]
+            return self._ids[rows].tolist()
+
+
+# the indexes shared by every request of the app, one per owner
+numeric_indexes = OwnerPartitions(NumericIndex)
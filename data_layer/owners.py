@@ -0,0 +1,138 @@
+######################################################################################################################
+# Project...............: Yugioh Card Library
+# Author................: Ben Stearns
+# Date..................: 12-4-25
+# Project Description...: This application creates a digital database library for storing and managing Yugioh cards
+# File Description......: defines the owners of card collections. Every card belongs to one owner, and the in-memory
+#                         caches and indexes of the library are kept per owner, so a request only ever touches the
+#                         collection it is for. Only the most recently used owners' structures are kept in memory
+#######################################################################################################################
+
+import os                                   # for reading the number of cached owners from an environment variable
+import re                                   # for validating owner ids
+import secrets                              # for the ids of new collections
+import threading                            # for guarding the partitions against concurrent requests
+from collections import OrderedDict         # for evicting the least recently used owners
+from itsdangerous import URLSafeSerializer, BadSignature    # for signing collection keys
+
+# the owner of cards saved before collections existed, and of requests that don't pick a collection
+DEFAULT_OWNER_ID = "default"
+
+# owner ids are short slugs (the cards table stores them as VARCHAR(64))
+OWNER_ID_PATTERN = re.compile(r"[A-Za-z0-9][A-Za-z0-9_.@-]{0,63}")
+
+# how many owners' caches and indexes are kept in memory. the rest are loaded again on their next request
+MAX_CACHED_OWNERS = int(os.getenv("OWNER_CACHE_SIZE", 256))
+
+#######################################################################################################################
+# Function that validates an owner id from a form, header or session
+# Parameters: the raw value
+# Returns: the stripped owner id
+# Raises: ValueError if the id is blank or isn't a short slug
+#######################################################################################################################
+def parse_owner_id(value):
+    owner_id = (value or "").strip()
+    if not OWNER_ID_PATTERN.fullmatch(owner_id):
+        raise ValueError("Collection names can be at most 64 letters, digits and . _ @ - characters")
+    return owner_id
+
+#######################################################################################################################
+# Function that makes the id of a new collection. ids are random, so nobody can guess another collector's collection
+# Returns: the owner id
+#######################################################################################################################
+def new_owner_id():
+    return secrets.token_hex(16)
+
+#######################################################################################################################
+# Functions that build and check the key a collector opens their collection with (in another browser, or after their
+# session ended). the key is the owner id signed with the app's secret key, so only keys the app handed out open a
+# collection
+# Parameters: the owner id or key, and the app's secret key
+# Returns: the key, or the owner id the key opens
+# Raises: ValueError for a key the app didn't sign
+#######################################################################################################################
+def collection_key(owner_id, secret_key):
+    return URLSafeSerializer(secret_key, salt="collection-key").dumps(owner_id)
+
+
+def owner_from_key(key, secret_key):
+    try:
+        return parse_owner_id(URLSafeSerializer(secret_key, salt="collection-key").loads((key or "").strip()))
+    except (BadSignature, TypeError):
+        raise ValueError("That collection key isn't valid")
+
+
+class OwnerPartitions:
+    # constructor for per-owner instances of a cache or index, made by calling factory() the first time an owner is
+    # used. at most max_owners instances are kept, dropping the least recently used owner's first
+    def __init__(self, factory, max_owners=MAX_CACHED_OWNERS):
+        self.factory = factory
+        self.max_owners = max(1, max_owners)
+        self._lock = threading.Lock()
+        self._partitions = OrderedDict()        # owner id -> instance
+        self._evictions = 0
+
+    ###################################################################################################################
+    # Function that returns an owner's instance, making it if the owner has none yet
+    # Parameters: the owner id
+    # Returns: the instance
+    ###################################################################################################################
+    def get(self, owner_id):
+        with self._lock:
+            partition = self._partitions.get(owner_id)
+            if partition is None:
+                partition = self._partitions[owner_id] = self.factory()
+                while len(self._partitions) > self.max_owners:
+                    self._partitions.popitem(last=False)
+                    self._evictions += 1
+            else:
+                self._partitions.move_to_end(owner_id)
+            return partition
+
+    ###################################################################################################################
+    # Function that returns an owner's instance without making one. writes use it, since an owner whose structures
+    # aren't in memory picks the write up when they are next loaded
+    # Parameters: the owner id
+    # Returns: the instance, or None if the owner has none
+    ###################################################################################################################
+    def peek(self, owner_id):
+        with self._lock:
+            return self._partitions.get(owner_id)
+
+    ###################################################################################################################
+    # Function that drops an owner's instance so it is rebuilt on next use
+    # Parameters: the owner id
+    # Returns: the dropped instance, or None if the owner had none
+    ###################################################################################################################
+    def discard(self, owner_id):
+        with self._lock:
+            return self._partitions.pop(owner_id, None)
+
+    ###################################################################################################################
+    # Function that drops every owner's instance so they are rebuilt on next use
+    # Returns: void
+    ###################################################################################################################
+    def clear(self):
+        with self._lock:
+            self._partitions.clear()
+
+    ###################################################################################################################
+    # Function that copies the partitions' metrics for reporting
+    # Returns: a dictionary of the owners in memory and how many were dropped
+    ###################################################################################################################
+    def snapshot(self):
+        with self._lock:
+            return {"owners": len(self._partitions), "max_owners": self.max_owners, "evictions": self._evictions}
+
+    ###################################################################################################################
+    # Function that lists the owners whose instances are in memory, least recently used first
+    # Returns: a list of owner ids
+    ###################################################################################################################
+    def owners(self):
+        with self._lock:
+            return list(self._partitions)
+
+    # returns the number of owners in memory
+    def __len__(self):
+        with self._lock:
+            return len(self._partitions)
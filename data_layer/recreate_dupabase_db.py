@@ -1,10 +1,12 @@
 ################################################################################
 # Supabase Database Reset + Seed Script
 # Mirrors old SQLite behavior but works for Supabase REST/Postgres
+# Run from the project root with: python -m data_layer.recreate_dupabase_db
 ################################################################################
 
-from supabase_client import supabase   # your connection file
-from Yugioh_Card import YugiohCard
+from data_layer.supabase_client import supabase   # your connection file
+from data_layer.Yugioh_Card import YugiohCard
+from data_layer.database_functions import UPDATE_CARD_FUNCTION_SQL, CHANGE_TRACKING_SQL
 import time
 
 print("Rebuilding Supabase 'cards' table...\n")
@@ -13,29 +15,62 @@ print("Rebuilding Supabase 'cards' table...\n")
 # 1. DROP TABLE IF EXISTS
 # ------------------------------------------------------------------------------
 
-supabase.rpc("exec_sql", {"sql": "DROP TABLE IF EXISTS cards CASCADE;"}).execute()
-print("Dropped existing table (if existed).")
+supabase.rpc("exec_sql", {"sql": """
+DROP TABLE IF EXISTS cards CASCADE;
+DROP TABLE IF EXISTS card_tombstones CASCADE;
+DROP TABLE IF EXISTS card_sync_state CASCADE;
+DROP SEQUENCE IF EXISTS card_row_version_seq;
+"""}).execute()
+print("Dropped existing tables (if existed).")
 
 # ------------------------------------------------------------------------------
 # 2. RECREATE TABLE
 # ------------------------------------------------------------------------------
 
+# every card belongs to one owner's collection, and names are only unique within a collection. the unique
+# constraint's index (owner_id, name) also serves the per-owner library loads, which are ordered by name
 create_table_sql = """
 CREATE TABLE cards (
     id SERIAL PRIMARY KEY,
-    name VARCHAR(32) UNIQUE NOT NULL,
+    owner_id VARCHAR(64) NOT NULL DEFAULT 'default',
+    name VARCHAR(32) NOT NULL,
     card_type VARCHAR(32) NOT NULL,
     monster_type VARCHAR(32),
     description VARCHAR(500) NOT NULL,
     attack INTEGER,
     defense INTEGER,
     attribute VARCHAR(32),
-    image_filename VARCHAR(500)
+    image_filename VARCHAR(500),
+    row_version BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    UNIQUE (owner_id, name)
 );
+
+-- image files are shared by every owner, so their references are counted across owners before one is removed
+CREATE INDEX cards_image_filename_idx ON cards (image_filename);
 """
 
 supabase.rpc("exec_sql", {"sql": create_table_sql}).execute()
 print("Created new table 'cards'.")
+
+# ------------------------------------------------------------------------------
+# 2b. UPDATE FUNCTION
+# Updates a card and returns the row before and after the update in one round
+# trip (used by the edit page through the async data client)
+# ------------------------------------------------------------------------------
+
+supabase.rpc("exec_sql", {"sql": UPDATE_CARD_FUNCTION_SQL}).execute()
+print("Created function 'update_card_returning_previous'.")
+
+# ------------------------------------------------------------------------------
+# 2c. CHANGE TRACKING
+# Every write gives the card a new row_version and every delete leaves a
+# tombstone, so library mirrors can ask for only what changed since the
+# version they last saw (GET /api/cards/changes?since=<version>)
+# ------------------------------------------------------------------------------
+
+supabase.rpc("exec_sql", {"sql": CHANGE_TRACKING_SQL}).execute()
+print("Created change tracking (row versions, tombstones and 'card_changes').")
 print("Created new table 'cards'. Waiting for Supabase to refresh schema...")
 
 time.sleep(3)   # small pause
@@ -92,16 +127,7 @@ sample_cards = [blue_eyes, dark_magician, raigeki, mirror_force]
 
 # Insert each card into Supabase
 for card in sample_cards:
-    supabase.table("cards").insert({
-        "name": card.name,
-        "card_type": card.card_type,
-        "monster_type": card.monster_type,
-        "description": card.description,
-        "attack": card.attack,
-        "defense": card.defense,
-        "attribute": card.attribute,
-        "image_filename": card.image_filename
-    }).execute()
+    supabase.table("cards").insert(card.to_row()).execute()
 
 print("\nSeed data inserted.")
 
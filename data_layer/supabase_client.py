@@ -11,11 +11,32 @@ load_dotenv()
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 
+# SUPABASE_FAKE=1 swaps in an in-memory stand-in (used by the load tests) with an optional simulated round trip
+USE_FAKE = os.getenv("SUPABASE_FAKE", "").lower() in ("1", "true", "yes")
+
 # Create client
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+if USE_FAKE:
+    from data_layer.fake_supabase import FakeSupabase
+    supabase = FakeSupabase(
+        latency_ms=float(os.getenv("SUPABASE_FAKE_LATENCY_MS", 0)),
+        jitter_ms=float(os.getenv("SUPABASE_FAKE_JITTER_MS", 0)),
+    )
+else:
+    supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+
+# Create the async data client for concurrent queries and single round trip writes. With the stand-in it talks to a
+# local PostgREST server answering from the same in-memory tables
+from data_layer.data_client import DataClient
+if USE_FAKE:
+    from data_layer.fake_postgrest import start_server
+    data_client = DataClient(start_server(supabase), "fake-key")
+else:
+    data_client = DataClient(SUPABASE_URL, SUPABASE_KEY)
 
 # Optional: test connection
-if SUPABASE_URL and SUPABASE_KEY:
+if USE_FAKE:
+    print("Using the in-memory Supabase stand-in.")
+elif SUPABASE_URL and SUPABASE_KEY:
     print("Supabase connection loaded successfully.")
 else:
     print("Missing Supabase credentials!")
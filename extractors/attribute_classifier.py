@@ -12,6 +12,37 @@ from PIL import Image
 from preprocessing.preprocess_attribute import preprocess_attr_for_match
 
 
+# preprocessed and standardized template arrays by template folder, so the templates are only prepared once per process
+_template_cache = {}
+
+#######################################################################################################################
+# Function that loads, preprocesses and standardizes the template images in the "attributes" folder
+# Parameters: the directory containing the template images
+# Returns: a list of (label, standardized numpy array) tuples. the result is cached, so later calls are free
+#######################################################################################################################
+def load_attribute_templates(template_dir="attributes"):
+    templates = _template_cache.get(template_dir)
+    if templates is not None:
+        return templates
+
+    templates = []
+    for filename in sorted(os.listdir(template_dir)):
+        # safety code in case an unknown file extension is inside the directory of samples
+        if not filename.lower().endswith(".png"):
+            continue
+
+        label = filename.split(".")[0].upper() # get the attribute label from filename
+
+        # open sample image, preprocess, convert to numpy array, and standardize
+        template = Image.open(os.path.join(template_dir, filename))
+        template = preprocess_attr_for_match(template)
+        template_arr = np.array(template, dtype=np.float32)
+        template_arr = (template_arr - template_arr.mean()) / (template_arr.std() + 1e-6)
+        templates.append((label, template_arr))
+
+    _template_cache[template_dir] = templates
+    return templates
+
 #######################################################################################################################
 # Function that attempts to match a scanned card's attribute with base images in the "attributes" folder
 # Parameters: the cropped attribute image and directory containing template images to compare
@@ -33,19 +64,7 @@ def classify_attribute(cropped_attr_img, template_dir="attributes"):
     best_match = None
     best_score = -1.0
 
-    for filename in os.listdir(template_dir):
-        # safety code in case an unknown file extension is inside the directory of samples
-        if not filename.lower().endswith(".png"):
-            continue
-
-        label = filename.split(".")[0].upper() # get the attribute label from filename
-
-        # open sample image, preprocess, convert to numpy array, and standardize
-        template = Image.open(os.path.join(template_dir, filename))
-        template = preprocess_attr_for_match(template)
-        template_arr = np.array(template, dtype=np.float32)
-        template_arr = (template_arr - template_arr.mean()) / (template_arr.std() + 1e-6)
-
+    for label, template_arr in load_attribute_templates(template_dir):
         # calculate similarity score by multiplying the image arrays pixel by pixel and calculating the average
         # since arrays are same size after processing, this creates a similarity map of the pixels
         score = np.mean(img_arr * template_arr)
@@ -55,4 +74,4 @@ def classify_attribute(cropped_attr_img, template_dir="attributes"):
             best_score = score
             best_match = label
 
-    return best_match
\ No newline at end of file
+    return best_match
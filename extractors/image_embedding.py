@@ -0,0 +1,123 @@
+######################################################################################################################
+# Project...............: Yugioh Card Library
+# Author................: Ben Stearns
+# Date..................: 12-4-25
+# Project Description...: This application creates a digital database library for storing and managing Yugioh cards
+# File Description......: defines functions for turning a card image into a compact embedding vector so cards that
+#                         look alike (art variants, reprints, misfiled scans) can be found by comparing vectors. The
+#                         vector combines color histograms of the artwork and the whole card with a grid of gradient
+#                         orientation histograms of the artwork
+#######################################################################################################################
+
+import numpy as np
+from PIL import Image
+
+# bumped whenever the features change, so vectors saved by an older version are recomputed instead of compared
+EMBEDDING_VERSION = 1
+
+# the artwork box of a card as fractions of its size (left, upper, right, lower)
+ART_BOX = (0.12, 0.18, 0.88, 0.66)
+
+# the sizes images are shrunk to before their features are computed
+ART_SIZE = (64, 64)
+CARD_SIZE = (32, 46)
+
+# hue, saturation and value bins of the artwork and whole card color histograms
+ART_COLOR_BINS = (8, 3, 3)
+CARD_COLOR_BINS = (8, 2, 2)
+
+# the artwork is split into a GRADIENT_CELLS x GRADIENT_CELLS grid with GRADIENT_BINS orientations per cell
+GRADIENT_CELLS = 4
+GRADIENT_BINS = 8
+
+# how much each block of features counts towards the similarity. the whole card's colors mostly tell the card's
+# frame (monster, spell, trap) apart, so they count for less than the artwork
+BLOCK_WEIGHTS = (1.0, 0.5, 1.0)
+
+# the length of every embedding
+EMBEDDING_SIZE = (int(np.prod(ART_COLOR_BINS)) + int(np.prod(CARD_COLOR_BINS))
+                  + GRADIENT_CELLS * GRADIENT_CELLS * GRADIENT_BINS)
+
+#######################################################################################################################
+# Function that scales a block of features to unit length
+# Parameters: the feature array
+# Returns: the normalized array (all zeros stay zeros)
+#######################################################################################################################
+def normalize(features):
+    norm = np.linalg.norm(features)
+    return features / norm if norm > 0 else features
+
+#######################################################################################################################
+# Function that computes a color histogram in HSV space. the square root of the bin shares is used so a few dominant
+# colors don't drown out the rest (comparing these with a dot product is the Hellinger similarity)
+# Parameters: the RGB image and the number of hue, saturation and value bins
+# Returns: the histogram as a unit-length float32 array
+#######################################################################################################################
+def color_histogram(img, bins):
+    hsv = np.asarray(img.convert("HSV"), dtype=np.uint16).reshape(-1, 3)
+    hue = hsv[:, 0] * bins[0] // 256
+    saturation = hsv[:, 1] * bins[1] // 256
+    value = hsv[:, 2] * bins[2] // 256
+    cells = (hue * bins[1] + saturation) * bins[2] + value
+    counts = np.bincount(cells, minlength=int(np.prod(bins))).astype(np.float32)
+    return normalize(np.sqrt(counts / counts.sum()))
+
+#######################################################################################################################
+# Function that computes a grid of gradient orientation histograms (a small HOG descriptor), which describes the shapes
+# in the artwork independently of its colors
+# Parameters: the grayscale image
+# Returns: the histograms as a unit-length float32 array
+#######################################################################################################################
+def gradient_histogram(img):
+    pixels = np.asarray(img, dtype=np.float32)
+    gx = np.zeros_like(pixels)
+    gy = np.zeros_like(pixels)
+    gx[:, 1:-1] = pixels[:, 2:] - pixels[:, :-2]
+    gy[1:-1, :] = pixels[2:, :] - pixels[:-2, :]
+    magnitude = np.hypot(gx, gy)
+
+    # orientations are unsigned (0 to pi), so an edge counts the same whichever side is brighter
+    orientation = np.arctan2(gy, gx) % np.pi
+    orientation_bin = np.minimum((orientation / np.pi * GRADIENT_BINS).astype(np.int64), GRADIENT_BINS - 1)
+
+    height, width = pixels.shape
+    rows = np.arange(height) * GRADIENT_CELLS // height
+    columns = np.arange(width) * GRADIENT_CELLS // width
+    cell = rows[:, None] * GRADIENT_CELLS + columns[None, :]
+    histogram = np.bincount((cell * GRADIENT_BINS + orientation_bin).ravel(), weights=magnitude.ravel(),
+                            minlength=GRADIENT_CELLS * GRADIENT_CELLS * GRADIENT_BINS)
+    return normalize(histogram.astype(np.float32))
+
+#######################################################################################################################
+# Function that computes the embedding of a card image
+# Parameters: the card image (any mode or size)
+# Returns: a unit-length float32 array of EMBEDDING_SIZE values. the dot product of two embeddings is their
+#          similarity, from 0 (nothing alike) to 1 (identical features)
+#######################################################################################################################
+def embed_image(img):
+    img = img.convert("RGB")
+    width, height = img.size
+    art_box = (int(ART_BOX[0] * width), int(ART_BOX[1] * height), int(ART_BOX[2] * width), int(ART_BOX[3] * height))
+    art = img.crop(art_box).resize(ART_SIZE, Image.BILINEAR)
+    card = img.resize(CARD_SIZE, Image.BILINEAR)
+
+    blocks = (
+        color_histogram(art, ART_COLOR_BINS),
+        color_histogram(card, CARD_COLOR_BINS),
+        gradient_histogram(art.convert("L")),
+    )
+    return normalize(np.concatenate([weight * block for weight, block in zip(BLOCK_WEIGHTS, blocks)]))
+
+#######################################################################################################################
+# Function that computes the embedding of a stored card image
+# Parameters: the full path of the image
+# Returns: the embedding, or None if the image is missing or can't be decoded
+#######################################################################################################################
+def embed_file(path):
+    try:
+        with Image.open(path) as img:
+            # decoding a shrunken copy is enough for the features and much faster for large photos
+            img.draft("RGB", (CARD_SIZE[0] * 8, CARD_SIZE[1] * 8))
+            return embed_image(img)
+    except (OSError, ValueError):
+        return None
@@ -7,7 +7,7 @@
 #                         high confidence words
 #######################################################################################################################
 
-import pytesseract
+from extractors.ocr_transport import image_to_data
 
 #######################################################################################################################
 # Function that performs ocr on an image and return the text extracted as a dictionary
@@ -16,12 +16,13 @@ import pytesseract
 #######################################################################################################################
 def ocr_data(img, config=""):
     """Return tesseract data as a dictionary to inspect word confidences."""
-    # Use the default engine mode for tesseract since it's more accurate
-    # append any optional configurations
-    cfg = ("--oem 3 " + config).strip()
+    # Use the default engine mode for tesseract since it's more accurate, unless the configuration (like a field's
+    # OCR profile) chooses its own engine mode. append any optional configurations
+    cfg = config.strip() if "--oem" in config else ("--oem 3 " + config).strip()
 
     # perform ocr to get each word detected, output as a dictionary instead of plain text, pass in configurations
-    return pytesseract.image_to_data(img, output_type=pytesseract.Output.DICT, config=cfg)
+    # the image is handed to tesseract uncompressed (see ocr_transport) rather than as a temporary PNG file
+    return image_to_data(img, config=cfg)
 
 #######################################################################################################################
 # Function that takes data returned by ocr and only keeps words that pass a certain confidence level
@@ -54,3 +55,20 @@ def ocr_text_from_data(data, min_conf=60):
 
     # join the list together with a space separator
     return " ".join(words).strip()
+
+#######################################################################################################################
+# Function that lists the confidence level of every word in ocr data
+# Parameters: the ocr data
+# Returns: a list of confidence levels (0-100), one per non-empty word
+#######################################################################################################################
+def word_confidences(data):
+    confidences = []
+    for index, word in enumerate(data.get('text', [])):
+        if not word.strip():
+            continue
+        # tesseract sometimes returns levels as strings or decimals, and unreadable levels count as no confidence
+        try:
+            confidences.append(int(float(data['conf'][index])))
+        except (TypeError, ValueError, IndexError, KeyError):
+            confidences.append(-1)
+    return confidences
@@ -0,0 +1,204 @@
+######################################################################################################################
+# Project...............: Yugioh Card Library
+# Author................: Ben Stearns
+# Date..................: 12-4-25
+# Project Description...: This application creates a digital database library for storing and managing Yugioh cards
+# File Description......: defines per-field tesseract profiles. Each card region can only hold a narrow kind of text
+#                         (a known monster type, an ATK/DEF number pair, a card name), so each profile narrows
+#                         tesseract's search with a page segmentation mode, character whitelist, and generated
+#                         user-words/user-patterns files
+#######################################################################################################################
+
+import hashlib                          # for naming generated word lists after their contents
+import os                               # for writing the generated word lists
+import re                               # for splitting names into words
+import threading                        # for guarding the library names against concurrent requests
+
+from data_layer.owners import OwnerPartitions
+from utils.constants import KNOWN_TYPES
+
+# folder the generated user-words/user-patterns files are written to. it is relative to the project root (like the
+# "attributes" folder) because tesseract's config is split on spaces and absolute paths on Windows often hold spaces
+PROFILE_DIR = "ocr_profiles"
+
+# words that appear on the type line next to the monster type
+TYPE_LINE_WORDS = ["EFFECT", "NORMAL", "FUSION", "RITUAL", "SYNCHRO", "XYZ", "PENDULUM", "LINK", "TUNER", "FLIP",
+                   "TOON", "SPIRIT", "UNION", "GEMINI"]
+
+
+class OcrProfile:
+    # constructor for a profile. words and patterns are lists of strings written to files the first time they're used
+    def __init__(self, name, oem=3, psm=7, whitelist=None, words=None, patterns=None, use_dictionaries=True,
+                 replace_files=False):
+        self.name = name
+        self.oem = oem                                  # 1 = LSTM engine only, 3 = tesseract's default choice
+        self.psm = psm                                  # 6 = block of text, 7 = single line
+        self.whitelist = whitelist                      # the only characters tesseract may output
+        self.words = words                              # known words that are favoured over similar looking strings
+        self.patterns = patterns                        # user-patterns like ATK/\d\d\d\d
+        self.use_dictionaries = use_dictionaries        # False turns off the English system/frequency dictionaries
+        self.replace_files = replace_files              # True keeps one word list file that is replaced on changes
+        self._config = None
+
+    ###################################################################################################################
+    # Function that builds the tesseract command line configuration for the profile
+    # Returns: the configuration string passed to pytesseract
+    ###################################################################################################################
+    def config(self):
+        if self._config is None:
+            parts = [f"--oem {self.oem}", f"--psm {self.psm}"]
+            if self.words:
+                path = write_list_file(self.name, "user-words", self.words, self.replace_files)
+                parts.append(f"--user-words {path}")
+            if self.patterns:
+                path = write_list_file(self.name, "user-patterns", self.patterns, self.replace_files)
+                parts.append(f"--user-patterns {path}")
+            if not self.use_dictionaries:
+                parts.append("-c load_system_dawg=0 -c load_freq_dawg=0")
+            if self.whitelist:
+                parts.append(f"-c tessedit_char_whitelist={self.whitelist}")
+            self._config = " ".join(parts)
+        return self._config
+
+    # define a function to return a string-friendly representation of a profile for debugging purposes if needed
+    def __repr__(self):
+        return f"OcrProfile(name='{self.name}', config='{self.config()}')"
+
+#######################################################################################################################
+# Function that writes a user-words or user-patterns file. Fixed lists go to a file named after a hash of their
+# contents, which is only ever written once. Lists that change (like a collection's card names) keep a single file
+# that is replaced atomically, so a running tesseract call reads either the old or the new list and old lists don't
+# pile up
+# Parameters: the profile name, the kind of list, the entries, and whether the list's file is replaced on changes
+# Returns: the relative path of the file
+#######################################################################################################################
+def write_list_file(profile_name, kind, entries, replace=False):
+    content = "\n".join(sorted(set(entries))) + "\n"
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    if not replace:
+        digest = hashlib.sha1(content.encode("utf-8")).hexdigest()[:10]
+        path = f"{PROFILE_DIR}/{profile_name}-{digest}.{kind}"
+        if not os.path.exists(path):
+            with open(path, "w", encoding="utf-8") as file:
+                file.write(content)
+        return path
+
+    path = f"{PROFILE_DIR}/{profile_name}.{kind}"
+    if not os.path.exists(path):
+        # earlier versions wrote a hash-named file for every list the profile ever had. the collections' name
+        # profiles (name.<owner id>) replace the single name profile those files belonged to
+        base_name = profile_name.split(".")[0]
+        for filename in os.listdir(PROFILE_DIR):
+            if re.fullmatch(rf"{re.escape(base_name)}-[0-9a-f]{{10}}\.{kind}", filename):
+                os.remove(f"{PROFILE_DIR}/{filename}")
+    temporary = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+    with open(temporary, "w", encoding="utf-8") as file:
+        file.write(content)
+    try:
+        os.replace(temporary, path)
+    except PermissionError:
+        # Windows won't replace a file a tesseract call has open. the old list is kept until the next change
+        os.remove(temporary)
+    return path
+
+#######################################################################################################################
+# Function that builds the user-words for the type line from KNOWN_TYPES
+# Returns: a list of words
+#######################################################################################################################
+def type_words():
+    words = set(TYPE_LINE_WORDS)
+    for known_type in KNOWN_TYPES:
+        words.add(known_type)
+        words.update(known_type.replace("-", " ").split())
+    return sorted(words)
+
+#######################################################################################################################
+# Function that builds the user-words for card names from the names already in the library
+# Parameters: the card names
+# Returns: a list of words in the upper case and capitalized forms printed on cards
+#######################################################################################################################
+def name_words(names):
+    words = set()
+    for name in names:
+        for word in re.findall(r"[A-Za-z][A-Za-z'\-]+", name or ""):
+            words.add(word.upper())
+            words.add(word.capitalize())
+    return sorted(words)
+
+
+# every profile runs the LSTM engine only (oem 1). the default choice (oem 3) lets tesseract use the legacy engine when
+# its data is installed, so results would depend on which tessdata files the machine has. the whitelists need
+# tesseract 4.1 or newer with the LSTM engine
+
+# profile for the card's name: a single line of title-cased words. card names are made-up words, so the English
+# dictionaries would pull them towards real words. scans favour the words of their collection's own names through the
+# configuration built by name_profile_config() instead
+NAME_PROFILE = OcrProfile("name", oem=1, psm=7, use_dictionaries=False)
+
+# profile for the type line: only the bracketed monster type and card kind, ex: [DRAGON/EFFECT]. every word it can
+# hold is in its user-words, so the English dictionaries are off
+TYPE_PROFILE = OcrProfile(
+    "type", oem=1, psm=7, use_dictionaries=False,
+    whitelist="ABCDEFGHIJKLMNOPQRSTUVWXYZ[]/-",
+    words=type_words(),
+    patterns=[r"[\A\*]", r"[\A\*/\A\*]", r"[\A\*/\A\*/\A\*]", r"[\A\*-\A\*/\A\*]"],
+)
+
+# profile for the description: ordinary English sentences, so the dictionaries stay on
+DESCRIPTION_PROFILE = OcrProfile("description", oem=1, psm=6)
+
+# profile for ATK/DEF: two labels and two numbers of up to 4 digits (or ? for cards like The Winged Dragon of Ra).
+# there are no English words to look up, so the dictionaries are off
+ATKDEF_PROFILE = OcrProfile(
+    "atkdef", oem=1, psm=7, use_dictionaries=False,
+    whitelist="ATKDEF/0123456789?",
+    words=["ATK", "DEF"],
+    patterns=[r"ATK/\d\*", r"DEF/\d\*", r"ATK/?", r"DEF/?"],
+)
+
+# every profile by field name
+PROFILES = {
+    "name": NAME_PROFILE,
+    "type": TYPE_PROFILE,
+    "description": DESCRIPTION_PROFILE,
+    "atkdef": ATKDEF_PROFILE,
+}
+
+
+
+class LibraryNameProfile:
+    # constructor for the name profile of one collection. its user-words are the collection's card names, which are
+    # given to config()
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._names = None
+        self._config = None
+
+    ###################################################################################################################
+    # Function that builds the name profile's configuration with the collection's card names as user-words. the
+    # collection's word list file is only written again when its names changed
+    # Parameters: the owner id of the collection and its card names
+    # Returns: the configuration string passed to pytesseract
+    ###################################################################################################################
+    def config(self, owner_id, names):
+        names = frozenset(name for name in names if name)
+        with self._lock:
+            if self._config is None or names != self._names:
+                profile = OcrProfile(f"{NAME_PROFILE.name}.{owner_id}", oem=NAME_PROFILE.oem, psm=NAME_PROFILE.psm,
+                                     words=name_words(names), use_dictionaries=NAME_PROFILE.use_dictionaries,
+                                     replace_files=True)
+                self._names, self._config = names, profile.config()
+            return self._config
+
+
+# the name profiles of the collections scanned recently, one per owner
+library_name_profiles = OwnerPartitions(LibraryNameProfile)
+
+#######################################################################################################################
+# Function that builds the name profile configuration for scanning into a collection, so the collection's own card
+# names are favoured and no other collection's names are
+# Parameters: the owner id of the collection and its card names
+# Returns: the configuration string, which is passed to the name reader of a scan
+#######################################################################################################################
+def name_profile_config(owner_id, names):
+    return library_name_profiles.get(owner_id).config(owner_id, names)
@@ -0,0 +1,109 @@
+######################################################################################################################
+# Project...............: Yugioh Card Library
+# Author................: Ben Stearns
+# Date..................: 12-4-25
+# Project Description...: This application creates a digital database library for storing and managing Yugioh cards
+# File Description......: defines how preprocessed regions are handed to tesseract. pytesseract saves every image as
+#                         a compressed PNG in the temp folder for tesseract to decode again. The transports here send
+#                         the pixels uncompressed (PNM: a short header followed by the raw pixels) instead, either
+#                         through tesseract's stdin or through a file in a RAM-backed folder
+#                         Choose one with OCR_TRANSPORT=stdin (default), tmpfs or png (pytesseract's own behaviour)
+#######################################################################################################################
+
+import io                                   # for encoding images in memory
+import os                                   # for the transport settings and temporary files
+import shlex                                # for splitting tesseract configurations into arguments
+import subprocess                           # for running tesseract
+import tempfile                             # for the RAM-backed temporary files
+from errno import ENOENT                    # for telling a missing tesseract apart from other launch errors
+
+import pytesseract
+from PIL import Image
+from pytesseract.pytesseract import TesseractError, TesseractNotFoundError
+from pytesseract.pytesseract import file_to_dict, get_errors, subprocess_args
+
+from utils.ocr_scheduler import tesseract_lease
+
+# the transports that can be chosen
+TRANSPORTS = ("stdin", "tmpfs", "png")
+
+# the transport used unless a caller picks one
+OCR_TRANSPORT = os.getenv("OCR_TRANSPORT", "stdin").strip().lower()
+if OCR_TRANSPORT not in TRANSPORTS:
+    OCR_TRANSPORT = "stdin"
+
+# the folder the tmpfs transport writes to. /dev/shm is kept in memory on Linux, elsewhere the normal temp folder is
+# used (which still skips the PNG compression)
+RAM_TEMP_DIR = os.getenv("OCR_TEMP_DIR") or ("/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir())
+
+# the tesseract argument that makes it write its word-level TSV output, the same one pytesseract adds
+TSV_CONFIG = "-c tessedit_create_tsv=1"
+
+#######################################################################################################################
+# Function that encodes an image as uncompressed PNM (PBM for 1-bit, PGM for grayscale and PPM for color images)
+# Parameters: the image
+# Returns: the encoded bytes
+#######################################################################################################################
+def encode_pnm(img):
+    if img.mode not in ("1", "L", "RGB"):
+        # transparent pixels become white like pytesseract does, and every other mode is sent as color
+        if "A" in img.getbands():
+            background = Image.new("RGB", img.size, (255, 255, 255))
+            background.paste(img.convert("RGBA"), mask=img.getchannel("A"))
+            img = background
+        img = img.convert("RGB")
+    buffer = io.BytesIO()
+    img.save(buffer, format="PPM")
+    return buffer.getvalue()
+
+#######################################################################################################################
+# Function that runs tesseract on an image file or on bytes sent through its stdin, reading its output from stdout.
+# Tesseract is limited to the OCR job's share of the cores (or the default share outside a job)
+# Parameters: the input (a filepath, or "stdin"), the bytes to send on stdin (or None), and the configuration
+# Returns: tesseract's output as text
+# Raises: TesseractNotFoundError if tesseract isn't installed, TesseractError if it fails
+#######################################################################################################################
+def run_tesseract(source, data, config):
+    args = [pytesseract.pytesseract.tesseract_cmd, source, "stdout"] + shlex.split(config, posix=os.name != "nt")
+    kwargs = subprocess_args()
+    lease = tesseract_lease()
+    if lease is not None:
+        kwargs["env"] = lease.environment(kwargs["env"])
+    try:
+        process = subprocess.Popen(args, **kwargs)
+    except OSError as e:
+        if e.errno != ENOENT:
+            raise
+        raise TesseractNotFoundError()
+    if lease is not None:
+        lease.pin(process.pid)
+    output, errors = process.communicate(data)
+    if process.returncode:
+        raise TesseractError(process.returncode, get_errors(errors))
+    return output.decode("utf-8")
+
+#######################################################################################################################
+# Function that runs tesseract on an image and returns its word-level data, like pytesseract.image_to_data with
+# output_type=DICT
+# Parameters: the image, the tesseract configuration and optionally the transport to use instead of OCR_TRANSPORT
+# Returns: the data as a dictionary of lists (text, conf, left, top, ...)
+# Raises: TesseractNotFoundError if tesseract isn't installed, TesseractError if it fails
+#######################################################################################################################
+def image_to_data(img, config="", transport=None):
+    transport = transport or OCR_TRANSPORT
+    if transport == "png":
+        return pytesseract.image_to_data(img, output_type=pytesseract.Output.DICT, config=config)
+
+    config = f"{TSV_CONFIG} {config}".strip()
+    data = encode_pnm(img)
+    if transport == "stdin":
+        tsv = run_tesseract("stdin", data, config)
+    else:
+        fd, path = tempfile.mkstemp(prefix="tess_", suffix=".pnm", dir=RAM_TEMP_DIR)
+        try:
+            with os.fdopen(fd, "wb") as file:
+                file.write(data)
+            tsv = run_tesseract(path, None, config)
+        finally:
+            os.remove(path)
+    return file_to_dict(tsv, "\t", -1)
@@ -0,0 +1,115 @@
+######################################################################################################################
+# Project...............: Yugioh Card Library
+# Author................: Ben Stearns
+# Date..................: 12-4-25
+# Project Description...: This application creates a digital database library for storing and managing Yugioh cards
+# File Description......: defines coarse-to-fine OCR for card regions. Each region is first read at a low scale, and
+#                         the result is kept if tesseract's word confidences clear the field's threshold. Only regions
+#                         that weren't read confidently are read again at the full scale, and then with heavier
+#                         filtering. How often each tier settles a field is recorded in the pipeline stats
+#######################################################################################################################
+
+import os                                       # for turning progressive OCR off with an environment variable
+
+from extractors.ocr_helpers import word_confidences
+from utils.pipeline_stats import count_event
+
+# set OCR_PROGRESSIVE=0 to read every region once at the full scale, the way scans worked before the tiers
+PROGRESSIVE_OCR = os.getenv("OCR_PROGRESSIVE", "1").lower() not in ("0", "false", "no")
+
+
+class OcrTier:
+    # constructor for one pass over a region: how much the preprocessor enlarges it and whether it binarizes it too
+    def __init__(self, name, scale, heavy=False):
+        self.name = name
+        self.scale = scale
+        self.heavy = heavy
+
+    # define a function to return a string-friendly representation of a tier for debugging purposes if needed
+    def __repr__(self):
+        return f"OcrTier(name='{self.name}', scale={self.scale}, heavy={self.heavy})"
+
+
+# the passes tried for each field, cheapest first. the last tier that isn't heavy is the full scale every region was
+# read at before the tiers, and is the only one used when progressive OCR is turned off
+FIELD_TIERS = {
+    "name": [OcrTier("1.5x", 1.5), OcrTier("3x", 3), OcrTier("3x-binarized", 3, heavy=True)],
+    "type": [OcrTier("2x", 2), OcrTier("4x", 4), OcrTier("6x", 6), OcrTier("6x-binarized", 6, heavy=True)],
+    "description": [OcrTier("1x", 1), OcrTier("2x", 2), OcrTier("2x-sharpened", 2, heavy=True)],
+    "atkdef": [OcrTier("1.5x", 1.5), OcrTier("3x", 3), OcrTier("3x-binarized", 3, heavy=True)],
+}
+
+# the confidence a pass must reach to be accepted. single line fields must read every word confidently, while the
+# description is judged on its average word since a long text nearly always holds an unsure word or two
+ACCEPT_CONFIDENCE = {
+    "name": ("min", 80),
+    "type": ("min", 75),
+    "description": ("mean", 75),
+    "atkdef": ("min", 70),
+}
+
+#######################################################################################################################
+# Function that scores ocr data the way a field's acceptance threshold is defined
+# Parameters: the field name and the ocr data
+# Returns: the lowest or average word confidence, or -1 if no words were read
+#######################################################################################################################
+def field_confidence(field, data):
+    confidences = word_confidences(data)
+    if not confidences:
+        return -1
+    how, _ = ACCEPT_CONFIDENCE[field]
+    return min(confidences) if how == "min" else sum(confidences) / len(confidences)
+
+#######################################################################################################################
+# Function that returns the tiers a field is read with
+# Parameters: the field name
+# Returns: a list of OcrTier
+#######################################################################################################################
+def tiers_for(field):
+    tiers = FIELD_TIERS[field]
+    if PROGRESSIVE_OCR:
+        return tiers
+    return [[tier for tier in tiers if not tier.heavy][-1]]
+
+#######################################################################################################################
+# Function that reads a card region coarse-to-fine, stopping at the first tier whose result is complete and confident
+# Parameters: the field name, the cropped region, the field's preprocessor (called with scale= and heavy=), a function
+#             that runs OCR on a preprocessed image and returns (value, ocr data), a function that tells whether a value
+#             is complete (defaults to the value not being empty), and the optional trace dictionary
+# Returns: the accepted value, or the most confident value if no tier was accepted
+#######################################################################################################################
+def read_progressively(field, region, preprocess, read, is_complete=bool, trace=None):
+    _, threshold = ACCEPT_CONFIDENCE[field]
+    best = None                                 # (confidence, value, tier) of the most confident pass so far
+    for tier in tiers_for(field):
+        value, data = read(preprocess(region, scale=tier.scale, heavy=tier.heavy))
+        count_event(f"tier_passes:{field}:{tier.name}", trace)
+        confidence = field_confidence(field, data)
+        if best is None or (is_complete(value), confidence) > (is_complete(best[1]), best[0]):
+            best = (confidence, value, tier)
+        if is_complete(value) and confidence >= threshold:
+            break
+
+    # record which tier's result was used, so the stats show how often the cheap passes are enough
+    confidence, value, tier = best
+    count_event(f"tier_used:{field}:{tier.name}", trace)
+    if trace is not None:
+        trace.setdefault("tiers", {})[field] = tier.name
+    return value
+
+#######################################################################################################################
+# Function that reads a card region with every tier of its field, for re-reading a field the user says was misread.
+# Unlike read_progressively() it doesn't stop at the first confident tier, since that tier's result is the one the
+# user is correcting
+# Parameters: the field name, the cropped region, the field's preprocessor, the OCR function, the completeness test
+#             and the optional trace dictionary (see read_progressively())
+# Returns: a list of (tier name, value, confidence) tuples, complete and confident values first
+#######################################################################################################################
+def read_all_tiers(field, region, preprocess, read, is_complete=bool, trace=None):
+    readings = []
+    for tier in FIELD_TIERS[field]:
+        value, data = read(preprocess(region, scale=tier.scale, heavy=tier.heavy))
+        count_event(f"tier_rereads:{field}:{tier.name}", trace)
+        readings.append((tier.name, value, field_confidence(field, data)))
+    readings.sort(key=lambda reading: (is_complete(reading[1]), reading[2]), reverse=True)
+    return readings
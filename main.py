@@ -7,26 +7,87 @@
 #####################################################################################################################
 
 # imports
+import io                                                                               # for encoding video frames
 import os                                                                               # for file operations
-from werkzeug.utils import secure_filename                                              # to sanitizing filenames
-from flask import Flask, session, render_template, request, redirect, flash, url_for    # for webapp functionality
+from flask import Flask, render_template, request, redirect, flash, url_for, make_response  # for webapp
+from flask import g, session                                                            # for the request's collection
+from flask import get_template_attribute                                                # for rendering library rows
+from flask import send_from_directory                                                   # for serving built assets
+from markupsafe import Markup                                                           # for joining rendered rows
 import webbrowser                                                                       # for launching the app
-
-from data_layer.supabase_client import supabase
+from concurrent.futures import ThreadPoolExecutor                                       # for parallel sheet scans
+import threading                                                                        # for the stats reconcile job
+import time                                                                             # for the stats reconcile job
+
+from data_layer.supabase_client import supabase, data_client                            # for db queries
+from data_layer.data_client import DataClientError
+from data_layer.Yugioh_Card import YugiohCard, to_stat                                  # for the card model
+from data_layer.card_cache import card_caches                                           # for the cached libraries
+from data_layer.owners import DEFAULT_OWNER_ID, parse_owner_id                          # for per-owner collections
+from data_layer.owners import new_owner_id, collection_key, owner_from_key              # for opening collections
+from data_layer.image_store import store_upload, store_bytes, discard_image, image_path
+from data_layer.image_store import is_content_addressed, release_images_later, run_image_task_later
+from data_layer.library_version import (bump_library_version, current_library_version, library_version_tag,
+                                        record_database_version)
+from data_layer.facet_index import facet_indexes, FACET_COLUMNS
+from data_layer.numeric_index import numeric_indexes, NUMERIC_COLUMNS
+from data_layer.image_index import image_index                                          # for visual similarity search
+from data_layer.collection_stats import collection_stats, STATS_COLUMNS                 # for the stats dashboard
+from utils.http_cache import not_modified_response, add_validators, query_fingerprint
 from utils.constants import KNOWN_ATTRIBUTES                                            # for populating SELECT element
-from utils.convert_int_to_none import to_int_or_none
+from utils.constants import CARD_COLUMNS, CARD_SUMMARY_COLUMNS                          # for api column projection
+from utils.constants import BULK_EDIT_COLUMNS, MAX_BULK_CARDS                           # for bulk edits and deletes
+from utils.constants import SIMILAR_CARDS_SHOWN, MAX_SIMILAR_CARDS                      # for similarity search results
+from utils.constants import CHANGES_PAGE_SIZE, MAX_CHANGES_PAGE_SIZE                    # for delta sync pages
+from utils.api_response import json_response, parse_fields                              # for compact api responses
+from utils.fragment_cache import library_rows                                           # for cached library rows
+from utils.static_assets import static_assets, ENCODINGS                                # for fingerprinted css and js
+from utils.pipeline_stats import pipeline_stats                                         # for OCR stage metrics
+from utils.admission import ocr_admission, AdmissionRejected                            # for limiting concurrent OCR
+from utils.ocr_scheduler import ocr_scheduler                                           # for sharing cores between OCR
 from utils.install_tesseract import ensure_tesseract                                    # to ensure tesseract installed
-from tesseract import process_yugioh_card                                               # for ocr image processing
+from utils.ocr_pool import scan_card                                                     # for ocr image processing
+from utils.decoded_images import decoded_images                                         # for re-reading scan fields
+from utils.pipeline_stats import timed_stage                                            # for timing field re-reads
+from tesseract import reread_field, FIELD_READERS                                       # for re-reading scan fields
+from extractors.ocr_profiles import name_profile_config                                 # for the name OCR profile
+from extractors.image_embedding import embed_image, embed_file                          # for card image embeddings
+from preprocessing.frame_selection import select_best_frame, frames_from_video          # for burst and video scans
+from preprocessing.sheet_splitter import split_sheet, MAX_SHEET_CARDS                   # for multi-card sheet scans
+from PIL import Image                                                                   # for decoding burst frames
 from supabase import create_client, Client                                              # for db connections/queries
 from supabase.client import Client                                                      # import supabase_client Client
 from utils import convert_int_to_none
 
+# OCR workers are spawned processes that import this module again under this name. they only need its imports, so
+# the copy in a worker skips building the assets and starting the background threads
+IS_OCR_WORKER = __name__ == "__mp_main__"
+
 # main program variables
 app = Flask(__name__)                               # defines main app object associated with code's current namespace
-app.secret_key = "supercalifragilistic"             # defines a key for encrypting session data. Required for Flask
+app.secret_key = os.getenv("SECRET_KEY")            # defines the key signing sessions and collection keys
+if not app.secret_key:
+    # a key only known to this run still keeps sessions unforgeable, but they and every collection key handed out
+    # stop working when the app restarts
+    app.secret_key = os.urandom(32).hex()
+    print("SECRET_KEY is not set, so sessions and collection keys won't survive a restart.")
 UPLOAD_FOLDER = "static/images/cards"               # defines the fil path to the folder for storing uploaded images
 ALLOWED_EXTENSIONS = {"png", "jpg", "jpeg", "gif"}  # defines what images extensions are allowed to be uploaded
+VIDEO_EXTENSIONS = {"mp4", "mov", "avi", "webm"}    # defines what video extensions can be scanned for their best frame
 app.config["UPLOAD_FOLDER"] = UPLOAD_FOLDER         # stores the upload folder path as a Flask configuration for use
+OWNER_HEADER = "X-Owner-Id"                         # defines the header a sign-in proxy can use to pick the collection
+TRUST_OWNER_HEADER = os.getenv("TRUST_OWNER_HEADER", "").lower() in ("1", "true", "yes")  # only behind such a proxy
+ASSET_MAX_AGE = 365 * 24 * 60 * 60                  # defines how long browsers keep fingerprinted css and js (a year)
+STATS_RECONCILE_SECONDS = float(os.getenv("STATS_RECONCILE_SECONDS", 0))  # how often stats are rebuilt. 0 turns it off
+TOMBSTONE_PRUNE_SECONDS = float(os.getenv("TOMBSTONE_PRUNE_SECONDS", 3600))  # how often tombstones are pruned. 0 is off
+TOMBSTONE_KEEP_SECONDS = int(os.getenv("TOMBSTONE_KEEP_SECONDS", 7 * 24 * 3600))  # how long deletions can be synced
+LIBRARY_SYNC_SECONDS = float(os.getenv("LIBRARY_SYNC_SECONDS", 2))  # how long a cached library is used unchecked
+LIBRARY_COLUMNS = ",".join(CARD_COLUMNS + ["row_version"])  # defines the columns the card caches are loaded with
+
+# build the css and js under content-hashed names if they changed, and let templates link to them like url_for does
+if not IS_OCR_WORKER:
+    static_assets.ensure_built()
+app.jinja_env.globals["asset_url_for"] = static_assets.url_for
 
 #######################################################################################################################
 # Function: checks whether an uploaded filename has an allowed file extension
@@ -37,19 +98,581 @@ def allowed_file(filename):
     return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
 
 #######################################################################################################################
-# Function: retrieves all cards in the database and storing in session
-# Returns.: session data for all cards in the database
+# Function: checks whether an uploaded filename is a video that can be scanned for its best frame
+# Returns.: true if the file has a video extension. Otherwise returns false
+#######################################################################################################################
+def allowed_video(filename):
+    return "." in filename and filename.rsplit(".", 1)[1].lower() in VIDEO_EXTENSIONS
+
+#######################################################################################################################
+# Function: stores the image to scan from a single photo, a burst of photos, or a video. For bursts and videos every
+#           frame is scored for sharpness and glare and only the best one is stored (and later OCR'd)
+# Params..: the list of uploaded files
+# Returns.: a tuple of (stored image filename, True if the file was newly written, message describing the frame pick)
+# Raises..: ValueError with a message for the user if the upload can't be scanned
+#######################################################################################################################
+def store_scan_upload(files):
+    # a single still image is stored as is
+    if len(files) == 1 and allowed_file(files[0].filename):
+        filename, created = store_upload(files[0], app.config["UPLOAD_FOLDER"])
+        return filename, created, None
+
+    # a single video is decoded into frames and the best frame is stored as a png
+    if len(files) == 1 and allowed_video(files[0].filename):
+        try:
+            frames = frames_from_video(files[0].read())
+        except RuntimeError as e:
+            raise ValueError(str(e))
+        best, _ = select_best_frame(frames)
+        buffer = io.BytesIO()
+        frames[best].save(buffer, format="PNG")
+        filename, created = store_bytes(buffer.getvalue(), "png", app.config["UPLOAD_FOLDER"])
+        return filename, created, f"Picked frame {best + 1} of {len(frames)} sampled from the video."
+
+    # a burst of photos keeps the original bytes of the best photo
+    if len(files) > 1 and all(allowed_file(file.filename) for file in files):
+        uploads = [(file.filename.rsplit(".", 1)[1].lower(), file.read()) for file in files]
+        # PIL only decodes a photo once it's scored, so a file that isn't an image can fail in either step
+        try:
+            best, _ = select_best_frame([Image.open(io.BytesIO(data)) for _, data in uploads])
+        except (OSError, ValueError):
+            raise ValueError("One of the uploaded images could not be read")
+        extension, data = uploads[best]
+        filename, created = store_bytes(data, extension, app.config["UPLOAD_FOLDER"])
+        return filename, created, f"Picked photo {best + 1} of {len(files)} ({files[best].filename})."
+
+    raise ValueError("Unsupported file type. Please upload one or more images (png, jpg, jpeg, gif) "
+                     "or a single video (mp4, mov, avi, webm)")
+
+#######################################################################################################################
+# Function: runs OCR on one card cropped from a sheet. the sheet was admitted as a whole, so the card only waits for
+#           its share of the cores. a card that fails is returned blank so the rest of the sheet can still be confirmed
+# Params..: the filepath of the stored card image, the number of tesseract threads planned for each card and the
+#           name profile configuration of the collection scanned into
+# Returns.: a tuple of (the YugiohCard read by scan_card, an error message for the user or None)
+#######################################################################################################################
+def process_sheet_card(filepath, threads, name_config):
+    try:
+        with ocr_scheduler.job(threads):
+            return YugiohCard.from_row(scan_card(filepath, name_config=name_config)), None
+    except Exception as e:
+        print("OCR ERROR:", e)
+        return YugiohCard("", "", ""), "This card couldn't be read. Please fill it in by hand."
+
+#######################################################################################################################
+# Function: computes the embedding of an uploaded query image without storing it
+# Params..: the uploaded file
+# Returns.: the embedding
+# Raises..: ValueError if no image was uploaded or it can't be decoded
+#######################################################################################################################
+def embed_uploaded_image(file):
+    if not file or not file.filename or not allowed_file(file.filename):
+        raise ValueError("Please upload an image (png, jpg, jpeg, gif)")
+    try:
+        return embed_image(Image.open(file.stream))
+    except (OSError, ValueError):
+        raise ValueError("The uploaded image could not be read")
+
+#######################################################################################################################
+# Function: builds the 503 response for a scan turned away by OCR admission control
+# Params..: the AdmissionRejected exception
+# Returns.: scan.html with a 503 status and a Retry-After header
+#######################################################################################################################
+def scanner_busy_response(rejection):
+    flash(f"{rejection} (retry in about {rejection.retry_after} seconds)", "warning")
+    page = render_template("scan.html", title="Scan Image", tesseract_exists=True)
+    response = make_response(page, 503)
+    response.headers["Retry-After"] = str(rejection.retry_after)
+    return response
+
+#######################################################################################################################
+# Function: splits a photo of a binder page (or any sheet of cards) into its cards and scans them in parallel. the
+#           caller admits the sheet through OCR admission once for all of its cards
+# Params..: the uploaded photo
+# Returns.: a list of (YugiohCard, error message or None) tuples. each card holds the stored image filename of its crop
+# Raises..: ValueError if the photo can't be decoded
+#######################################################################################################################
+def scan_sheet(file):
+    try:
+        sheet = Image.open(file.stream).convert("RGB")
+    except (OSError, ValueError):
+        raise ValueError("The uploaded image could not be read")
+    crops = split_sheet(sheet)
+
+    # every crop is stored under its content hash so it can be previewed and confirmed like a single scan
+    filenames = []
+    for crop in crops:
+        buffer = io.BytesIO()
+        crop.save(buffer, format="PNG")
+        filename, _ = store_bytes(buffer.getvalue(), "png", app.config["UPLOAD_FOLDER"])
+        filenames.append(filename)
+
+    # tesseract runs in its own process for each call, so threads are enough to OCR the cards in parallel. the
+    # scheduler picks how many cards run at once and divides the cores between them
+    filepaths = [image_path(filename, app.config["UPLOAD_FOLDER"]) for filename in filenames]
+    concurrent, threads = ocr_scheduler.plan(len(filepaths))
+    name_config = library_name_config()
+    with ThreadPoolExecutor(max_workers=concurrent) as pool:
+        entries = list(pool.map(lambda filepath: process_sheet_card(filepath, threads, name_config), filepaths))
+
+    # a card that couldn't be read keeps its crop too, so it can be filled in by hand next to its picture
+    for (card, _), filename in zip(entries, filenames):
+        card.image_filename = filename
+    return entries
+
+#######################################################################################################################
+# Function: picks the owner whose collection the request reads and writes: the collection chosen on the home page,
+#           then the default collection. the X-Owner-Id header comes first only if TRUST_OWNER_HEADER is set, since any
+#           client can send it and only a proxy that signs users in (and strips the header from their requests) makes
+#           it trustworthy
+# Returns.: None once g.owner_id is set, or a 400 response for an invalid owner id
+#######################################################################################################################
+@app.before_request
+def load_owner():
+    # static files are the same for every collection, and reading the session would add Vary: Cookie to them
+    if request.endpoint in ("static", "serve_asset"):
+        return None
+    header = request.headers.get(OWNER_HEADER) if TRUST_OWNER_HEADER else None
+    try:
+        g.owner_id = parse_owner_id(header or session.get("owner_id") or DEFAULT_OWNER_ID)
+    except ValueError as e:
+        return json_response({"error": str(e)}, 400)
+
+#######################################################################################################################
+# Function: converts a card to a row of the request owner's collection for inserting
+# Params..: the YugiohCard
+# Returns.: the row dictionary, including the owner id
+#######################################################################################################################
+def owned_row(card):
+    return dict(card.to_row(), owner_id=g.owner_id)
+
+#######################################################################################################################
+# Function: loads the request owner's cards into their card cache the first time it is needed, and brings the cache
+#           up to date with the database once it is more than LIBRARY_SYNC_SECONDS old, so writes made by other copies
+#           of the app show up too
+# Returns.: the owner's loaded card cache
+#######################################################################################################################
+def load_card_cache():
+    owner_id = g.owner_id
+
+    def load_rows():
+        return supabase.table("cards").select(LIBRARY_COLUMNS).eq("owner_id", owner_id).execute().data
+
+    cache = card_caches.get(owner_id)
+    cache.ensure_loaded(load_rows)
+    if not sync_card_cache(owner_id, cache):
+        cache = card_caches.get(owner_id)
+        cache.ensure_loaded(load_rows)
+    record_database_version(owner_id, cache.version)
+    return cache
+
+#######################################################################################################################
+# Function: applies the cards written and deleted in the database since the card cache's version to the cache and to
+#           every in-memory structure built from it. a database without change tracking (or a cache older than the
+#           pruned tombstones) can't say what changed, so the owner's structures are dropped to be loaded again
+# Params..: the owner id and their loaded card cache
+# Returns.: true if the cache is still in use, false if it was dropped
+#######################################################################################################################
+def sync_card_cache(owner_id, cache):
+    since = cache.begin_sync(LIBRARY_SYNC_SECONDS)
+    if since is None:
+        return True
+
+    upserted, deleted = {}, set()
+    while True:
+        try:
+            result = data_client.run(data_client.card_changes(since, MAX_CHANGES_PAGE_SIZE, owner_id))
+        except DataClientError as e:
+            if e.code != "PGRST202":
+                raise
+            result = {"reset": True}
+        if result.get("reset"):
+            forget_library(owner_id)
+            return False
+        for change in result["changes"]:
+            if change["op"] == "upsert":
+                upserted[change["card"]["id"]] = change["card"]
+                deleted.discard(change["card"]["id"])
+            else:
+                upserted.pop(change["id"], None)
+                deleted.add(change["id"])
+        since = result["version"]
+        if not result["more"]:
+            break
+
+    if upserted or deleted:
+        apply_library_changes(owner_id, list(upserted.values()), list(deleted))
+    cache.finish_sync(since)
+    return True
+
+#######################################################################################################################
+# Function: drops an owner's card cache and the structures built from it so they are loaded from the database again
+# Params..: the owner id
+# Returns.: void
+#######################################################################################################################
+def forget_library(owner_id):
+    cache = card_caches.discard(owner_id)
+    for partition in (facet_indexes, numeric_indexes, collection_stats):
+        partition.discard(owner_id)
+    # any cached row may be out of date, so every card the dropped cache held is rendered again
+    library_rows.bump([card.id for card in cache.by_name()] if cache else [], owner_id)
+    bump_library_version(owner_id)
+
+#######################################################################################################################
+# Function: retrieves all cards in the request owner's collection, loading them into their card cache the first time
+# Returns.: a tuple of every YugiohCard ordered by name. the cards are shared, so callers must not change them
 #######################################################################################################################
 def retrieve_library():
-    # If cards are already cached in session, return that session data instead of querying the database
-    if "cards" in session:
-        return session["cards"]
+    return load_card_cache().by_name()
+
+#######################################################################################################################
+# Function: looks up a single card of the request owner's collection in their card cache
+# Params..: the card's database id
+# Returns.: the YugiohCard (shared, so callers must not change it), or None if the owner has no such card
+#######################################################################################################################
+def find_card(card_id):
+    return load_card_cache().get(card_id)
 
-    # otherwise, query supabase, store results in session, then return results
-    response = supabase.table("cards").select("*").order("name").execute()
-    cards = response.data
-    session["cards"] = cards
-    return cards
+#######################################################################################################################
+# Function: builds the name OCR profile configuration of the request owner's collection. the names already in the
+#           collection become user-words, so scans favour them over similar looking strings
+# Returns.: the configuration string to pass to scan_card or reread_field
+#######################################################################################################################
+def library_name_config():
+    return name_profile_config(g.owner_id, (card.name for card in retrieve_library()))
+
+#######################################################################################################################
+# Function: records that the request owner's library was written to so cached copies of it are no longer used and
+#           their in-memory indexes reflect the write. other owners' caches are left alone
+# Params..: the rows returned by an insert/update and the ids of deleted cards
+# Returns.: void
+#######################################################################################################################
+def library_changed(upserted=(), deleted=()):
+    apply_library_changes(g.owner_id, upserted, deleted)
+    bump_library_version(g.owner_id)
+
+#######################################################################################################################
+# Function: applies written and deleted cards to an owner's cached rows, card cache, indexes and statistics
+# Params..: the owner id, the written card rows and the ids of deleted cards
+# Returns.: void
+#######################################################################################################################
+def apply_library_changes(owner_id, upserted, deleted):
+    library_rows.bump([row["id"] for row in upserted] + list(deleted), owner_id)
+
+    # only structures already in memory are updated. the others pick the write up when they are next loaded
+    partitions = (card_caches, facet_indexes, numeric_indexes, collection_stats)
+    loaded = [partition.peek(owner_id) for partition in partitions]
+    loaded = [structure for structure in loaded if structure is not None]
+    for row in upserted:
+        for structure in loaded:
+            structure.upsert(row)
+    for card_id in deleted:
+        for structure in loaded:
+            structure.remove(card_id)
+    index_card_images(upserted)
+
+#######################################################################################################################
+# Function: renders the rows of the library table, reusing the cached row of every card that hasn't changed
+# Params..: the cards to list and the row cache generation read before the cards were read
+# Returns.: the rows' html
+#######################################################################################################################
+def render_library_rows(cards, generation):
+    render_row = get_template_attribute("library_row.html", "library_row")
+    rows = []
+    for card in cards:
+        html = library_rows.get(card.id)
+        if html is None:
+            html = render_row(card)
+            library_rows.put(card.id, html, generation, g.owner_id)
+        rows.append(html)
+    return Markup("").join(rows)
+
+#######################################################################################################################
+# Function: builds the request owner's facet index from their card cache the first time it is needed, instead of
+#           selecting the columns again. writes update the card cache before the indexes, so the cache is never behind
+#           the index
+# Returns.: the owner's loaded facet index
+#######################################################################################################################
+def load_facet_index():
+    columns = ("id",) + FACET_COLUMNS
+    load_card_cache()  # syncs the loaded index with the database too
+    index = facet_indexes.get(g.owner_id)
+    index.ensure_loaded(lambda: [card.to_dict(columns) for card in retrieve_library()])
+    return index
+
+#######################################################################################################################
+# Function: builds the request owner's ATK/DEF columnar index from their card cache the first time it is needed
+# Returns.: the owner's loaded numeric index
+#######################################################################################################################
+def load_numeric_index():
+    columns = ("id",) + NUMERIC_COLUMNS
+    load_card_cache()  # syncs the loaded index with the database too
+    index = numeric_indexes.get(g.owner_id)
+    index.ensure_loaded(lambda: [card.to_dict(columns) for card in retrieve_library()])
+    return index
+
+#######################################################################################################################
+# Function: builds the request owner's collection statistics from their card cache the first time they are needed.
+#           after that every write updates them through library_changed()
+# Returns.: the owner's loaded statistics
+#######################################################################################################################
+def load_collection_stats():
+    load_card_cache()  # syncs the loaded statistics with the database too
+    stats = collection_stats.get(g.owner_id)
+    stats.ensure_loaded(lambda: [card.to_dict(STATS_COLUMNS) for card in retrieve_library()])
+    return stats
+
+#######################################################################################################################
+# Function: rebuilds an owner's collection statistics from the database (not the card cache, which is kept current
+#           by the same writes as the statistics) and reports how far the incrementally kept counters had drifted
+# Params..: the owner id
+# Returns.: the drift report of CollectionStats.reconcile()
+#######################################################################################################################
+def reconcile_collection_stats(owner_id):
+    columns = ",".join(STATS_COLUMNS)
+    drift = collection_stats.get(owner_id).reconcile(
+        lambda: supabase.table("cards").select(columns).eq("owner_id", owner_id).execute().data or [])
+    if drift["drifted"]:
+        print(f"STATS DRIFT for {owner_id}: {drift}")
+    return drift
+
+#######################################################################################################################
+# Function: reconciles the statistics of every owner in memory every STATS_RECONCILE_SECONDS, forever. owners whose
+#           statistics aren't in memory are skipped since their next load reads them from scratch anyway
+# Returns.: never
+#######################################################################################################################
+def reconcile_stats_forever():
+    while True:
+        time.sleep(STATS_RECONCILE_SECONDS)
+        for owner_id in collection_stats.owners():
+            try:
+                reconcile_collection_stats(owner_id)
+            except Exception as e:
+                print(f"STATS RECONCILE ERROR for {owner_id}: {e}")
+
+#######################################################################################################################
+# Function: drops the tombstones older than TOMBSTONE_KEEP_SECONDS every TOMBSTONE_PRUNE_SECONDS, forever. copies of
+#           the library that last synced before the dropped tombstones start over from 0 on their next sync
+# Returns.: only if the database has no change tracking
+#######################################################################################################################
+def prune_tombstones_forever():
+    while True:
+        time.sleep(TOMBSTONE_PRUNE_SECONDS)
+        try:
+            pruned = data_client.run(data_client.prune_card_tombstones(TOMBSTONE_KEEP_SECONDS))
+            if pruned:
+                print(f"Pruned {pruned} card tombstones")
+        except DataClientError as e:
+            if e.code == "PGRST202":
+                print("The database has no change tracking, so there are no tombstones to prune")
+                return
+            print(f"TOMBSTONE PRUNE ERROR: {e}")
+        except Exception as e:
+            print(f"TOMBSTONE PRUNE ERROR: {e}")
+
+#######################################################################################################################
+# Function: computes the embedding of a stored card image for the image index
+# Params..: the image filename saved in a card row
+# Returns.: the embedding, or None if the image can't be read
+#######################################################################################################################
+def embed_stored_image(filename):
+    path = image_path(filename, app.config["UPLOAD_FOLDER"])
+    return embed_file(path) if path else None
+
+#######################################################################################################################
+# Function: selects the image of every card of every owner
+# Returns.: a list of image filenames
+#######################################################################################################################
+def library_image_filenames():
+    rows = supabase.table("cards").select("image_filename").execute().data or []
+    return [row["image_filename"] for row in rows if row.get("image_filename")]
+
+#######################################################################################################################
+# Function: loads the saved embeddings of the image index the first time it's needed, and queues the library images
+#           it doesn't hold yet to be embedded in the background. searches only see the images embedded so far, so
+#           the first request never waits on embedding a large library. the images are content-addressed files shared
+#           by every owner, so one index holds them all and searches are restricted to the request owner's images
+# Returns.: the loaded image index
+#######################################################################################################################
+def load_image_index():
+    if image_index.ensure_loaded():
+        run_image_task_later(lambda: image_index.backfill(library_image_filenames, embed_stored_image),
+                             "IMAGE INDEX BACKFILL")
+    return image_index
+
+#######################################################################################################################
+# Function: queues the images of saved cards to be added to the image index in the background. images are embedded
+#           when a card using them is saved rather than when they are uploaded, so scans the user never confirms
+#           don't end up in the index
+# Params..: the rows returned by an insert/update
+# Returns.: void
+#######################################################################################################################
+def index_card_images(rows):
+    filenames = {row.get("image_filename") for row in rows if row.get("image_filename")}
+    if not filenames or not image_index.loaded:
+        # writes before the first load are picked up by the backfill
+        return
+
+    def add_images():
+        for filename in filenames:
+            if filename not in image_index:
+                image_index.add(filename, embed_stored_image(filename))
+    run_image_task_later(add_images, "IMAGE INDEX")
+
+#######################################################################################################################
+# Function: finds the cards of the request owner's collection whose images look most like an embedding
+# Params..: the query embedding, how many cards to return and the id of a card to leave out (the card being viewed)
+# Returns.: a list of (YugiohCard, similarity) tuples, most similar first
+#######################################################################################################################
+def find_similar_cards(vector, k, exclude_id=None):
+    # only the owner's images are scored. several of their cards can share an image, so more images than cards are
+    # fetched
+    cache = load_card_cache()
+    similar = []
+    for filename, score in load_image_index().search(vector, 2 * k + 1, within=cache.image_filenames()):
+        similar.extend((card, score) for card in cache.with_image(filename) if card.id != exclude_id)
+    return similar[:k]
+
+#######################################################################################################################
+# Function: finds the cards whose images look most like a card's image
+# Params..: the card and how many cards to return
+# Returns.: a list of (YugiohCard, similarity) tuples, empty for cards without an image
+#######################################################################################################################
+def similar_to_card(card, k):
+    if not card.image_filename:
+        return []
+    vector = load_image_index().vector(card.image_filename)
+    return [] if vector is None else find_similar_cards(vector, k, exclude_id=card.id)
+
+#######################################################################################################################
+# Function: reads how many similar cards to return from the request's query parameters
+# Returns.: the count, clamped between 1 and MAX_SIMILAR_CARDS
+#######################################################################################################################
+def similar_count_from_request():
+    k = request.args.get("k", default=SIMILAR_CARDS_SHOWN, type=int)
+    return min(max(k, 1), MAX_SIMILAR_CARDS)
+
+#######################################################################################################################
+# Function: builds the JSON list of similar cards
+# Params..: the (YugiohCard, similarity) tuples
+# Returns.: a list of card dictionaries, each with its similarity
+#######################################################################################################################
+def similar_cards_json(similar):
+    return [dict(card.to_dict(CARD_SUMMARY_COLUMNS), similarity=round(score, 4)) for card, score in similar]
+
+#######################################################################################################################
+# Function: reads facet filters (attribute, card_type and monster_type) from the request's query parameters
+# Returns.: a dictionary of column -> list of accepted values, holding only the columns that were filtered on
+#######################################################################################################################
+def facet_filters_from_request():
+    filters = {}
+    for column in FACET_COLUMNS:
+        values = [value for value in request.args.getlist(column) if value]
+        if values:
+            filters[column] = values
+    return filters
+
+#######################################################################################################################
+# Function: reads ATK/DEF range filters (atk_min, atk_max, def_min, def_max) and the sort parameter from the request.
+#           sort is a comma separated list of numeric columns, each prefixed with - for descending (ex: -attack,defense)
+# Returns.: a tuple of (dictionary of column -> (low, high), list of (column, descending) pairs)
+# Raises..: ValueError if a bound isn't a whole number or a sort column isn't numeric
+#######################################################################################################################
+def numeric_query_from_request():
+    bounds = {"atk_min": ("attack", 0), "atk_max": ("attack", 1), "def_min": ("defense", 0), "def_max": ("defense", 1)}
+    ranges = {}
+    for param, (column, side) in bounds.items():
+        raw = request.args.get(param, "").strip()
+        if not raw:
+            continue
+        if not raw.lstrip("-").isdigit():
+            raise ValueError(f"{param} must be a whole number")
+        ranges.setdefault(column, [None, None])[side] = int(raw)
+
+    sort = []
+    for key in request.args.get("sort", "").split(","):
+        key = key.strip()
+        if not key:
+            continue
+        column = key.lstrip("-")
+        if column not in NUMERIC_COLUMNS:
+            raise ValueError(f"Cards can only be sorted by {', '.join(NUMERIC_COLUMNS)}")
+        sort.append((column, key.startswith("-")))
+    return {column: tuple(bounds) for column, bounds in ranges.items()}, sort
+
+#######################################################################################################################
+# Function: resolves the request's facet, ATK/DEF range and sort parameters against the in-memory indexes
+# Params..: an optional number of cards to keep (applied as a top-k when sorting)
+# Returns.: a tuple of (list of matching card ids or None when nothing is filtered, True if the ids are sorted)
+# Raises..: ValueError for invalid range or sort parameters
+#######################################################################################################################
+def matching_card_ids(limit=None):
+    filters = facet_filters_from_request()
+    ranges, sort = numeric_query_from_request()
+
+    ids = load_facet_index().filter_ids(filters) if filters else None
+    if ranges or sort:
+        ids = load_numeric_index().query(ranges, ids, sort, limit)
+    return ids, bool(sort)
+
+#######################################################################################################################
+# Function: validates the card ids of a bulk edit or delete
+# Params..: a list of ids (strings from a form or numbers from JSON)
+# Returns.: the unique ids as integers, in their original order
+# Raises..: ValueError if an id isn't a whole number, none are given or more than MAX_BULK_CARDS are given
+#######################################################################################################################
+def parse_bulk_ids(values):
+    try:
+        ids = list(dict.fromkeys(int(value) for value in values))
+    except (TypeError, ValueError):
+        raise ValueError("Card ids must be whole numbers")
+    if not ids:
+        raise ValueError("No cards selected")
+    if len(ids) > MAX_BULK_CARDS:
+        raise ValueError(f"At most {MAX_BULK_CARDS} cards can be changed at once")
+    return ids
+
+#######################################################################################################################
+# Function: validates the column changes of a bulk edit
+# Params..: a dictionary of submitted values and whether blank values mean "leave unchanged" (as they do in forms)
+# Returns.: a dictionary of column -> new value holding only BULK_EDIT_COLUMNS
+# Raises..: ValueError if ATK or DEF isn't a whole number or nothing is changed
+#######################################################################################################################
+def parse_bulk_changes(values, skip_blank):
+    changes = {}
+    for column in BULK_EDIT_COLUMNS:
+        if column not in values or (skip_blank and values[column] in ("", None)):
+            continue
+        value = values[column]
+        if column in NUMERIC_COLUMNS:
+            value = to_stat(value, column)
+        changes[column] = value
+    if not changes:
+        raise ValueError("No changes given")
+    return changes
+
+#######################################################################################################################
+# Function: deletes many cards with a single query. their images are released by one background pass afterwards
+# Params..: the validated card ids
+# Returns.: the deleted rows
+#######################################################################################################################
+def bulk_delete_cards(ids):
+    # the delete returns the removed rows, so their images are known without selecting them first. only the request
+    # owner's cards are deleted
+    deleted = supabase.table("cards").delete().in_("id", ids).eq("owner_id", g.owner_id).execute().data or []
+    library_changed(deleted=[row["id"] for row in deleted])
+    release_images_later(supabase, [row.get("image_filename") for row in deleted], app.config["UPLOAD_FOLDER"])
+    return deleted
+
+#######################################################################################################################
+# Function: applies the same column changes to many cards with a single query
+# Params..: the validated card ids and changes
+# Returns.: the updated rows
+#######################################################################################################################
+def bulk_update_cards(ids, changes):
+    updated = supabase.table("cards").update(changes).in_("id", ids).eq("owner_id", g.owner_id).execute().data or []
+    library_changed(upserted=updated)
+    return updated
 
 #######################################################################################################################
 # Function: route that handles get requests for the home page
@@ -60,7 +683,35 @@ def index():
     # renders the index.html template with required data
     return render_template(
         "index.html",
-        title="Yugioh Card Library") # the title used in the head element for the page
+        title="Yugioh Card Library", # the title used in the head element for the page
+        owner_id=g.owner_id, # the collection the pages currently read and write
+        # the key that opens the collection elsewhere. the default collection is open to everyone, so it has none
+        key=collection_key(g.owner_id, app.secret_key) if g.owner_id != DEFAULT_OWNER_ID else None)
+
+#######################################################################################################################
+# Function: route that handles post requests from the home page to switch to another collection: a new, empty one
+#           (action=new), the one a collection key opens (key=...) or the shared default one (action=default). the app
+#           picks the id of new collections and only accepts keys it signed, so nobody can open a collection whose key
+#           they weren't given. the collection is remembered in the (signed) session
+# Returns.: redirects to the library of the chosen collection, or back home for an invalid key
+#######################################################################################################################
+@app.post("/collection")
+def switch_collection():
+    action = request.form.get("action")
+    if action == "new":
+        session["owner_id"] = new_owner_id()
+        flash("Created a new collection. Keep its key from the home page to open it again later.", "success")
+    elif action == "default":
+        session.pop("owner_id", None)
+    else:
+        try:
+            session["owner_id"] = owner_from_key(request.form.get("key"), app.secret_key)
+        except ValueError as e:
+            flash(str(e), "danger")
+            return redirect(url_for("index"))
+    if TRUST_OWNER_HEADER and request.headers.get(OWNER_HEADER):
+        flash(f"Your collection is chosen by the {OWNER_HEADER} header, so the switch has no effect.", "warning")
+    return redirect(url_for("library"))
 
 #######################################################################################################################
 # Function: handles get requests to view all cards in the database
@@ -68,12 +719,41 @@ def index():
 #######################################################################################################################
 @app.get("/library")
 def library():
+    # answer with 304 before rendering anything if the browser's copy is from the current library version
+    load_card_cache()  # syncs with the database first, so writes made elsewhere change the version
+    etag = "library-" + library_version_tag(g.owner_id, query_fingerprint())
+    _, _, last_modified = current_library_version(g.owner_id)
+    cached = not_modified_response(etag, last_modified)
+    if cached:
+        return cached
+
+    generation = library_rows.generation(g.owner_id)  # read before the cards, so rows edited meanwhile aren't kept
     cards = retrieve_library()
-    return render_template(
+
+    # narrow the library down with the facet and ATK/DEF indexes and count what each filter option would match
+    filters = facet_filters_from_request()
+    index = load_facet_index()
+    try:
+        ids, sorted_by_index = matching_card_ids()
+    except ValueError as e:
+        flash(str(e), "warning")
+        ids, sorted_by_index = None, False
+
+    if ids is not None and sorted_by_index:
+        cards = [card for card in map(load_card_cache().get, ids) if card is not None]
+    elif ids is not None:
+        matching = set(ids)
+        cards = [card for card in cards if card.id in matching]
+
+    page = render_template(
         "library.html",
         title="Your Library",
-        cards=cards # the session data for all cards in the database
+        rows=render_library_rows(cards, generation), # the table rows of the matching cards
+        filters=filters, # the facet filters currently applied
+        facets=index.facet_counts(filters), # the number of cards each filter option matches
+        KNOWN_ATTRIBUTES=KNOWN_ATTRIBUTES # the attributes offered by the bulk edit toolbar
     )
+    return add_validators(make_response(page), etag, last_modified)
 
 #######################################################################################################################
 # Function   : handles get requests to view a single card's full information
@@ -82,15 +762,25 @@ def library():
 #######################################################################################################################
 @app.get("/view/<int:card_id>")
 def view_card(card_id):
-    # query the db for the card's url id, return error if not found, otherwise render view with the query results
-    response = supabase.table("cards").select("*").eq("id", card_id).single().execute()
-    if not response.data:
+    # answer with 304 before rendering anything if the browser's copy is from the current library version
+    load_card_cache()  # syncs with the database first, so writes made elsewhere change the version
+    etag = "card-" + library_version_tag(g.owner_id, card_id)
+    _, _, last_modified = current_library_version(g.owner_id)
+    cached = not_modified_response(etag, last_modified)
+    if cached:
+        return cached
+
+    # look the card up in the card cache, return error if not found, otherwise render the view with it
+    card = find_card(card_id)
+    if card is None:
         return "Card not found", 404
-    return render_template(
+    page = render_template(
         "view_card.html",
         title="View Card",
-        card=response.data
+        card=card,
+        similar=similar_to_card(card, SIMILAR_CARDS_SHOWN) # the cards whose images look most like this one
     )
+    return add_validators(make_response(page), etag, last_modified)
 
 #######################################################################################################################
 # Function   : handles get and post requests to update a card's information in the database
@@ -99,55 +789,39 @@ def view_card(card_id):
 #######################################################################################################################
 @app.route("/edit/<int:card_id>", methods=["GET", "POST"])
 def edit_card(card_id):
+    existing = find_card(card_id)
+    if existing is None:
+        return "Card not found", 404
 
     if request.method == "GET":
-        cards = retrieve_library()
-        card = next((c for c in cards if c["id"] == card_id), None)
-
-        if card is None:
-            return "Card not found", 404
-
-        # Normalize None → empty string for form display
-        card["attack"] = "" if card["attack"] is None else card["attack"]
-        card["defense"] = "" if card["defense"] is None else card["defense"]
-
         return render_template(
             "add_edit.html",
             title="Edit Card",
             KNOWN_ATTRIBUTES=KNOWN_ATTRIBUTES,
-            card=card
+            card=existing
         )
 
-    # POST request
-    # POST request
-    form = request.form
+    # POST request: build the edited card from the form, sending the user back to the form if it isn't valid
+    old_filename = existing.image_filename
+    try:
+        card = YugiohCard.from_form(request.form, image_filename=old_filename, id=card_id)
+    except ValueError as e:
+        flash(str(e), "danger")
+        return render_template(
+            "add_edit.html",
+            title="Edit Card",
+            KNOWN_ATTRIBUTES=KNOWN_ATTRIBUTES,
+            card=dict(request.form.items(), id=card_id, image_filename=old_filename)
+        )
 
-    card = {
-        "name": form["name"],
-        "card_type": form["card_type"],
-        "monster_type": form.get("monster_type"),
-        "description": form["description"],
-        "attack": to_int_or_none(form.get("attack")),
-        "defense": to_int_or_none(form.get("defense")),
-        "attribute": form.get("attribute"),
-    }
-
-    # Fetch existing image filename
-    existing = supabase.table("cards") \
-        .select("image_filename") \
-        .eq("id", card_id) \
-        .single() \
-        .execute()
-
-    old_filename = existing.data.get("image_filename")
     new_filename = old_filename
+    created = False  # tracks whether this request wrote a new image file that must be removed if the update fails
 
     file = request.files.get("card_image")
 
     if file and file.filename:
         if not allowed_file(file.filename):
             flash("Unsupported file type.", "danger")
-            card["image_filename"] = old_filename
             return render_template(
                 "add_edit.html",
                 title="Edit Card",
@@ -155,19 +829,16 @@ def edit_card(card_id):
                 card=card
             )
 
-        new_filename = secure_filename(file.filename)
-        file.save(os.path.join(app.config["UPLOAD_FOLDER"], new_filename))
-
-        # Remove old image safely
-        if old_filename:
-            old_path = os.path.join(app.config["UPLOAD_FOLDER"], old_filename)
-            if os.path.exists(old_path):
-                os.remove(old_path)
+        # store the image under its content hash. the old image is only released once the update succeeds
+        new_filename, created = store_upload(file, app.config["UPLOAD_FOLDER"])
 
-    card["image_filename"] = new_filename
+    card.image_filename = new_filename
 
+    # update the card and get back the row it replaced in one round trip, so the image released below is the one the
+    # database actually held even if the card changed since it was cached
     try:
-        supabase.table("cards").update(card).eq("id", card_id).execute()
+        previous, current = data_client.run(
+            data_client.update_card_returning_previous(card_id, card.to_row(), g.owner_id))
 
     except Exception as e:
         message = str(e).lower()
@@ -177,9 +848,10 @@ def edit_card(card_id):
         else:
             flash(f"An unexpected database error occurred: {e}", "danger")
 
-        card["id"] = card_id
-        card["attack"] = "" if card["attack"] is None else card["attack"]
-        card["defense"] = "" if card["defense"] is None else card["defense"]
+        # the row still points at the old image, so remove the upload if this request created it
+        if created:
+            discard_image(new_filename, app.config["UPLOAD_FOLDER"])
+        card.image_filename = old_filename
 
         return render_template(
             "add_edit.html",
@@ -188,7 +860,19 @@ def edit_card(card_id):
             card=card
         )
 
-    session.pop("cards", None)
+    # the card was deleted by another request since it was looked up (only the owner's own cards are updated)
+    if previous is None:
+        if created:
+            discard_image(new_filename, app.config["UPLOAD_FOLDER"])
+        library_changed(deleted=[card_id])
+        return "Card not found", 404
+
+    library_changed(upserted=[current])
+
+    # the row no longer references the old image, so remove it in the background unless another card shares the file
+    if previous.get("image_filename") != new_filename:
+        release_images_later(supabase, [previous.get("image_filename")], app.config["UPLOAD_FOLDER"])
+
     flash("Card successfully updated!", "success")
     return redirect(url_for("library"))
 
@@ -199,30 +883,14 @@ def edit_card(card_id):
 #######################################################################################################################
 @app.route("/add", methods=["GET", "POST"])
 def add_card():
-    # for POST requests, parse form data into a card dictionary
+    # for POST requests, build the card from the form, sending the user back to the form if it isn't valid
     if request.method == "POST":
-        name = request.form["name"]
-        card_type = request.form["card_type"]
-        description = request.form["description"]
-        monster_type = request.form.get("monster_type")
-        attack = request.form.get("attack")
-        defense = request.form.get("defense")
-        attribute = request.form.get("attribute")
-
-        # convert any empty strings for integers to None as required by PostgreSQL
-        if card_type is not "Monster":
-            attack = to_int_or_none(request.form.get("attack"))
-            defense = to_int_or_none(request.form.get("defense"))
-
-        card = {
-            "name": name,
-            "card_type": card_type,
-            "description": description,
-            "monster_type": monster_type,
-            "attack": attack,
-            "defense": defense,
-            "attribute": attribute,
-        }
+        try:
+            card = YugiohCard.from_form(request.form)
+        except ValueError as e:
+            flash(str(e), "danger")
+            return render_template("add_edit.html", title="Add Card", KNOWN_ATTRIBUTES=KNOWN_ATTRIBUTES,
+                                   card=request.form)
 
         # get the image file uploaded by user if they supplied one. only accepts valid file extensions
         file = request.files.get("card_image")
@@ -230,18 +898,18 @@ def add_card():
             flash("Unsupported file type.", "danger")
             return render_template("add_edit.html", title="Add Card", KNOWN_ATTRIBUTES=KNOWN_ATTRIBUTES, card=card)
 
-        # if file is a valid extension, sanitize the filename and save it. otherwise return nothing
+        # if file is a valid extension, store it under its content hash. otherwise return nothing
+        created = False
         if file and allowed_file(file.filename):
-            filename = secure_filename(file.filename)
-            file.save(os.path.join(app.config["UPLOAD_FOLDER"], filename))
+            filename, created = store_upload(file, app.config["UPLOAD_FOLDER"])
         else:
             filename = None
-        card["image_filename"] = filename
+        card.image_filename = filename
 
         # SUPABASE INSERT
         try:
-            # Insert into Supabase
-            supabase.table("cards").insert(card).execute()
+            # Insert into Supabase, into the request owner's collection
+            response = supabase.table("cards").insert(owned_row(card)).execute()
 
         except Exception as e:
             message = str(e).lower()
@@ -251,6 +919,11 @@ def add_card():
             else:
                 flash(f"An unexpected database error occurred: {e}", "danger")
 
+            # no row references the uploaded image, so don't leave it behind
+            if created:
+                discard_image(filename, app.config["UPLOAD_FOLDER"])
+            card.image_filename = None
+
             return render_template(
                 "add_edit.html",
                 title="Add Card",
@@ -258,7 +931,7 @@ def add_card():
                 card=card
             )
 
-        session.pop("cards", None)
+        library_changed(upserted=response.data)
         flash("Card successfully added!", "success")
         return redirect(url_for("index"))
 
@@ -276,12 +949,12 @@ def add_card():
 #######################################################################################################################
 @app.get("/delete/<int:card_id>")
 def confirm_delete(card_id):
-    response = supabase.table("cards").select("id, name, image_filename").eq("id", card_id).single().execute()
+    card = find_card(card_id)
 
-    if not response.data:
+    if card is None:
         return redirect("/library")
 
-    return render_template("confirm_delete.html", title="Confirm Delete", card=response.data)
+    return render_template("confirm_delete.html", title="Confirm Delete", card=card)
 
 #######################################################################################################################
 # Function   : handles get requests to delete a card from the database
@@ -291,23 +964,44 @@ def confirm_delete(card_id):
 @app.post("/delete/<int:card_id>")
 def delete_card(card_id):
 
-    # fetch card (for image delete)
-    existing = supabase.table("cards").select("image_filename").eq("id", card_id).single().execute()
-
-    # delete from supabase
-    supabase.table("cards").delete().eq("id", card_id).execute()
+    # delete from supabase if the card is the request owner's. the deleted row comes back, so its image is known
+    # without selecting it first
+    deleted = supabase.table("cards").delete().eq("id", card_id).eq("owner_id", g.owner_id).execute().data or []
 
-    session.pop("cards", None)
+    library_changed(deleted=[card_id])
 
-    # delete local file
-    if existing.data and existing.data["image_filename"]:
-        filepath = os.path.join("static", "images", "cards", existing.data["image_filename"])
-        if os.path.exists(filepath):
-            os.remove(filepath)
+    # delete local file in the background unless another card still references the same image
+    release_images_later(supabase, [row.get("image_filename") for row in deleted], app.config["UPLOAD_FOLDER"])
 
     flash("Card successfully deleted", "danger")
     return redirect(url_for("library"))
 
+#######################################################################################################################
+# Function   : handles post requests from the library page to delete or edit every selected card at once
+# Parameters : the selected card_ids, an action of "delete" or "edit", and for edits the columns to change
+# Returns    : redirects back to the library page
+#######################################################################################################################
+@app.post("/library/bulk")
+def bulk_library_action():
+    try:
+        ids = parse_bulk_ids(request.form.getlist("card_ids"))
+        if request.form.get("action") == "delete":
+            deleted = bulk_delete_cards(ids)
+            flash(f"{len(deleted)} card(s) successfully deleted", "danger")
+        else:
+            updated = bulk_update_cards(ids, parse_bulk_changes(request.form, skip_blank=True))
+            flash(f"{len(updated)} card(s) successfully updated", "success")
+    except ValueError as e:
+        flash(str(e), "danger")
+    except Exception as e:
+        flash(f"Bulk change failed: {e}", "danger")
+
+    # return to the same filtered view of the library the selection was made from (only paths on this site)
+    next_url = request.form.get("next", "")
+    if not next_url.startswith("/") or next_url.startswith("//"):
+        next_url = url_for("library")
+    return redirect(next_url)
+
 #######################################################################################################################
 # Function   : handles get and post requests for scanning a card image to add to the database
 # Parameters : none
@@ -327,35 +1021,63 @@ def scan():
 
         return render_template("scan.html", title="Scan Image", tesseract_exists=tesseract_exists)
 
-    # POST → handle uploaded image
-    file = request.files.get("card_image")
+    # POST → handle uploaded image, burst of images, or video
+    files = [file for file in request.files.getlist("card_image") if file and file.filename]
 
-    if not file or file.filename == "":
+    if not files:
         flash("No file selected", "danger")
         return redirect(url_for("scan"))
 
-    if not allowed_file(file.filename):
-        # Save the uploaded file
-        flash("Unsupported file type. Please use one of the following extensions: png, jpg, jpeg, gif", "danger")
+    # a sheet holding several cards is split into its cards, which are all confirmed together
+    if request.form.get("sheet"):
+        if len(files) != 1 or not allowed_file(files[0].filename):
+            flash("Please upload a single image of the sheet (png, jpg, jpeg, gif)", "danger")
+            return redirect(url_for("scan"))
+        # the whole sheet is one job for OCR admission, so a busy scanner turns it away before any card is scanned
+        # instead of partway through
+        try:
+            with ocr_admission.admit():
+                entries = scan_sheet(files[0])
+        except AdmissionRejected as e:
+            return scanner_busy_response(e)
+        except ValueError as e:
+            flash(str(e), "danger")
+            return redirect(url_for("scan"))
+        flash(f"Found {len(entries)} card(s) on the sheet.", "info")
+        return render_template("confirm_sheet.html", title="Confirm Sheet Scan", entries=entries)
+
+    # Save the uploaded file (or the best frame of a burst/video) under its content hash
+    try:
+        filename, created, frame_message = store_scan_upload(files)
+    except ValueError as e:
+        flash(str(e), "danger")
         return redirect(url_for("scan"))
+    filepath = image_path(filename, app.config["UPLOAD_FOLDER"])
+    name_config = library_name_config()
 
-    # Save the uploaded file
-    filename = secure_filename(file.filename)
-    filepath = os.path.join(app.config["UPLOAD_FOLDER"], filename)
-    file.save(filepath)
-
-    # Run OCR on the uploaded image
+    # Run OCR on the uploaded image. the stages it runs are timed in pipeline_stats and reported at /api/metrics
+    # only a limited number of scans run tesseract at once. beyond the wait queue, the scan is turned away with a 503
     try:
-        card_data = process_yugioh_card(filepath)
+        with ocr_admission.admit(), ocr_scheduler.job():
+            card_data = scan_card(filepath, name_config=name_config)
+    except AdmissionRejected as e:
+        if created:
+            discard_image(filename, app.config["UPLOAD_FOLDER"])
+        return scanner_busy_response(e)
     except Exception as e:
         flash("Error processing image. Check logs.", "danger")
         print("OCR ERROR:", e)
+        if created:
+            discard_image(filename, app.config["UPLOAD_FOLDER"])
         return redirect(url_for("scan"))
 
     # Include the saved image file for preview
-    card_data["image_filename"] = filename
+    card = YugiohCard.from_row(card_data)
+    card.image_filename = filename
+    if frame_message:
+        flash(frame_message, "info")
 
-    return render_template("confirm_scan.html",title="Confirm Scan", card=card_data)
+    return render_template("confirm_scan.html",title="Confirm Scan", card=card)
 
 #######################################################################################################################
 # Function   : handles post requests for confirming a scanned cards ocr data for saving to the db
@@ -364,41 +1086,28 @@ def scan():
 #######################################################################################################################
 @app.post("/confirm_scan")
 def confirm_scan():
-    # store form data posted by the user
-    name = request.form["name"]
-    card_type = request.form["card_type"]
-    description = request.form["description"]
-    monster_type = request.form.get("monster_type")
-    attack = request.form.get("attack")
-    defense = request.form.get("defense")
-    attribute = request.form.get("attribute")
-
     # Retrieve uploaded file (if any)
     file = request.files.get("card_image")
-    existing_filename = request.form.get("image_filename")
+    existing_filename = request.form.get("image_filename") or None
+
+    # build the card from the form posted by the user, sending them back to the confirmation page if it isn't valid
+    try:
+        card = YugiohCard.from_form(request.form, image_filename=existing_filename)
+    except ValueError as e:
+        flash(str(e), "danger")
+        return render_template("confirm_scan.html", title="Scan Card", card=request.form)
 
     # If user uploaded a new file, save it. Otherwise, use existing file
+    created = False
     if file and allowed_file(file.filename):
-        filename = secure_filename(file.filename)
-        file.save(os.path.join(app.config["UPLOAD_FOLDER"], filename))
+        filename, created = store_upload(file, app.config["UPLOAD_FOLDER"])
     else:
         filename = existing_filename
-
-    # define dictionary for returning to template on error
-    card = {
-        "name": name,
-        "card_type": card_type,
-        "description": description,
-        "monster_type": monster_type,
-        "attack": attack,
-        "defense": defense,
-        "attribute": attribute,
-        "image_filename": filename
-    }
+    card.image_filename = filename
 
     # SUPABASE INSERT
     try:
-        supabase.table("cards").insert(card).execute()
+        response = supabase.table("cards").insert(owned_row(card)).execute()
 
     except Exception as e:
         # Supabase unique constraint violation looks like:
@@ -410,6 +1119,11 @@ def confirm_scan():
         else:
             flash(f"An unexpected database error occurred: {e}", "danger")
 
+        # remove a replacement upload nothing references and fall back to the scanned image
+        if created:
+            discard_image(filename, app.config["UPLOAD_FOLDER"])
+        card.image_filename = existing_filename
+
         # return user to confirmation page with their data intact
         tesseract_exists = ensure_tesseract() is not None
         return render_template(
@@ -419,11 +1133,422 @@ def confirm_scan():
             card=card
         )
 
+    # if a replacement image was uploaded, the scanned image is no longer needed unless another card uses it
+    # only content-addressed images are released since the hidden filename field comes from the browser
+    if filename != existing_filename and is_content_addressed(existing_filename):
+        release_images_later(supabase, [existing_filename], app.config["UPLOAD_FOLDER"])
+
     # Success → Clear cache and redirect
-    session.pop("cards", None)
+    library_changed(upserted=response.data)
     flash("Card successfully added!", "success")
     return redirect(url_for("index"))
 
+#######################################################################################################################
+# Function: turns a re-read of a scanned field into its JSON form
+# Params..: the field and a (tier name, value, confidence) reading
+# Returns.: a dictionary of the tier, confidence and value (attack and defense for atkdef)
+#######################################################################################################################
+def reading_json(field, reading):
+    tier, value, confidence = reading
+    result = {"tier": tier, "confidence": round(confidence, 1)}
+    if field == "atkdef":
+        result["attack"], result["defense"] = value
+    else:
+        result["value"] = value
+    return result
+
+#######################################################################################################################
+# Function   : handles post requests from the scan confirmation page to read one misread field again. only that
+#              field's region (cropped from the decoded image the scan kept) is preprocessed and read, with every OCR
+#              tier of the field instead of stopping at the first confident one
+# Parameters : a JSON or form body with the scan's image_filename, the field (name, monster_type, description or
+#              atkdef) and optionally the current value(s) of the field on the page
+# Returns    : a JSON object with the suggested reading (the best one that differs from the current value, when there
+#              is one) and every tier's reading, best first
+#######################################################################################################################
+@app.post("/api/scan/reread")
+def api_reread_field():
+    body = request.get_json(silent=True) or request.form
+    field = body.get("field")
+    if field not in FIELD_READERS:
+        return json_response({"error": f"Field must be one of: {', '.join(FIELD_READERS)}"}, 400)
+
+    # only scans stored by the app can be read, since the filename comes from the browser
+    filename = body.get("image_filename") or ""
+    path = image_path(filename, app.config["UPLOAD_FOLDER"]) if is_content_addressed(filename) else None
+    if path is None or not os.path.exists(path):
+        return json_response({"error": "Scan image not found"}, 404)
+
+    name_config = library_name_config() if field == "name" else None
+    trace = {}
+    try:
+        with ocr_admission.admit(), ocr_scheduler.job():
+            with timed_stage("decode", trace):
+                img = decoded_images.get(path)
+            readings = [reading_json(field, reading) for reading in reread_field(img, field, trace, name_config)]
+    except AdmissionRejected as e:
+        response = json_response({"error": str(e)}, 503)
+        response.headers["Retry-After"] = str(e.retry_after)
+        return response
+    except Exception as e:
+        print("OCR ERROR:", e)
+        return json_response({"error": "Error processing image. Check logs."}, 500)
+
+    # the user is re-reading the field because the current value looks wrong, so prefer a reading that differs
+    keys = ("attack", "defense") if field == "atkdef" else ("value",)
+    current = tuple(str(body.get(key) or "").strip() for key in keys)
+    different = [reading for reading in readings
+                 if tuple("" if reading[key] is None else str(reading[key]).strip() for key in keys) != current]
+    return json_response({"reading": (different or readings)[0], "readings": readings, "stages": trace.get("stages")})
+
+#######################################################################################################################
+# Function   : handles get requests for listing cards as JSON
+# Parameters : optional query parameters: fields (comma separated columns), limit and offset
+# Returns    : a JSON object holding the list of cards
+#######################################################################################################################
+@app.get("/api/cards")
+def api_list_cards():
+    # only the requested columns are selected, so listings don't transfer descriptions unless asked for
+    try:
+        fields = parse_fields(request.args.get("fields"), CARD_SUMMARY_COLUMNS)
+    except ValueError as e:
+        return json_response({"error": str(e)}, 400)
+
+    limit = request.args.get("limit", type=int)
+    limit = limit if limit is not None and limit > 0 else None
+    offset = max(request.args.get("offset", default=0, type=int), 0)
+
+    # facet filters, ATK/DEF ranges and sorts are resolved by the in-memory indexes and passed to the query as ids
+    try:
+        ids, sorted_by_index = matching_card_ids(offset + limit if limit else None)
+    except ValueError as e:
+        return json_response({"error": str(e)}, 400)
+
+    # cards are served from the card cache, which is already ordered by name
+    if sorted_by_index:
+        # the index already sorted (and for a limit, top-k'd) the ids, so only the requested page is looked up
+        cards = [find_card(card_id) for card_id in ids[offset:]]
+        return json_response({"cards": [card.to_dict(fields) for card in cards if card is not None]})
+
+    cards = retrieve_library()
+    if ids is not None:
+        wanted = set(ids)
+        cards = [card for card in cards if card.id in wanted]
+
+    # page through the library if a limit was supplied
+    cards = cards[offset:offset + limit] if limit is not None else cards[offset:]
+    return json_response({"cards": [card.to_dict(fields) for card in cards]})
+
+#######################################################################################################################
+# Function   : handles get requests for the cards changed since a version, so copies of the library can apply only
+#              what changed instead of fetching every card again. a new copy starts from since=0 (every current card)
+#              and follows "version" until "more" is false
+# Parameters : query parameters: since (the version the client has), optional limit and fields (comma separated
+#              columns of the changed cards)
+# Returns    : a JSON object of the changes ("upsert" with the card, or "delete" with its id) oldest first, the
+#              version to ask from next time and whether more changes are waiting. a 410 tells the client to start
+#              over from since=0 because deletions it hasn't seen were already pruned, and a 503 that the database
+#              needs migrating
+#######################################################################################################################
+@app.get("/api/cards/changes")
+def api_card_changes():
+    since = request.args.get("since", type=int)
+    if since is None or since < 0:
+        return json_response({"error": "since must be a version number (0 for every card)"}, 400)
+    limit = request.args.get("limit", default=CHANGES_PAGE_SIZE, type=int)
+    limit = min(max(limit, 1), MAX_CHANGES_PAGE_SIZE)
+    try:
+        fields = parse_fields(request.args.get("fields"), CARD_COLUMNS)
+    except ValueError as e:
+        return json_response({"error": str(e)}, 400)
+
+    # read from the database rather than the card cache, since other copies of the app write to it too
+    try:
+        result = data_client.run(data_client.card_changes(since, limit, g.owner_id))
+    except DataClientError as e:
+        if e.code != "PGRST202":
+            raise
+        # the database predates change tracking
+        return json_response({"error": "Change tracking isn't set up. Run python -m data_layer.migrate_supabase_db."},
+                             503)
+    if result.get("reset"):
+        return json_response({"error": "Changes since that version are no longer available. Sync again from 0.",
+                              "reset": True}, 410)
+
+    for change in result["changes"]:
+        if change["op"] == "upsert":
+            change["card"] = {field: change["card"].get(field) for field in fields}
+    return json_response({"changes": result["changes"], "version": result["version"], "more": result["more"]})
+
+#######################################################################################################################
+# Function   : handles delete requests for many cards at once
+# Parameters : a JSON body of {"ids": [card ids]}
+# Returns    : a JSON object with the ids of the deleted cards
+#######################################################################################################################
+@app.delete("/api/cards")
+def api_bulk_delete_cards():
+    body = request.get_json(silent=True) or {}
+    try:
+        ids = parse_bulk_ids(body.get("ids") or [])
+    except ValueError as e:
+        return json_response({"error": str(e)}, 400)
+    deleted = bulk_delete_cards(ids)
+    return json_response({"deleted": [row["id"] for row in deleted]})
+
+#######################################################################################################################
+# Function   : handles patch requests that change the same columns on many cards at once
+# Parameters : a JSON body of {"ids": [card ids], "changes": {column: value}}. a null value clears the column
+# Returns    : a JSON object holding the updated cards
+#######################################################################################################################
+@app.patch("/api/cards")
+def api_bulk_update_cards():
+    body = request.get_json(silent=True) or {}
+    try:
+        ids = parse_bulk_ids(body.get("ids") or [])
+        unknown = set(body.get("changes") or {}) - set(BULK_EDIT_COLUMNS)
+        if unknown:
+            raise ValueError(f"Only {', '.join(BULK_EDIT_COLUMNS)} can be changed in bulk")
+        changes = parse_bulk_changes(body.get("changes") or {}, skip_blank=False)
+    except ValueError as e:
+        return json_response({"error": str(e)}, 400)
+    updated = bulk_update_cards(ids, changes)
+    return json_response({"cards": [YugiohCard.from_row(row).to_dict() for row in updated]})
+
+#######################################################################################################################
+# Function   : handles get requests for a single card as JSON
+# Parameters : the card's database id and an optional fields query parameter (comma separated columns)
+# Returns    : a JSON object for the card
+#######################################################################################################################
+@app.get("/api/cards/<int:card_id>")
+def api_get_card(card_id):
+    try:
+        fields = parse_fields(request.args.get("fields"), CARD_COLUMNS)
+    except ValueError as e:
+        return json_response({"error": str(e)}, 400)
+
+    card = find_card(card_id)
+    if card is None:
+        return json_response({"error": "Card not found"}, 404)
+    return json_response(card.to_dict(fields))
+
+#######################################################################################################################
+# Function   : handles get requests for the cards whose images look most like a card's image
+# Parameters : the card's database id and an optional k query parameter (how many cards to return)
+# Returns    : a JSON object holding the similar cards, most similar first
+#######################################################################################################################
+@app.get("/api/cards/<int:card_id>/similar")
+def api_similar_cards(card_id):
+    card = find_card(card_id)
+    if card is None:
+        return json_response({"error": "Card not found"}, 404)
+    return json_response({"cards": similar_cards_json(similar_to_card(card, similar_count_from_request()))})
+
+#######################################################################################################################
+# Function   : handles post requests for the cards whose images look most like an uploaded image
+# Parameters : the image as the "card_image" file of a multipart form and an optional k query parameter
+# Returns    : a JSON object holding the similar cards, most similar first
+#######################################################################################################################
+@app.post("/api/cards/similar")
+def api_similar_to_image():
+    try:
+        vector = embed_uploaded_image(request.files.get("card_image"))
+    except ValueError as e:
+        return json_response({"error": str(e)}, 400)
+    return json_response({"cards": similar_cards_json(find_similar_cards(vector, similar_count_from_request()))})
+
+#######################################################################################################################
+# Function   : handles get and post requests for searching the library with an uploaded image
+# Parameters : none
+# Returns    : similar.html, holding the cards that look most like the uploaded image after a post
+#######################################################################################################################
+@app.route("/similar", methods=["GET", "POST"])
+def similar_search():
+    similar = None
+    if request.method == "POST":
+        try:
+            similar = find_similar_cards(embed_uploaded_image(request.files.get("card_image")), SIMILAR_CARDS_SHOWN)
+        except ValueError as e:
+            flash(str(e), "danger")
+    return render_template("similar.html", title="Find Similar Cards", similar=similar)
+
+#######################################################################################################################
+# Function   : handles get requests for facet counts of the library
+# Parameters : optional attribute, card_type and monster_type query parameters (each may be repeated)
+# Returns    : a JSON object with the matching card ids and how many cards each facet value would match
+#######################################################################################################################
+@app.get("/api/cards/facets")
+def api_card_facets():
+    filters = facet_filters_from_request()
+    index = load_facet_index()
+    ids = index.filter_ids(filters)
+    return json_response({
+        "filters": filters,
+        "total": len(ids),
+        "ids": ids,
+        "facets": index.facet_counts(filters)
+    })
+
+#######################################################################################################################
+# Function   : handles get requests for the dashboard of the request owner's collection statistics
+# Parameters : none
+# Returns    : stats.html
+#######################################################################################################################
+@app.get("/stats")
+def stats_dashboard():
+    # the statistics only change when the library does, so the library version validates the page
+    load_card_cache()  # syncs with the database first, so writes made elsewhere change the version
+    etag = "stats-" + library_version_tag(g.owner_id)
+    _, _, last_modified = current_library_version(g.owner_id)
+    cached = not_modified_response(etag, last_modified)
+    if cached:
+        return cached
+
+    page = render_template(
+        "stats.html",
+        title="Collection Statistics",
+        owner_id=g.owner_id, # the collection the statistics are of
+        stats=load_collection_stats().summary() # the materialized counters of the collection
+    )
+    return add_validators(make_response(page), etag, last_modified)
+
+#######################################################################################################################
+# Function   : handles get requests for the request owner's collection statistics as JSON
+# Parameters : none
+# Returns    : a JSON object with the card count, the card_type/attribute/monster_type breakdowns, the ATK/DEF
+#              distributions and the image coverage
+#######################################################################################################################
+@app.get("/api/stats")
+def api_collection_stats():
+    return json_response(load_collection_stats().summary())
+
+#######################################################################################################################
+# Function   : handles post requests to rebuild the request owner's collection statistics from the database
+# Parameters : none
+# Returns    : a JSON object describing how far the incrementally kept counters had drifted from the database
+#######################################################################################################################
+@app.post("/api/stats/reconcile")
+def api_reconcile_stats():
+    try:
+        return json_response(reconcile_collection_stats(g.owner_id))
+    except Exception as e:
+        return json_response({"error": f"Could not read the library: {e}"}, 500)
+
+#######################################################################################################################
+# Function   : handles post requests for confirming the cards scanned from a sheet for saving to the db
+# Parameters : none
+# Returns    : redirects to the library, or confirm_sheet.html holding the cards that couldn't be saved
+#######################################################################################################################
+@app.post("/confirm_sheet")
+def confirm_sheet():
+    form = request.form
+    cards = []
+    unused_images = []
+    saved = []
+    failed = []
+
+    # the count comes from the form, so it's capped at the most cards a sheet can be split into
+    count = min(max(form.get("count", type=int, default=0), 0), MAX_SHEET_CARDS)
+    for index in range(count):
+        suffix = f"-{index}"
+        image_filename = form.get(f"image_filename{suffix}") or None
+
+        # cards the user unticked aren't saved, and their cropped image is no longer needed
+        if not form.get(f"include{suffix}"):
+            if is_content_addressed(image_filename):
+                unused_images.append(image_filename)
+            continue
+
+        try:
+            cards.append(YugiohCard.from_form(form, suffix=suffix, image_filename=image_filename))
+        except ValueError as e:
+            # send back what the user typed so they can fix it
+            entry = {field: form.get(f"{field}{suffix}") for field in YugiohCard.ROW_FIELDS}
+            entry["image_filename"] = image_filename
+            failed.append((entry, str(e)))
+
+    # insert the cards concurrently, one request each so a duplicate name only fails its own card
+    results = data_client.run_all([data_client.insert("cards", owned_row(card)) for card in cards],
+                                  return_exceptions=True)
+    for card, result in zip(cards, results):
+        if not isinstance(result, Exception):
+            saved.extend(result)
+            continue
+        message = str(result).lower()
+        if "duplicate key" in message or "unique" in message:
+            failed.append((card, "A card with that name already exists."))
+        else:
+            failed.append((card, f"An unexpected database error occurred: {result}"))
+
+    release_images_later(supabase, unused_images, app.config["UPLOAD_FOLDER"])
+
+    if saved:
+        library_changed(upserted=saved)
+        flash(f"{len(saved)} card(s) successfully added!", "success")
+
+    # return the user to the confirmation page with only the cards that still need fixing
+    if failed:
+        flash(f"{len(failed)} card(s) could not be saved.", "danger")
+        return render_template("confirm_sheet.html", title="Confirm Sheet Scan", entries=failed)
+
+    return redirect(url_for("library"))
+
+#######################################################################################################################
+# Function   : handles get requests for the fingerprinted css and js files written by the asset build. their names
+#              change whenever their contents do, so browsers may keep them for a year without revalidating. files
+#              the build didn't write (like source maps) are served from the static folder as usual
+# Parameters : the fingerprinted path
+# Returns    : the file, precompressed with the best encoding the browser accepts
+#######################################################################################################################
+@app.get("/assets/<path:filename>")
+def serve_asset(filename):
+    encodings = static_assets.encodings(filename)
+    if encodings is None:
+        return send_from_directory(app.static_folder, filename)
+
+    accepted = request.accept_encodings
+    encoding = next((encoding for encoding in encodings if accepted.quality(encoding) > 0), None)
+    suffix = ENCODINGS[encoding] if encoding else ""
+
+    # the type is guessed from the original name since the compressed copies end in .br/.gz
+    mimetype = "text/css" if filename.endswith(".css") else "text/javascript"
+    response = send_from_directory(static_assets.dist_folder, filename + suffix, mimetype=mimetype,
+                                   max_age=ASSET_MAX_AGE)
+    response.headers["Cache-Control"] = f"public, max-age={ASSET_MAX_AGE}, immutable"
+    response.headers["Vary"] = "Accept-Encoding"
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    return response
+
+#######################################################################################################################
+# Function   : handles get requests for the app's runtime metrics
+# Parameters : none
+# Returns    : a JSON object with the OCR pipeline's per-stage timings, the OCR queue depth and wait times, the
+#              library row cache's hit rate, how many owners' caches, indexes and statistics are in memory and the
+#              image index's size and search counts
+#######################################################################################################################
+@app.get("/api/metrics")
+def api_metrics():
+    return json_response({
+        "ocr_pipeline": pipeline_stats.snapshot(),
+        "ocr_admission": ocr_admission.snapshot(),
+        "ocr_scheduler": ocr_scheduler.snapshot(),
+        "decoded_images": decoded_images.snapshot(),
+        "library_rows": library_rows.snapshot(),
+        "owner_partitions": {
+            "card_caches": card_caches.snapshot(),
+            "facet_indexes": facet_indexes.snapshot(),
+            "numeric_indexes": numeric_indexes.snapshot(),
+            "collection_stats": collection_stats.snapshot()
+        },
+        "image_index": image_index.snapshot()
+    })
+
+
+# rebuild the statistics to catch drift and drop old tombstones in the background, if periods are configured
+if STATS_RECONCILE_SECONDS > 0 and not IS_OCR_WORKER:
+    threading.Thread(target=reconcile_stats_forever, name="stats-reconcile", daemon=True).start()
+if TOMBSTONE_PRUNE_SECONDS > 0 and not IS_OCR_WORKER:
+    threading.Thread(target=prune_tombstones_forever, name="tombstone-prune", daemon=True).start()
 
 # if the program is run directly, open the app in a web browser and run the app
 if __name__ == "__main__":
@@ -0,0 +1,131 @@
+######################################################################################################################
+# Project...............: Yugioh Card Library
+# Author................: Ben Stearns
+# Date..................: 12-4-25
+# Project Description...: This application creates a digital database library for storing and managing Yugioh cards
+# File Description......: defines functions for picking the best frame out of a burst of photos or a short video of a
+#                         card, so only that one frame is sent through OCR
+#######################################################################################################################
+
+import os                               # for temporary video files
+import tempfile                         # for handing uploaded videos to the video decoder
+import numpy as np                      # for vectorized sharpness and glare metrics
+from PIL import Image
+
+# OpenCV is only needed to decode videos. bursts of photos work without it
+try:
+    import cv2
+except ImportError:
+    cv2 = None
+
+# every frame is scaled to this width before scoring so frames of different resolutions are compared fairly
+SCORE_WIDTH = 480
+
+# pixels at or above this brightness (0-255) are counted as glare
+GLARE_LEVEL = 245
+
+# how much a frame's score drops per unit of glare. 3.0 means a frame that is 10% glare loses 0.3 of its score
+GLARE_PENALTY = 3.0
+
+# the most frames sampled out of a video. frames are spread evenly over the clip
+MAX_VIDEO_FRAMES = 48
+
+#######################################################################################################################
+# Function that converts frames into one grayscale NumPy stack of equal sized frames for scoring
+# Parameters: a list of PIL images
+# Returns: a float32 array shaped (frames, height, width)
+#######################################################################################################################
+def frames_to_stack(frames):
+    # frames of one capture share an aspect ratio, so the first frame decides the common size
+    first = frames[0]
+    height = max(int(first.height * SCORE_WIDTH / first.width), 1)
+    return np.stack([
+        np.asarray(frame.convert("L").resize((SCORE_WIDTH, height), Image.BILINEAR), dtype=np.float32)
+        for frame in frames
+    ])
+
+#######################################################################################################################
+# Function that measures the sharpness of every frame as the variance of its Laplacian (blurry frames have few edges)
+# Parameters: the grayscale frame stack
+# Returns: an array holding one sharpness value per frame
+#######################################################################################################################
+def sharpness_scores(stack):
+    # 4-neighbour Laplacian computed with array slicing for all frames at once
+    laplacian = (stack[:, :-2, 1:-1] + stack[:, 2:, 1:-1] + stack[:, 1:-1, :-2] + stack[:, 1:-1, 2:]
+                 - 4.0 * stack[:, 1:-1, 1:-1])
+    return laplacian.reshape(len(stack), -1).var(axis=1)
+
+#######################################################################################################################
+# Function that measures how much of every frame is washed out by glare
+# Parameters: the grayscale frame stack
+# Returns: an array holding the fraction (0-1) of glare pixels per frame
+#######################################################################################################################
+def glare_fractions(stack):
+    return (stack >= GLARE_LEVEL).reshape(len(stack), -1).mean(axis=1)
+
+#######################################################################################################################
+# Function that scores every frame and picks the best one
+# Parameters: a list of PIL images
+# Returns: a tuple of (index of the best frame, list of score dictionaries in frame order)
+#######################################################################################################################
+def select_best_frame(frames):
+    stack = frames_to_stack(frames)
+    sharpness = sharpness_scores(stack)
+    glare = glare_fractions(stack)
+
+    # sharpness is relative to the sharpest frame of the capture, so the score doesn't depend on lighting or the camera
+    relative_sharpness = sharpness / (sharpness.max() + 1e-6)
+    scores = relative_sharpness - GLARE_PENALTY * glare
+
+    best = int(np.argmax(scores))
+    details = [
+        {"frame": index, "sharpness": float(sharpness[index]), "glare": float(glare[index]),
+         "score": float(scores[index])}
+        for index in range(len(frames))
+    ]
+    return best, details
+
+#######################################################################################################################
+# Function that decodes frames evenly spread over a video. most containers report their frame count, but WebM, MKV and
+# streamed MP4 files can report 0 or -1. for those every stride-th frame is kept instead, and the stride doubles
+# whenever more than max_frames are held, so the kept frames stay spread over the whole clip
+# Parameters: the raw bytes of the uploaded video and the most frames to keep
+# Returns: a list of PIL images
+# Raises: RuntimeError if OpenCV isn't installed or the video can't be decoded
+#######################################################################################################################
+def frames_from_video(data, max_frames=MAX_VIDEO_FRAMES):
+    if cv2 is None:
+        raise RuntimeError("Video scanning requires OpenCV. Install it with: pip install opencv-python")
+
+    # OpenCV only reads videos from a path, so the upload is written to a temporary file first
+    fd, path = tempfile.mkstemp(suffix=".video")
+    try:
+        with os.fdopen(fd, "wb") as tmp:
+            tmp.write(data)
+
+        capture = cv2.VideoCapture(path)
+        total = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+        wanted = set(np.linspace(0, total - 1, num=min(max_frames, total), dtype=int).tolist()) if total > 0 else None
+
+        frames = []                     # (frame index, frame) pairs
+        stride = 1
+        index = 0
+        while True:
+            # grab() skips decoding work for frames that aren't kept
+            if not capture.grab():
+                break
+            if index in wanted if wanted is not None else index % stride == 0:
+                ok, bgr = capture.retrieve()
+                if ok:
+                    frames.append((index, Image.fromarray(cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB))))
+                if wanted is None and len(frames) > max_frames:
+                    stride *= 2
+                    frames = [(kept, frame) for kept, frame in frames if kept % stride == 0]
+            index += 1
+        capture.release()
+    finally:
+        os.remove(path)
+
+    if not frames:
+        raise RuntimeError("No frames could be read from the video")
+    return [frame for _, frame in frames]
@@ -8,18 +8,21 @@
 
 #######################################################################################################################
 # Function that prepares a cropped image of a card's attack and defense for tesseract
-# Parameters: the original cropped image
+# Parameters: the original cropped image, how many times to enlarge it, and whether to also binarize it (for a retry
+#             when a lighter pass wasn't read confidently)
 # Returns: the preprocessed version of the image
 #######################################################################################################################
 from PIL import ImageOps, ImageFilter, Image
 
-def preprocess_atkdef(img):
+def preprocess_atkdef(img, scale=3, heavy=False):
     gray = img.convert("L") # converts the image to greyscale using Pillow's 'L' mode
     gray = ImageOps.autocontrast(gray) # removes color information, leaving only brightness levels for OCR
-    gray = gray.resize((gray.width * 3, gray.height * 3), Image.LANCZOS) # increase the size of the image
+    gray = gray.resize((int(gray.width * scale), int(gray.height * scale)), Image.LANCZOS) # enlarge the image
 
     # make edges of image cripser with a sharp mask
     # radius=1 is how far around each pixel to look
     # percent = how strong the sharpening effect is
     gray = gray.filter(ImageFilter.UnsharpMask(radius=1, percent=150))
+    if heavy:
+        gray = gray.point(lambda p: 255 if p > 127 else 0) # binarize so only the text's strokes are left
     return gray
\ No newline at end of file
@@ -8,14 +8,18 @@
 
 #######################################################################################################################
 # Function used to prepare and image of a card's card_type for OCR
-# Parameters: the original cropped image
+# Parameters: the original cropped image, how many times to enlarge it, and whether to also sharpen and binarize it
+#             (for a retry when a lighter pass wasn't read confidently)
 # Returns: a processed version of the image supplied
 #######################################################################################################################
 from PIL import ImageFilter, Image
 
-def preprocess_desc(img):
+def preprocess_desc(img, scale=2, heavy=False):
     """Used to prepare a cropped card description image for ocr"""
     gray = img.convert("L")
-    gray = gray.resize((gray.width * 2, gray.height * 2), Image.LANCZOS)
+    gray = gray.resize((int(gray.width * scale), int(gray.height * scale)), Image.LANCZOS)
     gray = gray.filter(ImageFilter.MedianFilter(3))
+    if heavy:
+        gray = gray.filter(ImageFilter.UnsharpMask(radius=1, percent=150)) # sharpen the edges of the text
+        gray = gray.point(lambda p: 255 if p > 127 else 0) # binarize so only the text's strokes are left
     return gray
\ No newline at end of file
@@ -8,17 +8,21 @@
 
 #######################################################################################################################
 # Function that prepares an image of a card's name for OCR
-# Parameters: the original cropped image
+# Parameters: the original cropped image, how many times to enlarge it, and whether to also binarize it (for a retry
+#             when a lighter pass wasn't read confidently)
 # Returns: the preprocessed version of the image
 #######################################################################################################################
 from PIL import ImageOps, ImageFilter, Image
 
-def preprocess_name(img):
+def preprocess_name(img, scale=3, heavy=False):
     """Used to prepare a cropped card name image for ocr"""
     gray = img.convert("L") # convert image to grayscale
     gray = ImageOps.autocontrast(gray) # increase the contrast for better recondition
     # remove noise by replacing each pixel with the median of its neighbor
     gray = gray.filter(ImageFilter.MedianFilter(3))
     gray = gray.filter(ImageFilter.UnsharpMask(radius=1, percent=150)) # sharpen the edges of card text etc.
-    return gray.resize((gray.width * 3, gray.height * 3), Image.LANCZOS) # enlarge image with LANCZOS filter
+    gray = gray.resize((int(gray.width * scale), int(gray.height * scale)), Image.LANCZOS) # enlarge with LANCZOS
+    if heavy:
+        gray = gray.point(lambda p: 255 if p > 127 else 0) # binarize so only the text's strokes are left
+    return gray
 
@@ -8,17 +8,20 @@
 
 #######################################################################################################################
 # Function used to prepare and image of a card's card_type for OCR
-# Parameters: the original cropped image
+# Parameters: the original cropped image, how many times to enlarge it, and whether to also binarize it (for a retry
+#             when a lighter pass wasn't read confidently)
 # Returns: a processed version of the image supplied
 #######################################################################################################################
 from PIL import ImageOps, ImageFilter, ImageEnhance, Image
 
-def preprocess_type(img):
+def preprocess_type(img, scale=6, heavy=False):
     """Used to prepare a cropped card_type image for ocr"""
     gray = img.convert("L") # convert to grayscale
     gray = ImageOps.autocontrast(gray) # perform auto-contrast enhancement
-    gray = gray.resize((gray.width * 6, gray.height * 6), Image.LANCZOS) # enlarge
+    gray = gray.resize((int(gray.width * scale), int(gray.height * scale)), Image.LANCZOS) # enlarge
     gray = gray.filter(ImageFilter.MedianFilter(3)) # remove noise
     gray = gray.filter(ImageFilter.UnsharpMask(radius=1, percent=250)) # sharpen edges of text etc.
     gray = ImageEnhance.Contrast(gray).enhance(1.5) # increase contrast some more
+    if heavy:
+        gray = gray.point(lambda p: 255 if p > 127 else 0) # binarize so only the text's strokes are left
     return gray
\ No newline at end of file
@@ -0,0 +1,80 @@
+######################################################################################################################
+# Project...............: Yugioh Card Library
+# Author................: Ben Stearns
+# Date..................: 12-4-25
+# Project Description...: This application creates a digital database library for storing and managing Yugioh cards
+# File Description......: defines functions for finding the individual cards in a photo of a binder page (or any
+#                         sheet of cards laid out in rows) so each card can be cropped and scanned on its own
+#######################################################################################################################
+
+import numpy as np                      # for edge maps and projection profiles
+from PIL import Image
+
+# the width the photo is scaled to while searching for cards. boxes are scaled back up to the original photo
+DETECT_WIDTH = 900
+
+# a Yu-Gi-Oh card is 59mm x 86mm. detected boxes whose width/height ratio is too far from it aren't cards
+CARD_ASPECT = 59 / 86
+ASPECT_TOLERANCE = 0.35
+
+# rows/columns whose edge density is below this fraction of the median are treated as gaps between cards
+GAP_LEVEL = 0.35
+
+# a run of rows/columns is only a card if it is at least this fraction of the photo's height/width
+MIN_CARD_FRACTION = 0.08
+
+# the most cards a sheet can be split into: every row and column of cards is at least MIN_CARD_FRACTION of the photo
+MAX_SHEET_CARDS = int(1 / MIN_CARD_FRACTION) ** 2
+
+#######################################################################################################################
+# Function that splits a 1-D edge profile into the runs that hold content (cards), separated by low-edge gaps
+# Parameters: the profile and the minimum length of a run
+# Returns: a list of (start, stop) index pairs
+#######################################################################################################################
+def content_runs(profile, min_length):
+    # smooth the profile so single lines of artwork with few edges don't split a card in two
+    window = max(len(profile) // 100, 3)
+    smooth = np.convolve(profile, np.ones(window) / window, mode="same")
+    is_content = smooth > GAP_LEVEL * np.median(smooth)
+
+    # find where content starts and stops by looking for changes in the boolean mask
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], is_content.astype(np.int8), [0]))))
+    runs = zip(edges[::2], edges[1::2])
+    return [(int(start), int(stop)) for start, stop in runs if stop - start >= min_length]
+
+#######################################################################################################################
+# Function that finds the rectangle of every card on a sheet
+# Parameters: the photo of the sheet as a PIL image
+# Returns: a list of (left, upper, right, lower) boxes in the photo's coordinates, ordered row by row
+#######################################################################################################################
+def find_card_boxes(sheet):
+    scale = sheet.width / DETECT_WIDTH
+    small = sheet.convert("L").resize((DETECT_WIDTH, max(int(sheet.height / scale), 1)), Image.BILINEAR)
+    gray = np.asarray(small, dtype=np.float32)
+
+    # gradient magnitude: card borders, text and artwork are full of edges, binder pockets and tables are not
+    edges = np.zeros_like(gray)
+    edges[:, 1:] += np.abs(np.diff(gray, axis=1))
+    edges[1:, :] += np.abs(np.diff(gray, axis=0))
+
+    boxes = []
+    # first split the sheet into rows of cards, then split each row into its cards
+    for top, bottom in content_runs(edges.mean(axis=1), int(MIN_CARD_FRACTION * gray.shape[0])):
+        band = edges[top:bottom]
+        for left, right in content_runs(band.mean(axis=0), int(MIN_CARD_FRACTION * gray.shape[1])):
+            aspect = (right - left) / (bottom - top)
+            if abs(aspect - CARD_ASPECT) / CARD_ASPECT > ASPECT_TOLERANCE:
+                continue
+            boxes.append((int(left * scale), int(top * scale), int(right * scale), int(bottom * scale)))
+    return boxes
+
+#######################################################################################################################
+# Function that crops every card out of a sheet
+# Parameters: the photo of the sheet as a PIL image
+# Returns: a list of PIL images, one per card. if no grid of cards is found, the whole photo is returned as one card
+#######################################################################################################################
+def split_sheet(sheet):
+    boxes = find_card_boxes(sheet)
+    if not boxes:
+        return [sheet]
+    return [sheet.crop(box) for box in boxes]
@@ -11,12 +11,15 @@ from PIL import Image, ImageOps, ImageFilter, ImageEnhance  # for image manipula
 import pytesseract                              # for ocular recognition functionality
 import re                                       # for pattern matching text extracted from cards
 import os
+from functools import partial                   # for giving the name reader a collection's name profile
 
 # imports from various other modules of the program
 from extractors.atkdef_extractor import fix_atkdef_labels, extract_atk_def_numbers
 from extractors.attribute_classifier import classify_attribute
 from extractors.name_extractor import correct_chars_for_name
 from extractors.ocr_helpers import ocr_data, ocr_text_from_data
+from extractors.ocr_profiles import PROFILES
+from extractors.progressive_ocr import read_progressively, read_all_tiers
 from extractors.type_extractor import match_monster_type
 from preprocessing.cropping import crop_regions
 from preprocessing.preprocess_atkdef import preprocess_atkdef
@@ -25,54 +28,124 @@ from preprocessing.preprocess_description import preprocess_desc
 from preprocessing.preprocess_name import preprocess_name
 from preprocessing.preprocess_type import preprocess_type
 from utils.debug import debug_show_crops
+from utils.pipeline_stats import timed_stage, skip_stage
 
 
 #######################################################################################################################
-# Function used to process an entire card image and extract its individual data
-# Parameters: the filepath to the image to analyze
-# Returns: a dictionary representing the card's information
+# Functions used to read each text region once it is preprocessed. Each returns the field's value along with the raw
+# ocr data, whose word confidences decide whether a cheaper pass over the region was good enough
+# Parameters: the preprocessed region image (and for names, optionally the name profile configuration of the
+#             collection the card is scanned into)
+# Returns: a tuple of (the field's value, the ocr data)
 #######################################################################################################################
-def process_yugioh_card(image_path):
-    # open the image, crop into each region of the card that has the data we need, and save each crop for debugging
-    original = Image.open(image_path)
-    regions = crop_regions(original)
-    debug_show_crops(regions)
-
-    # ---------- Preprocess each cropped region ----------
-    name_img = preprocess_name(regions["name"])
-    attribute_img = preprocess_attribute(regions["attribute"])
-    type_img = preprocess_type(regions["type"])
-    desc_img = preprocess_desc(regions["description"])
-    atkdef_img = preprocess_atkdef(regions["atkdef"])
-
-    # ---------- Extract name data ----------
-    name_data = ocr_data(name_img, config="--psm 7") # perform ocr. --psm7 treats are a single line of text
+def read_name(name_img, config=None):
+    name_data = ocr_data(name_img, config=config or PROFILES["name"].config()) # ocr as a single line of known names
     raw_name = ocr_text_from_data(name_data, min_conf=50) # parse ocr data into raw text
-    name_clean = correct_chars_for_name(raw_name) # clean up the raw text
+    return correct_chars_for_name(raw_name), name_data # clean up the raw text
 
-    # ---------- Attribute ----------
-    attribute = classify_attribute(attribute_img) # match the attribute image to its best match in "attribute" folder
 
-    # ---------- Monster Type ----------
-    # perform ocr and only recognize the supplied list of characters
-    type_data = ocr_data(type_img, config="--psm 7 -c tessedit_char_whitelist=ABCDEFGHIJKLMNOPQRSTUVWXYZ[]")
+def read_type(type_img):
+    # perform ocr and only recognize the type line's characters, favouring words from KNOWN_TYPES
+    type_data = ocr_data(type_img, config=PROFILES["type"].config())
     type_raw = ocr_text_from_data(type_data, min_conf=45) # keep only words with a certain confidence level
-    type_clean = match_monster_type(type_raw) # find the raw text's best match in KNOWN_TYPES
+    return match_monster_type(type_raw), type_data # find the raw text's best match in KNOWN_TYPES
 
-    # ---------- DESCRIPTION ----------
-    desc_data = ocr_data(desc_img, config="--psm 6") # perform ocr as a block of text using page segmentation mode 6
-    description_raw = ocr_text_from_data(desc_data, min_conf=45) # keeps only data that meets confidence requirements
+
+def read_description(desc_img):
+    desc_data = ocr_data(desc_img, config=PROFILES["description"].config()) # ocr as a block of text (psm 6)
+    return ocr_text_from_data(desc_data, min_conf=45), desc_data # keep only data meeting confidence requirements
+
+
+def read_atkdef(atkdef_img):
+    # extract raw ATK/DEF data, only allowing the labels, digits and the ATK/\d\d\d\d patterns. every word is kept
+    # (like image_to_string would) since the label fixes and number patterns already reject misreads
+    atkdef_data = ocr_data(atkdef_img, config=PROFILES["atkdef"].config())
+    atkdef_fixed_labels = fix_atkdef_labels(ocr_text_from_data(atkdef_data, min_conf=0))
+    return extract_atk_def_numbers(atkdef_fixed_labels), atkdef_data
+
+#######################################################################################################################
+# Function that cleans up the raw text read from the description region
+# Parameters: the raw text
+# Returns: the cleaned description
+#######################################################################################################################
+def clean_description(description_raw):
     description = re.sub(r'\b[A-Z]{1,2}\b', '', description_raw) # only keep non-isolated A-Z.
     description = re.sub(r'[\|\=\>\<\&]', '', description) # remove symbols
-    description = re.sub(r'\s{2,}', ' ', description).strip() # normalize spacing
+    return re.sub(r'\s{2,}', ' ', description).strip() # normalize spacing
+
+
+# how each text field is read: its card region, preprocessor, OCR function and the test for a complete value
+FIELD_READERS = {
+    "name": ("name", preprocess_name, read_name, bool),
+    "monster_type": ("type", preprocess_type, read_type, bool),
+    "description": ("description", preprocess_desc, read_description, bool),
+    "atkdef": ("atkdef", preprocess_atkdef, read_atkdef, lambda numbers: None not in numbers),
+}
 
-    # ---------- ATK/DEF ----------
-    atkdef_raw = pytesseract.image_to_string(atkdef_img, config="--psm 7").strip() # extract raw ATK/DEF data
-    atkdef_fixed_labels = fix_atkdef_labels(atkdef_raw)
-    atk, defn = extract_atk_def_numbers(atkdef_fixed_labels)
 
-    # ----------IMAGE FILEPATH -----
-    filename = os.path.basename(image_path) # only keep non-nested base name
+#######################################################################################################################
+# Function used to process an entire card image and extract its individual data
+# The regions are processed as a dependency-aware plan: the attribute icon is classified first because it is cheap
+# (template matching, no OCR) and tells us whether the card is a Spell or Trap. Those cards have no monster type or
+# ATK/DEF, so the type and ATK/DEF regions are skipped instead of spending two tesseract calls on them
+# Parameters: the filepath to the image to analyze and an optional dictionary that is filled with the time each stage
+#             took, the stages that were skipped and the OCR tier that read each field
+# Returns: a dictionary representing the card's information
+#######################################################################################################################
+def process_yugioh_card(image_path, trace=None):
+    with timed_stage("decode", trace):
+        original = Image.open(image_path)
+        original.load()
+    return process_card_image(original, os.path.basename(image_path), trace)
+
+#######################################################################################################################
+# Function used to process an already decoded card image (for example one handed to an OCR worker process)
+# Parameters: the card image, the filename to report for it, the optional trace dictionary and the optional name
+#             profile configuration (from name_profile_config) favouring the names of the collection scanned into
+# Returns: a dictionary representing the card's information
+#######################################################################################################################
+def process_card_image(original, filename, trace=None, name_config=None):
+    # crop into each region of the card that has the data we need, and save each crop for debugging
+    # crops are normalized to RGB so palette GIFs, RGBA PNGs and shared-memory RGBX images all preprocess the same way
+    with timed_stage("crop", trace):
+        regions = {key: region if region.mode == "RGB" else region.convert("RGB")
+                   for key, region in crop_regions(original).items()}
+        debug_show_crops(regions)
+
+    # ---------- Attribute (decides which of the remaining stages are needed) ----------
+    with timed_stage("attribute", trace):
+        attribute_img = preprocess_attribute(regions["attribute"])
+        attribute = classify_attribute(attribute_img) # match the attribute image to its best match in "attributes"
+    is_spell_or_trap = attribute in ("SPELL", "TRAP")
+
+    # ---------- Extract name data ----------
+    # each region is read at a low scale first, and only read again larger or filtered harder if it wasn't confident
+    with timed_stage("name", trace):
+        name_clean = read_progressively("name", regions["name"], preprocess_name,
+                                        partial(read_name, config=name_config), trace=trace)
+
+    # ---------- Monster Type (monsters only) ----------
+    if is_spell_or_trap:
+        type_clean = ""
+        skip_stage("type", trace)
+    else:
+        with timed_stage("type", trace):
+            type_clean = read_progressively("type", regions["type"], preprocess_type, read_type, trace=trace)
+
+    # ---------- DESCRIPTION ----------
+    with timed_stage("description", trace):
+        description_raw = read_progressively("description", regions["description"], preprocess_desc,
+                                             read_description, trace=trace)
+        description = clean_description(description_raw)
+
+    # ---------- ATK/DEF (monsters only) ----------
+    if is_spell_or_trap:
+        atk, defn = None, None
+        skip_stage("atkdef", trace)
+    else:
+        with timed_stage("atkdef", trace):
+            atk, defn = read_progressively("atkdef", regions["atkdef"], preprocess_atkdef, read_atkdef,
+                                           is_complete=lambda numbers: None not in numbers, trace=trace)
 
     # ---------- CARD TYPE ----------
     # if the card has an attack value, it's type is a monster. otherwise match its type with its attribute
@@ -96,3 +169,24 @@ def process_yugioh_card(image_path):
         "card_type": card_type,
         "image_filename": filename
     }
+
+#######################################################################################################################
+# Function used to read a single field of an already decoded card image again, with every OCR tier of the field, for
+# when the user says the scan misread it. Only that field's region is preprocessed and read
+# Parameters: the card image, the field (name, monster_type, description or atkdef), the optional trace dictionary
+#             and for names, the optional name profile configuration of the collection scanned into
+# Returns: a list of (tier name, value, confidence) tuples, best first. atkdef values are (attack, defense) tuples
+# Raises: KeyError for a field that can't be re-read
+#######################################################################################################################
+def reread_field(original, field, trace=None, name_config=None):
+    region_name, preprocess, read, is_complete = FIELD_READERS[field]
+    if field == "name":
+        read = partial(read_name, config=name_config)
+    with timed_stage("crop", trace):
+        region = crop_regions(original)[region_name]
+        region = region if region.mode == "RGB" else region.convert("RGB")
+    with timed_stage(region_name, trace):
+        readings = read_all_tiers(region_name, region, preprocess, read, is_complete=is_complete, trace=trace)
+    if field == "description":
+        readings = [(tier, clean_description(value), confidence) for tier, value, confidence in readings]
+    return readings
@@ -0,0 +1,85 @@
+######################################################################################################################
+# Project...............: Yugioh Card Library
+# Author................: Ben Stearns
+# Date..................: 12-4-25
+# Project Description...: This application creates a digital database library for storing and managing Yugioh cards
+# File Description......: builds random sequences of inserts, edits and deletes against a library, for the tests
+#                         that check the incrementally kept structures (indexes, statistics, cached rows) against
+#                         ones rebuilt from scratch
+#######################################################################################################################
+
+import random                           # for reproducible random card rows and writes
+
+# the values the random cards are made of. blanks, "-", "?" and mixed case values are included on purpose since the
+# structures normalize them
+ATTRIBUTES = ["DARK", "light", "Earth ", "FIRE", "-", "", None]
+CARD_TYPES = ["Monster", "spell", "TRAP", None]
+MONSTER_TYPES = ["DRAGON", "spellcaster", "Warrior", "ZOMBIE", None]
+STATS = [0, 500, 1200, "1500", 2500, 3000, 4500, "?", None]
+IMAGES = ["ab/cd/abcd.png", "12/34/1234.png", "ef/01/ef01.png", None]
+
+# the columns an edit can change, like the edit page and the bulk edits
+EDITED_COLUMNS = ("attribute", "card_type", "monster_type", "attack", "defense", "image_filename")
+
+#######################################################################################################################
+# Function that builds a random card row
+# Parameters: the random generator and the card's id
+# Returns: the row as a dictionary
+#######################################################################################################################
+def random_card(rng, card_id):
+    return {
+        "id": card_id,
+        "name": f"Card {card_id}",
+        "attribute": rng.choice(ATTRIBUTES),
+        "card_type": rng.choice(CARD_TYPES),
+        "monster_type": rng.choice(MONSTER_TYPES),
+        "attack": rng.choice(STATS),
+        "defense": rng.choice(STATS),
+        "image_filename": rng.choice(IMAGES),
+    }
+
+#######################################################################################################################
+# Function that builds a random edit of a card. like a bulk edit, it may only hold some of the columns
+# Parameters: the random generator and the card's id
+# Returns: the partial row as a dictionary (always with the id)
+#######################################################################################################################
+def random_edit(rng, card_id):
+    full = random_card(rng, card_id)
+    columns = rng.sample(EDITED_COLUMNS, rng.randint(1, len(EDITED_COLUMNS)))
+    return dict({column: full[column] for column in columns}, id=card_id)
+
+#######################################################################################################################
+# Function that builds a random sequence of writes to a library
+# Parameters: the seed, the number of writes and the number of cards the library starts with
+# Returns: a tuple of (the starting rows, a list of ("upsert", row) and ("delete", card id) writes)
+#######################################################################################################################
+def random_writes(seed, count, initial=20):
+    rng = random.Random(seed)
+    rows = [random_card(rng, card_id) for card_id in range(1, initial + 1)]
+    live = [row["id"] for row in rows]
+    next_id = initial + 1
+    writes = []
+    for _ in range(count):
+        roll = rng.random()
+        if roll < 0.35 or not live:
+            writes.append(("upsert", random_card(rng, next_id)))
+            live.append(next_id)
+            next_id += 1
+        elif roll < 0.75:
+            writes.append(("upsert", random_edit(rng, rng.choice(live))))
+        else:
+            card_id = live.pop(rng.randrange(len(live)))
+            writes.append(("delete", card_id))
+    return rows, writes
+
+#######################################################################################################################
+# Function that applies a write to a dictionary of full rows, the way the database would
+# Parameters: the rows by id and the write
+# Returns: void
+#######################################################################################################################
+def apply_write(rows, write):
+    kind, value = write
+    if kind == "delete":
+        rows.pop(value, None)
+    else:
+        rows[value["id"]] = dict(rows.get(value["id"], {}), **value)
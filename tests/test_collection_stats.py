@@ -0,0 +1,69 @@
+######################################################################################################################
+# Project...............: Yugioh Card Library
+# Author................: Ben Stearns
+# Date..................: 12-4-25
+# Project Description...: This application creates a digital database library for storing and managing Yugioh cards
+# File Description......: tests that the collection statistics kept current by writes match ones rebuilt from
+#                         scratch, and that a reconcile reports drift only when there is some
+#                         Run from the project root with: python -m unittest discover tests
+#######################################################################################################################
+
+import unittest
+
+from data_layer.collection_stats import CollectionStats
+from tests.library_changes import random_writes, apply_write
+
+
+# builds statistics from scratch out of the rows
+def rebuilt(rows):
+    stats = CollectionStats()
+    stats.ensure_loaded(lambda: list(rows))
+    return stats
+
+
+# the summary without the reconcile bookkeeping, which differs between kept and rebuilt statistics by design
+def counted(stats):
+    summary = stats.summary()
+    del summary["reconciles"], summary["last_drift"]
+    return summary
+
+
+class CollectionStatsTest(unittest.TestCase):
+    def test_writes_match_a_rebuild(self):
+        for seed in range(5):
+            initial, writes = random_writes(seed, 300)
+            rows = {row["id"]: row for row in initial}
+            kept = rebuilt(initial)
+            for write in writes:
+                apply_write(rows, write)
+                if write[0] == "delete":
+                    kept.remove(write[1])
+                else:
+                    kept.upsert(write[1])
+                self.assertEqual(counted(kept), counted(rebuilt(rows.values())))
+            self.assertFalse(kept.reconcile(lambda: list(rows.values()))["drifted"])
+
+    def test_removing_twice_or_an_unknown_card_changes_nothing(self):
+        stats = rebuilt([{"id": 1, "attack": 1000, "image_filename": "ab/cd/abcd.png"}])
+        before = counted(stats)
+        stats.remove(2)
+        stats.upsert({"id": 3, "attack": 500})
+        stats.remove(3)
+        stats.remove(3)
+        self.assertEqual(counted(stats), before)
+
+    def test_reconcile_reports_missed_writes(self):
+        rows = [{"id": 1, "attribute": "DARK", "attack": 1000}, {"id": 2, "attribute": "LIGHT", "attack": 2000}]
+        stats = rebuilt(rows)
+        # a write the statistics never heard about
+        rows[1] = dict(rows[1], attribute="FIRE")
+        rows.append({"id": 3, "attribute": "FIRE", "attack": None})
+        drift = stats.reconcile(lambda: rows)
+        self.assertTrue(drift["drifted"])
+        self.assertEqual(drift["missing_ids"], [3])
+        self.assertEqual(drift["fields"]["attribute"], {"FIRE": [0, 2], "LIGHT": [1, 0]})
+        self.assertEqual(counted(stats), counted(rebuilt(rows)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+######################################################################################################################
+# Project...............: Yugioh Card Library
+# Author................: Ben Stearns
+# Date..................: 12-4-25
+# Project Description...: This application creates a digital database library for storing and managing Yugioh cards
+# File Description......: tests that the facet index kept current by writes answers like one rebuilt from scratch
+#                         Run from the project root with: python -m unittest discover tests
+#######################################################################################################################
+
+import itertools
+import unittest
+
+from data_layer.facet_index import FacetIndex, FACET_COLUMNS
+from tests.library_changes import random_writes, apply_write, ATTRIBUTES, CARD_TYPES, MONSTER_TYPES
+
+# filters covering no filter, every single value and combinations of columns (with mixed case values, which the
+# index normalizes)
+FILTERS = ([{}]
+           + [{"attribute": [value]} for value in ATTRIBUTES if value]
+           + [{"card_type": [value]} for value in CARD_TYPES if value]
+           + [{"monster_type": [value]} for value in MONSTER_TYPES if value]
+           + [{"attribute": ["dark", "FIRE"], "card_type": ["monster"]},
+              {"card_type": ["Spell", "Trap"]},
+              {"attribute": ["LIGHT"], "monster_type": ["Dragon", "warrior"], "card_type": ["Monster"]}])
+
+
+# builds an index from scratch out of the rows
+def rebuilt(rows):
+    index = FacetIndex()
+    index.ensure_loaded(lambda: list(rows))
+    return index
+
+
+class FacetIndexTest(unittest.TestCase):
+    # checks that two indexes answer every filter the same way
+    def assert_same_answers(self, kept, expected):
+        self.assertEqual(len(kept), len(expected))
+        for filters in FILTERS:
+            self.assertEqual(sorted(kept.filter_ids(filters)), sorted(expected.filter_ids(filters)), filters)
+            self.assertEqual(kept.facet_counts(filters), expected.facet_counts(filters), filters)
+
+    def test_writes_match_a_rebuild(self):
+        for seed in range(5):
+            initial, writes = random_writes(seed, 300)
+            rows = {row["id"]: row for row in initial}
+            kept = rebuilt(initial)
+            for write in writes:
+                apply_write(rows, write)
+                if write[0] == "delete":
+                    kept.remove(write[1])
+                else:
+                    kept.upsert(write[1])
+                self.assert_same_answers(kept, rebuilt(rows.values()))
+
+    def test_freed_positions_are_reused(self):
+        index = rebuilt([{"id": card_id, "attribute": "DARK"} for card_id in range(1, 11)])
+        for card_id, new_id in zip(range(1, 6), itertools.count(100)):
+            index.remove(card_id)
+            index.upsert({"id": new_id, "attribute": "LIGHT"})
+        self.assertEqual(len(index._ids), 10)
+        self.assertEqual(sorted(index.filter_ids({"attribute": ["light"]})), list(range(100, 105)))
+
+    def test_writes_before_the_load_are_left_to_the_load(self):
+        index = FacetIndex()
+        index.upsert({"id": 1, "attribute": "DARK"})
+        index.remove(2)
+        index.ensure_loaded(lambda: [{"id": 2, "attribute": "FIRE"}])
+        self.assertEqual(index.filter_ids({}), [2])
+
+    def test_partial_edits_keep_the_other_columns(self):
+        index = rebuilt([{"id": 1, "attribute": "DARK", "card_type": "Monster", "monster_type": "DRAGON"}])
+        index.upsert({"id": 1, "attribute": "light"})
+        counts = index.facet_counts({})
+        self.assertEqual({column: list(counts[column]) for column in FACET_COLUMNS},
+                         {"attribute": ["LIGHT"], "card_type": ["Monster"], "monster_type": ["DRAGON"]})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+######################################################################################################################
+# Project...............: Yugioh Card Library
+# Author................: Ben Stearns
+# Date..................: 12-4-25
+# Project Description...: This application creates a digital database library for storing and managing Yugioh cards
+# File Description......: tests that pages stitched from cached fragments match pages rendered from scratch while
+#                         records are written, and that fragments rendered before a write are never kept
+#                         Run from the project root with: python -m unittest discover tests
+#######################################################################################################################
+
+import unittest
+
+from utils.fragment_cache import FragmentCache
+from tests.library_changes import random_writes, apply_write
+
+
+# stands in for the library row template
+def render(row):
+    return f"<tr data-id={row['id']}>{sorted(row.items())}</tr>"
+
+
+# renders a page the way the library page does: cached rows are reused and missing ones rendered and stored
+def stitched_page(cache, rows, partition=None):
+    generation = cache.generation(partition)
+    fragments = []
+    for card_id in sorted(rows):
+        html = cache.get(card_id)
+        if html is None:
+            html = render(rows[card_id])
+            cache.put(card_id, html, generation, partition)
+        fragments.append(html)
+    return "".join(fragments)
+
+
+# renders a page without any cache
+def full_page(rows):
+    return "".join(render(rows[card_id]) for card_id in sorted(rows))
+
+
+class FragmentCacheTest(unittest.TestCase):
+    def test_pages_match_a_full_render(self):
+        for seed in range(5):
+            # a cache smaller than the library also exercises eviction
+            for max_entries in (1000, 15):
+                initial, writes = random_writes(seed, 300)
+                rows = {row["id"]: row for row in initial}
+                cache = FragmentCache(max_entries)
+                for step, write in enumerate(writes):
+                    apply_write(rows, write)
+                    cache.bump([write[1] if write[0] == "delete" else write[1]["id"]])
+                    if step % 3 == 0:
+                        self.assertEqual(stitched_page(cache, rows), full_page(rows))
+                self.assertEqual(stitched_page(cache, rows), full_page(rows))
+                self.assertLessEqual(cache.snapshot()["fragments"], max_entries)
+
+    def test_fragments_rendered_before_a_write_are_not_kept(self):
+        cache = FragmentCache(10)
+        generation = cache.generation("owner")
+        stale = render({"id": 1, "name": "Old"})
+        cache.bump([1], "owner")
+        self.assertFalse(cache.put(1, stale, generation, "owner"))
+        self.assertIsNone(cache.get(1))
+
+    def test_writes_only_hold_back_their_own_partition(self):
+        cache = FragmentCache(10)
+        generation = cache.generation("a")
+        cache.bump([2], "b")
+        self.assertTrue(cache.put(1, "<tr>", generation, "a"))
+        self.assertEqual(cache.get(1), "<tr>")
+
+    def test_writes_drop_the_fragment(self):
+        cache = FragmentCache(10)
+        cache.put(1, "<tr>", cache.generation())
+        cache.bump([1])
+        self.assertIsNone(cache.get(1))
+        self.assertEqual(cache.snapshot()["fragments"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+######################################################################################################################
+# Project...............: Yugioh Card Library
+# Author................: Ben Stearns
+# Date..................: 12-4-25
+# Project Description...: This application creates a digital database library for storing and managing Yugioh cards
+# File Description......: tests that releasing the images of edited and deleted cards leaves exactly the images the
+#                         cards still reference, like a full garbage collection would
+#                         Run from the project root with: python -m unittest discover tests
+#######################################################################################################################
+
+import os
+import tempfile
+import time
+import unittest
+
+from data_layer.fake_supabase import FakeSupabase
+from data_layer.image_store import store_bytes, release_images, collect_garbage, image_path, discard_image
+from tests.library_changes import random_writes, IMAGES
+
+
+# lists the images stored under the upload folder, as the relative filenames saved in card rows
+def stored_images(upload_folder):
+    return {os.path.relpath(os.path.join(folder, filename), upload_folder).replace(os.sep, "/")
+            for folder, _, filenames in os.walk(upload_folder) for filename in filenames}
+
+
+class ImageStoreTest(unittest.TestCase):
+    def setUp(self):
+        self._folder = tempfile.TemporaryDirectory()
+        self.upload_folder = self._folder.name
+        self.client = FakeSupabase()
+
+    def tearDown(self):
+        self._folder.cleanup()
+
+    # stores the image a random row names (the random rows pick from IMAGES, which stand for distinct uploads)
+    def store(self, row):
+        if row.get("image_filename") is None:
+            return row
+        data = f"image {IMAGES.index(row['image_filename'])}".encode()
+        return dict(row, image_filename=store_bytes(data, "png", self.upload_folder)[0])
+
+    # lists the images the cards in the database reference
+    def referenced(self):
+        rows = self.client.table("cards").select("image_filename").execute().data
+        return {row["image_filename"] for row in rows if row["image_filename"]}
+
+    def test_releases_match_a_garbage_collection(self):
+        for seed in range(5):
+            initial, writes = random_writes(seed, 200)
+            ids = {}  # random card id -> id in the database
+            for row in initial:
+                values = {key: value for key, value in self.store(row).items() if key != "id"}
+                ids[row["id"]] = self.client.table("cards").insert(values).execute().data[0]["id"]
+
+            for kind, value in writes:
+                if kind == "delete":
+                    deleted = self.client.table("cards").delete().eq("id", ids.pop(value)).execute().data
+                    release_images(self.client, [row["image_filename"] for row in deleted], self.upload_folder)
+                elif value["id"] not in ids:
+                    values = {key: item for key, item in self.store(value).items() if key != "id"}
+                    ids[value["id"]] = self.client.table("cards").insert(values).execute().data[0]["id"]
+                else:
+                    query = self.client.table("cards").select("image_filename").eq("id", ids[value["id"]])
+                    previous = query.execute().data[0]["image_filename"]
+                    changes = {key: item for key, item in self.store(value).items() if key != "id"}
+                    self.client.table("cards").update(changes).eq("id", ids[value["id"]]).execute()
+                    if "image_filename" in changes:
+                        release_images(self.client, [previous], self.upload_folder)
+                self.assertEqual(stored_images(self.upload_folder), self.referenced())
+
+            self.assertEqual(collect_garbage(self.client, self.upload_folder, grace_seconds=0), [])
+            self.client.table("cards").delete().neq("id", -1).execute()
+            collect_garbage(self.client, self.upload_folder, grace_seconds=0)
+            self.assertEqual(stored_images(self.upload_folder), set())
+
+    def test_identical_uploads_are_stored_once(self):
+        first, created = store_bytes(b"same", "PNG", self.upload_folder)
+        second, created_again = store_bytes(b"same", "png", self.upload_folder)
+        self.assertEqual(first, second)
+        self.assertEqual((created, created_again), (True, False))
+        self.assertEqual(len(stored_images(self.upload_folder)), 1)
+
+    def test_garbage_collection_spares_new_and_legacy_images(self):
+        orphan, _ = store_bytes(b"orphan", "png", self.upload_folder)
+        legacy = os.path.join(self.upload_folder, "legacy.png")
+        with open(legacy, "wb") as file:
+            file.write(b"legacy")
+        self.assertEqual(collect_garbage(self.client, self.upload_folder), [])
+
+        old = time.time() - 2 * 60 * 60
+        os.utime(image_path(orphan, self.upload_folder), (old, old))
+        self.assertEqual(collect_garbage(self.client, self.upload_folder), [orphan])
+        self.assertEqual(stored_images(self.upload_folder), {"legacy.png"})
+
+    def test_paths_never_leave_the_upload_folder(self):
+        self.assertIsNone(image_path("../main.py", self.upload_folder))
+        self.assertFalse(discard_image("../../etc/passwd", self.upload_folder))
+
+
+if __name__ == "__main__":
+    unittest.main()
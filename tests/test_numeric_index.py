@@ -0,0 +1,72 @@
+######################################################################################################################
+# Project...............: Yugioh Card Library
+# Author................: Ben Stearns
+# Date..................: 12-4-25
+# Project Description...: This application creates a digital database library for storing and managing Yugioh cards
+# File Description......: tests that the ATK/DEF index kept current by writes answers like one rebuilt from scratch
+#                         Run from the project root with: python -m unittest discover tests
+#######################################################################################################################
+
+import unittest
+
+from data_layer.numeric_index import NumericIndex, INITIAL_CAPACITY
+from tests.library_changes import random_writes, apply_write
+
+# queries covering open and closed ranges, sorts on one or both columns, top-k limits and candidate lists
+QUERIES = [
+    {},
+    {"ranges": {"attack": (1000, None)}},
+    {"ranges": {"attack": (None, 2500), "defense": (500, 3000)}},
+    {"ranges": {"defense": (1500, 1500)}},
+    {"sort": [("attack", True)]},
+    {"sort": [("attack", True)], "limit": 5},
+    {"sort": [("defense", False), ("attack", True)]},
+    {"sort": [("defense", False)], "limit": 3, "ranges": {"attack": (0, None)}},
+    {"candidates": range(1, 400, 3), "sort": [("attack", False)]},
+    {"limit": 7},
+]
+
+
+# builds an index from scratch out of the rows
+def rebuilt(rows):
+    index = NumericIndex()
+    index.ensure_loaded(lambda: list(rows))
+    return index
+
+
+class NumericIndexTest(unittest.TestCase):
+    # checks that two indexes answer every query with the same ids in the same order
+    def assert_same_answers(self, kept, expected):
+        for query in QUERIES:
+            self.assertEqual(kept.query(**query), expected.query(**query), query)
+
+    def test_writes_match_a_rebuild(self):
+        for seed in range(5):
+            initial, writes = random_writes(seed, 300)
+            rows = {row["id"]: row for row in initial}
+            kept = rebuilt(initial)
+            for write in writes:
+                apply_write(rows, write)
+                if write[0] == "delete":
+                    kept.remove(write[1])
+                else:
+                    kept.upsert(write[1])
+                self.assert_same_answers(kept, rebuilt(rows.values()))
+
+    def test_arrays_grow_past_their_capacity(self):
+        index = rebuilt([])
+        for card_id in range(1, INITIAL_CAPACITY * 3):
+            index.upsert({"id": card_id, "attack": card_id, "defense": None})
+        self.assertEqual(index.query(sort=[("attack", True)], limit=2), [INITIAL_CAPACITY * 3 - 1,
+                                                                          INITIAL_CAPACITY * 3 - 2])
+
+    def test_cards_without_a_value_never_match_and_sort_last(self):
+        index = rebuilt([{"id": 1, "attack": "?"}, {"id": 2, "attack": 1000}, {"id": 3, "attack": None},
+                         {"id": 4, "attack": 0}])
+        self.assertEqual(index.query(ranges={"attack": (None, None)}), [2, 4])
+        self.assertEqual(index.query(sort=[("attack", True)]), [2, 4, 1, 3])
+        self.assertEqual(index.query(sort=[("attack", False)]), [4, 2, 1, 3])
+
+
+if __name__ == "__main__":
+    unittest.main()
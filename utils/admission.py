@@ -0,0 +1,124 @@
+######################################################################################################################
+# Project...............: Yugioh Card Library
+# Author................: Ben Stearns
+# Date..................: 12-4-25
+# Project Description...: This application creates a digital database library for storing and managing Yugioh cards
+# File Description......: defines admission control for OCR work. Only a fixed number of scans run tesseract at once,
+#                         a short queue waits for a free slot, and anything beyond that is turned away right away with
+#                         a suggested retry time instead of slowing every scan on the machine down
+#######################################################################################################################
+
+import math                             # for rounding retry times up
+import os                               # for reading limits from environment variables
+import threading                        # for the slot semaphore and guarding the metrics
+import time                             # for measuring queue wait times
+from collections import deque           # for keeping recent wait times
+from contextlib import contextmanager   # for wrapping OCR work in a with statement
+
+# how many recent wait times are kept for the percentile metrics
+RECENT_WAITS = 200
+
+
+class AdmissionRejected(Exception):
+    # constructor for the exception raised when a scan can't be admitted
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after          # whole seconds the client should wait before trying again
+
+
+class OcrAdmission:
+    # constructor for a limiter allowing max_concurrent scans at once, with max_queue more waiting up to max_wait seconds
+    def __init__(self, max_concurrent, max_queue, max_wait):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self._slots = threading.Semaphore(max_concurrent)
+        self._lock = threading.Lock()
+        self._running = 0
+        self._waiting = 0
+        self._admitted = 0
+        self._rejected = 0
+        self._timed_out = 0
+        self._completed = 0
+        self._job_seconds = 0.0
+        self._waits = deque(maxlen=RECENT_WAITS)
+
+    ###################################################################################################################
+    # Function that estimates how long a rejected client should wait, from the average job time and the work ahead
+    # Returns: whole seconds (at least 1). callers hold the lock
+    ###################################################################################################################
+    def _retry_after(self):
+        average_job = self._job_seconds / self._completed if self._completed else 2.0
+        work_ahead = (self._running + self._waiting) / self.max_concurrent
+        return max(1, math.ceil(average_job * work_ahead))
+
+    ###################################################################################################################
+    # Function that waits for a free OCR slot and holds it for the duration of a with block
+    # Returns: a context manager
+    # Raises: AdmissionRejected if the queue is full or no slot frees up within max_wait seconds
+    ###################################################################################################################
+    @contextmanager
+    def admit(self):
+        start = time.perf_counter()
+
+        # take a free slot right away if there is one. otherwise join the queue if it has room
+        acquired = self._slots.acquire(blocking=False)
+        if not acquired:
+            with self._lock:
+                if self._waiting >= self.max_queue:
+                    self._rejected += 1
+                    raise AdmissionRejected("The scanner is busy. Please try again shortly.", self._retry_after())
+                self._waiting += 1
+            acquired = self._slots.acquire(timeout=self.max_wait)
+            with self._lock:
+                self._waiting -= 1
+                if not acquired:
+                    self._timed_out += 1
+                    self._rejected += 1
+                    raise AdmissionRejected("The scanner is busy. Please try again shortly.", self._retry_after())
+
+        waited = time.perf_counter() - start
+        with self._lock:
+            self._running += 1
+            self._admitted += 1
+            self._waits.append(waited)
+
+        job_start = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._running -= 1
+                self._completed += 1
+                self._job_seconds += time.perf_counter() - job_start
+            self._slots.release()
+
+    ###################################################################################################################
+    # Function that copies the limiter's metrics for reporting
+    # Returns: a dictionary of limits, current queue depth and wait time statistics
+    ###################################################################################################################
+    def snapshot(self):
+        with self._lock:
+            waits = sorted(self._waits)
+            return {
+                "max_concurrent": self.max_concurrent,
+                "max_queue": self.max_queue,
+                "max_wait_seconds": self.max_wait,
+                "running": self._running,
+                "queue_depth": self._waiting,
+                "admitted": self._admitted,
+                "rejected": self._rejected,
+                "timed_out": self._timed_out,
+                "avg_job_ms": round(self._job_seconds * 1000 / self._completed, 2) if self._completed else 0.0,
+                "avg_wait_ms": round(sum(waits) * 1000 / len(waits), 2) if waits else 0.0,
+                "p95_wait_ms": round(waits[int(0.95 * (len(waits) - 1))] * 1000, 2) if waits else 0.0,
+                "max_wait_ms": round(waits[-1] * 1000, 2) if waits else 0.0,
+            }
+
+
+# the limiter shared by every request of the app. the limits can be tuned with environment variables
+ocr_admission = OcrAdmission(
+    max_concurrent=int(os.getenv("OCR_MAX_CONCURRENT", max((os.cpu_count() or 2) // 2, 1))),
+    max_queue=int(os.getenv("OCR_MAX_QUEUE", 4)),
+    max_wait=float(os.getenv("OCR_MAX_WAIT", 15)),
+)
@@ -0,0 +1,92 @@
+######################################################################################################################
+# Project...............: Yugioh Card Library
+# Author................: Ben Stearns
+# Date..................: 12-4-25
+# Project Description...: This application creates a digital database library for storing and managing Yugioh cards
+# File Description......: defines helpers for building compact JSON api responses: column projection, fast JSON
+#                         serialization and gzip/brotli compression negotiated from the Accept-Encoding header
+#######################################################################################################################
+
+import gzip                                     # for gzip response compression
+import json                                     # fallback JSON serializer
+from flask import request, make_response
+
+from utils.constants import CARD_COLUMNS
+
+# orjson serializes straight to bytes and is several times faster than the json module, so use it when installed
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# brotli compresses JSON smaller than gzip, but is an optional install
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# responses smaller than this aren't worth the cpu time to compress
+MIN_COMPRESS_BYTES = 512
+
+#######################################################################################################################
+# Function that parses a comma separated fields= query parameter into a list of card columns
+# Parameters: the raw parameter value and the columns to use when nothing is requested
+# Returns: the list of columns to select
+# Raises: ValueError naming any column that isn't part of the cards table
+#######################################################################################################################
+def parse_fields(raw, default):
+    if not raw:
+        return list(default)
+
+    fields = [field.strip() for field in raw.split(",") if field.strip()]
+    unknown = [field for field in fields if field not in CARD_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown field(s): {', '.join(unknown)}")
+
+    # the id is always returned so clients can follow up with /api/cards/<id>
+    if "id" not in fields:
+        fields.insert(0, "id")
+    return fields
+
+#######################################################################################################################
+# Function that serializes data to JSON bytes
+# Parameters: the data to serialize
+# Returns: compact UTF-8 encoded JSON
+#######################################################################################################################
+def dumps(data):
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+#######################################################################################################################
+# Function that picks the best compression the client accepts
+# Returns: "br", "gzip" or None
+#######################################################################################################################
+def negotiate_encoding():
+    accepted = request.accept_encodings
+    if brotli is not None and accepted.quality("br") > 0:
+        return "br"
+    if accepted.quality("gzip") > 0:
+        return "gzip"
+    return None
+
+#######################################################################################################################
+# Function that builds a JSON response, compressed when the client supports it
+# Parameters: the data to return and the http status code
+# Returns: a Flask response
+#######################################################################################################################
+def json_response(data, status=200):
+    body = dumps(data)
+    encoding = negotiate_encoding() if len(body) >= MIN_COMPRESS_BYTES else None
+
+    if encoding == "br":
+        body = brotli.compress(body, quality=5)  # quality 5 keeps compression fast enough for every request
+    elif encoding == "gzip":
+        body = gzip.compress(body, compresslevel=6)
+
+    response = make_response(body, status)
+    response.headers["Content-Type"] = "application/json"
+    response.headers["Vary"] = "Accept-Encoding"
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    return response
@@ -20,3 +20,25 @@ COMMON_FIXES = {"0": "O","1": "I","5": "S","6": "G","8": "B","4": "A","|": "I","
 # List of known monster attributes
 KNOWN_ATTRIBUTES = ["DARK","LIGHT","DIVINE","EARTH","FIRE", "WATER","WIND"]
 
+
+# Columns of the cards table that can be requested through the JSON api
+CARD_COLUMNS = ["id", "name", "card_type", "monster_type", "description", "attack", "defense", "attribute",
+                "image_filename"]
+
+# Columns the api returns for card listings when no fields are requested. descriptions can be up to 500 characters,
+# so they are left out of listings unless asked for
+CARD_SUMMARY_COLUMNS = ["id", "name", "card_type", "monster_type", "attack", "defense", "attribute", "image_filename"]
+
+# Columns that can be changed on many cards at once. names are unique and images belong to one card, so neither is
+BULK_EDIT_COLUMNS = ["card_type", "monster_type", "attribute", "attack", "defense"]
+
+# The most cards a single bulk edit or delete can touch. the ids are sent to supabase in the request's query string
+MAX_BULK_CARDS = 500
+
+# How many similar looking cards are shown under a card, and the most the similarity search returns per request
+SIMILAR_CARDS_SHOWN = 6
+MAX_SIMILAR_CARDS = 50
+
+# How many changes the delta sync endpoint returns per page by default, and the most a client can ask for
+CHANGES_PAGE_SIZE = 500
+MAX_CHANGES_PAGE_SIZE = 5000
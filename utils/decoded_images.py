@@ -0,0 +1,84 @@
+######################################################################################################################
+# Project...............: Yugioh Card Library
+# Author................: Ben Stearns
+# Date..................: 12-4-25
+# Project Description...: This application creates a digital database library for storing and managing Yugioh cards
+# File Description......: defines a cache of decoded scan images. A scan keeps the image it decoded, so re-reading a
+#                         single field from the confirmation page crops the region from memory instead of decoding the
+#                         upload again. The least recently used images are dropped once the cache passes its size
+#######################################################################################################################
+
+import os                                   # for reading the cache size from an environment variable
+import threading                            # for guarding the cache against concurrent requests
+from collections import OrderedDict         # for evicting the least recently used images
+from PIL import Image
+
+
+class DecodedImageCache:
+    # constructor for an empty cache holding at most max_bytes of decoded pixels
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._images = OrderedDict()        # image path -> (decoded image, its size in bytes)
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+
+    ###################################################################################################################
+    # Function that returns the decoded image of a file, decoding and caching it if it isn't cached yet
+    # Parameters: the image's filepath
+    # Returns: the decoded PIL image. it is shared, so callers must not change it
+    # Raises: OSError if the file can't be read or decoded
+    ###################################################################################################################
+    def get(self, path):
+        with self._lock:
+            entry = self._images.get(path)
+            if entry is not None:
+                self._images.move_to_end(path)
+                self._hits += 1
+                return entry[0]
+            self._misses += 1
+
+        # decode outside the lock so other requests aren't held up. two requests decoding the same file both store it
+        img = Image.open(path)
+        img.load()
+        self.put(path, img)
+        return img
+
+    ###################################################################################################################
+    # Function that stores a decoded image
+    # Parameters: the image's filepath and the decoded image
+    # Returns: void
+    ###################################################################################################################
+    def put(self, path, img):
+        size = img.width * img.height * len(img.getbands())
+        with self._lock:
+            previous = self._images.pop(path, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            # an image larger than the whole cache isn't kept
+            if size > self.max_bytes:
+                return
+            self._images[path] = (img, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted) = self._images.popitem(last=False)
+                self._bytes -= evicted
+
+    ###################################################################################################################
+    # Function that copies the cache's metrics for reporting
+    # Returns: a dictionary of the cache size, hits and misses
+    ###################################################################################################################
+    def snapshot(self):
+        with self._lock:
+            return {
+                "images": len(self._images),
+                "megabytes": round(self._bytes / 2 ** 20, 2),
+                "max_megabytes": round(self.max_bytes / 2 ** 20, 2),
+                "hits": self._hits,
+                "misses": self._misses,
+            }
+
+
+# the decoded images of recent scans. DECODED_IMAGE_CACHE_MB sets its size (default 128 MB)
+decoded_images = DecodedImageCache(max_bytes=int(float(os.getenv("DECODED_IMAGE_CACHE_MB", 128)) * 2 ** 20))
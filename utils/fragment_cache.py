@@ -0,0 +1,99 @@
+######################################################################################################################
+# Project...............: Yugioh Card Library
+# Author................: Ben Stearns
+# Date..................: 12-4-25
+# Project Description...: This application creates a digital database library for storing and managing Yugioh cards
+# File Description......: defines a cache of rendered HTML fragments keyed by a record id. Writing a record drops
+#                         its fragment, so the next page render re-renders only that record's fragment and stitches
+#                         the cached fragments of every other record around it. Records can be grouped into
+#                         partitions (like the owners of card collections) so a write only holds back the renders of
+#                         its own partition
+#######################################################################################################################
+
+import os                                   # for reading the cache size from an environment variable
+import threading                            # for guarding the cache against concurrent requests
+from collections import OrderedDict         # for evicting the least recently used fragments
+
+
+class FragmentCache:
+    # constructor for an empty cache holding at most max_entries fragments
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._fragments = OrderedDict()     # key -> html
+        self._generations = {}              # partition -> generation, bumped with any write to the partition so
+                                            # renders can tell a write happened meanwhile. writes drop their records'
+                                            # fragments, so nothing is kept per record beyond the fragment itself
+        self._hits = 0
+        self._misses = 0
+
+    ###################################################################################################################
+    # Function that reads a partition's generation. read it before reading the records to render, and pass it to put()
+    # Parameters: the partition the records belong to (None when records aren't partitioned)
+    # Returns: the generation number
+    ###################################################################################################################
+    def generation(self, partition=None):
+        with self._lock:
+            return self._generations.get(partition, 0)
+
+    ###################################################################################################################
+    # Function that looks up the fragment of a record
+    # Parameters: the record's key
+    # Returns: the html, or None if it was never rendered or the record was written since
+    ###################################################################################################################
+    def get(self, key):
+        with self._lock:
+            html = self._fragments.get(key)
+            if html is None:
+                self._misses += 1
+                return None
+            self._fragments.move_to_end(key)
+            self._hits += 1
+            return html
+
+    ###################################################################################################################
+    # Function that stores a freshly rendered fragment. nothing is stored if any record of the partition was written
+    # after the caller read the generation, since the fragment may have been rendered from the record as it was
+    # before that write
+    # Parameters: the record's key, the html, the generation read before the record was read and its partition
+    # Returns: true if the fragment was stored
+    ###################################################################################################################
+    def put(self, key, html, generation, partition=None):
+        with self._lock:
+            if generation != self._generations.get(partition, 0):
+                return False
+            self._fragments[key] = html
+            self._fragments.move_to_end(key)
+            while len(self._fragments) > self.max_entries:
+                self._fragments.popitem(last=False)
+            return True
+
+    ###################################################################################################################
+    # Function that records writes to records, so their cached fragments are rendered again
+    # Parameters: the keys of the records that were inserted, updated or deleted and the partition they belong to
+    # Returns: void
+    ###################################################################################################################
+    def bump(self, keys, partition=None):
+        with self._lock:
+            for key in keys:
+                self._fragments.pop(key, None)
+            self._generations[partition] = self._generations.get(partition, 0) + 1
+
+    ###################################################################################################################
+    # Function that copies the cache's metrics for reporting
+    # Returns: a dictionary of the cache size, hits and misses
+    ###################################################################################################################
+    def snapshot(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "fragments": len(self._fragments),
+                "max_fragments": self.max_entries,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+# the rendered rows of the library table, keyed by card id (ids are unique across owners) and partitioned by owner
+library_rows = FragmentCache(max_entries=int(os.getenv("LIBRARY_ROW_CACHE_SIZE", 20000)))
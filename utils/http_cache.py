@@ -0,0 +1,52 @@
+######################################################################################################################
+# Project...............: Yugioh Card Library
+# Author................: Ben Stearns
+# Date..................: 12-4-25
+# Project Description...: This application creates a digital database library for storing and managing Yugioh cards
+# File Description......: defines helpers for answering conditional GET requests with ETag and Last-Modified headers
+#######################################################################################################################
+
+import hashlib                                  # for fingerprinting query strings
+from datetime import datetime, timezone         # for converting the library's last write time to an http date
+from flask import request, session, make_response
+
+#######################################################################################################################
+# Function that checks a request's If-None-Match header before any database or template work is done
+# Parameters: the strong ETag the page would be served with and the unix timestamp of the last library write
+# Returns: a 304 response if the browser's copy is still current. Otherwise returns None
+#######################################################################################################################
+def not_modified_response(etag, last_modified):
+    # pages render pending flash messages, so a browser copy can't be reused while one is waiting to be shown
+    if "_flashes" in session:
+        return None
+
+    # only the strong ETag is trusted. Last-Modified has one second resolution, so two writes within the same second
+    # could otherwise be mistaken for no change at all
+    if not request.if_none_match.contains(etag):
+        return None
+
+    response = make_response("", 304)
+    return add_validators(response, etag, last_modified)
+
+#######################################################################################################################
+# Function that fingerprints the current request's query parameters so filtered pages get their own ETag
+# Returns: a short hex string that is the same for the same set of parameters regardless of their order
+#######################################################################################################################
+def query_fingerprint():
+    pairs = sorted(request.args.items(multi=True))
+    if not pairs:
+        return "all"
+    return hashlib.sha1(repr(pairs).encode("utf-8")).hexdigest()[:12]
+
+#######################################################################################################################
+# Function that adds ETag, Last-Modified and Cache-Control headers to a response
+# Parameters: the response, the strong ETag, and the unix timestamp of the last library write
+# Returns: the same response for chaining
+#######################################################################################################################
+def add_validators(response, etag, last_modified):
+    response.set_etag(etag)
+    response.last_modified = datetime.fromtimestamp(last_modified, tz=timezone.utc)
+
+    # browsers may keep the page but must revalidate it on every visit, which is what turns repeat loads into 304s
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
@@ -0,0 +1,172 @@
+######################################################################################################################
+# Project...............: Yugioh Card Library
+# Author................: Ben Stearns
+# Date..................: 12-4-25
+# Project Description...: This application creates a digital database library for storing and managing Yugioh cards
+# File Description......: defines a pool of warm OCR worker processes. Decoded card bitmaps are handed to the workers
+#                         through multiprocessing.shared_memory instead of being pickled, workers preload the attribute
+#                         templates and OCR profiles when they start, and each worker is replaced after a set number
+#                         of jobs so memory growth (tesseract, PIL caches) stays capped
+#######################################################################################################################
+
+import atexit                                       # for stopping the workers when the app exits
+import multiprocessing                              # for the worker processes
+import os                                           # for reading pool settings from environment variables
+import threading                                    # for starting the pool only once
+from multiprocessing import shared_memory           # for zero-copy image handoff
+import numpy as np                                  # for viewing shared memory as an image array
+from PIL import Image
+
+from utils.pipeline_stats import pipeline_stats, timed_stage
+from utils.decoded_images import decoded_images
+from utils.ocr_scheduler import assigned_lease, current_lease
+
+# number of worker processes. 0 turns the pool off and scans run on the request thread like before
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", 0))
+
+# number of scans a worker runs before it is replaced by a fresh process
+OCR_WORKER_MAX_JOBS = int(os.getenv("OCR_WORKER_MAX_JOBS", 50))
+
+# the longest a request waits for a worker's result, in seconds
+OCR_WORKER_TIMEOUT = float(os.getenv("OCR_WORKER_TIMEOUT", 120))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+#######################################################################################################################
+# Function that runs once in every worker process as it starts, so the first scan a worker gets isn't slowed down by
+# importing the pipeline, loading the attribute templates and writing the profiles' word lists
+# Returns: void
+#######################################################################################################################
+def warm_worker():
+    import tesseract                    # imported only to load the whole OCR pipeline up front
+    from extractors.attribute_classifier import load_attribute_templates
+    from extractors.ocr_profiles import PROFILES
+
+    load_attribute_templates()
+    for profile in PROFILES.values():
+        profile.config()
+
+#######################################################################################################################
+# Function that copies a decoded image into a new shared memory block
+# Parameters: the PIL image
+# Returns: a tuple of (the shared memory block, a small picklable description of the image inside it)
+#######################################################################################################################
+def share_image(img):
+    # RGBX (4 bytes per pixel) is a mode PIL can wrap around an existing buffer, so workers never copy the full image
+    pixels = np.asarray(img.convert("RGBX"))
+    block = shared_memory.SharedMemory(create=True, size=pixels.nbytes)
+    np.ndarray(pixels.shape, dtype=np.uint8, buffer=block.buf)[:] = pixels
+    return block, {"name": block.name, "width": img.width, "height": img.height}
+
+#######################################################################################################################
+# Function that attaches to a shared memory block from a worker without taking ownership of it
+# Parameters: the name of the block
+# Returns: the attached shared memory block
+#######################################################################################################################
+def attach_block(name):
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # before Python 3.13 there's no track flag. the workers share the web app's resource tracker, which already
+        # knows the block, so attaching only re-adds a name it holds and the web app's unlink() still clears it
+        return shared_memory.SharedMemory(name=name)
+
+#######################################################################################################################
+# Function that runs in a worker: scans the card image held in shared memory
+# Parameters: the shared image description, the filename to report for the card, the name profile configuration of
+#             the collection scanned into (it holds the collection's card names, which the worker can't look up
+#             itself) and the cores the web app's scheduler gave the scan
+# Returns: a tuple of (the card dictionary, the scan's trace)
+#######################################################################################################################
+def run_shared_job(shared, filename, name_config, lease):
+    from tesseract import process_card_image
+
+    block = attach_block(shared["name"])
+    try:
+        # wrap the shared buffer as a PIL image without copying it. crops taken from it are small copies
+        img = Image.frombuffer("RGBX", (shared["width"], shared["height"]), block.buf, "raw", "RGBX", 0, 1)
+        trace = {}
+        with assigned_lease(lease):
+            card = process_card_image(img, filename, trace, name_config)
+        del img
+        return card, trace
+    finally:
+        block.close()
+
+#######################################################################################################################
+# Function that returns the shared worker pool, starting it on first use
+# Returns: the pool, or None when OCR_WORKERS is 0
+#######################################################################################################################
+def get_pool():
+    global _pool
+    if OCR_WORKERS <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            # workers are spawned rather than forked (the web app has threads running), so each one imports the web
+            # app's main module again as __mp_main__. main.py only starts its background work when it isn't that copy
+            _pool = multiprocessing.get_context("spawn").Pool(
+                processes=OCR_WORKERS,
+                initializer=warm_worker,
+                maxtasksperchild=OCR_WORKER_MAX_JOBS,
+            )
+            atexit.register(shutdown_pool)
+        return _pool
+
+#######################################################################################################################
+# Function that scans a card image in the worker pool
+# Parameters: the decoded PIL image, the filename to report for the card and the optional name profile configuration
+# Returns: a tuple of (the card dictionary, the scan's trace)
+#######################################################################################################################
+def process_in_pool(img, filename, name_config=None):
+    block, shared = share_image(img)
+    try:
+        lease = current_lease()
+        job = get_pool().apply_async(run_shared_job, (shared, filename, name_config, lease))
+        return job.get(OCR_WORKER_TIMEOUT)
+    finally:
+        # the web app created the block, so it is the one that frees it once the worker is done
+        block.close()
+        block.unlink()
+
+#######################################################################################################################
+# Function that scans a saved card image, in the worker pool when it is turned on and on the calling thread otherwise
+# Parameters: the path of the image, the optional trace dictionary and the optional name profile configuration of the
+#             collection scanned into (from name_profile_config)
+# Returns: a dictionary representing the card's information
+#######################################################################################################################
+def scan_card(image_path, trace=None, name_config=None):
+    from tesseract import process_card_image
+
+    # decode once here and keep the decoded image, so a field re-read from the confirmation page doesn't decode it
+    # again. workers get the raw pixels and never touch the file
+    with timed_stage("decode", trace):
+        img = decoded_images.get(image_path)
+
+    if OCR_WORKERS <= 0:
+        return process_card_image(img, os.path.basename(image_path), trace, name_config)
+
+    with timed_stage("worker_roundtrip", trace):
+        card, worker_trace = process_in_pool(img, os.path.basename(image_path), name_config)
+
+    # the worker's stage timings only exist in the worker process, so add them to the web app's totals
+    pipeline_stats.record_trace(worker_trace)
+    if trace is not None:
+        trace.setdefault("stages", {}).update(worker_trace.get("stages", {}))
+        trace.setdefault("skipped", []).extend(worker_trace.get("skipped", []))
+        trace.setdefault("counters", []).extend(worker_trace.get("counters", []))
+        trace.setdefault("tiers", {}).update(worker_trace.get("tiers", {}))
+    return card
+
+#######################################################################################################################
+# Function that stops the worker pool
+# Returns: void
+#######################################################################################################################
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.terminate()
+            _pool.join()
+            _pool = None
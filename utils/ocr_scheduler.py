@@ -0,0 +1,193 @@
+######################################################################################################################
+# Project...............: Yugioh Card Library
+# Author................: Ben Stearns
+# Date..................: 12-4-25
+# Project Description...: This application creates a digital database library for storing and managing Yugioh cards
+# File Description......: defines how the machine's cores are shared between OCR jobs. Tesseract is multithreaded
+#                         through OpenMP and by default every call starts a thread per core, so several scans running
+#                         at once thrash the CPU. Each job is given a share of the cores: tesseract is limited to
+#                         that many threads (OMP_THREAD_LIMIT) and, optionally, pinned to its own cores
+#######################################################################################################################
+
+import os                               # for the core count, affinity and settings
+import threading                        # for guarding the core assignments and the per-thread jobs
+from contextlib import contextmanager   # for holding cores for the duration of a with statement
+
+from utils.admission import ocr_admission
+
+# the environment variable OpenMP reads the thread limit from
+THREAD_LIMIT_VARIABLE = "OMP_THREAD_LIMIT"
+
+# the lease of the OCR job running on each thread
+_thread_jobs = threading.local()
+
+#######################################################################################################################
+# Function that lists the cores this process may run on (fewer than the machine has inside containers or under
+# taskset)
+# Returns: a sorted list of core numbers
+#######################################################################################################################
+def available_cores():
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+class CoreLease:
+    # constructor for the cores given to one OCR job: the number of tesseract threads (None leaves tesseract
+    # unlimited) and the cores to pin tesseract to (empty for no pinning)
+    def __init__(self, threads, cpus=()):
+        self.threads = threads
+        self.cpus = tuple(cpus)
+
+    ###################################################################################################################
+    # Function that builds the environment tesseract runs with under this lease
+    # Parameters: the environment to start from
+    # Returns: a copy of the environment with the thread limit set (or removed for unlimited leases)
+    ###################################################################################################################
+    def environment(self, base):
+        env = dict(base)
+        if self.threads:
+            env[THREAD_LIMIT_VARIABLE] = str(self.threads)
+        else:
+            env.pop(THREAD_LIMIT_VARIABLE, None)
+        return env
+
+    ###################################################################################################################
+    # Function that pins a started tesseract process to the lease's cores. tesseract starts its OpenMP threads after
+    # loading its models, so the threads inherit the pinning
+    # Parameters: the process id
+    # Returns: void
+    ###################################################################################################################
+    def pin(self, pid):
+        if not self.cpus or not hasattr(os, "sched_setaffinity"):
+            return
+        try:
+            os.sched_setaffinity(pid, self.cpus)
+        except OSError:
+            pass  # the process already exited
+
+    def __repr__(self):
+        return f"CoreLease(threads={self.threads}, cpus={self.cpus})"
+
+
+#######################################################################################################################
+# Function that runs the calling thread's tesseract calls under a lease, for the duration of a with block. Used by
+# OcrScheduler.job() and for leases handed over from another process (the OCR workers get the lease of the request
+# they scan for)
+# Parameters: the CoreLease, or None to leave tesseract's defaults
+# Returns: a context manager
+#######################################################################################################################
+@contextmanager
+def assigned_lease(lease):
+    previous = getattr(_thread_jobs, "lease", None)
+    _thread_jobs.lease = lease
+    try:
+        yield lease
+    finally:
+        _thread_jobs.lease = previous
+
+#######################################################################################################################
+# Function that looks up the lease of the OCR job running on the calling thread
+# Returns: the CoreLease, or None outside a job
+#######################################################################################################################
+def current_lease():
+    return getattr(_thread_jobs, "lease", None)
+
+
+class OcrScheduler:
+    # constructor for a scheduler sharing cores between up to max_jobs OCR jobs at once. threads_per_job fixes the
+    # number of tesseract threads per job instead of dividing the cores between the jobs, and pin gives every job
+    # its own cores
+    def __init__(self, cores, max_jobs, threads_per_job=None, pin=False):
+        self.cores = list(cores)
+        self.max_jobs = max(1, max_jobs)
+        self.fixed_threads = threads_per_job
+        self.threads_per_job = threads_per_job or max(1, len(self.cores) // self.max_jobs)
+        self.pin = pin
+        self._lock = threading.Lock()
+        self._busy = set()                      # cores pinned to a running job
+        self._running = 0
+        self._jobs = 0
+        self._unpinned = 0                      # pinned jobs that found no free cores and ran unpinned
+
+    ###################################################################################################################
+    # Function that decides how to run a batch of OCR jobs, like the cards of a scanned sheet: as many at once as
+    # there are job slots, with the cores divided between them (a small batch gets more threads per job)
+    # Parameters: the number of jobs in the batch
+    # Returns: a tuple of (how many jobs to run at once, tesseract threads per job)
+    ###################################################################################################################
+    def plan(self, jobs):
+        concurrent = max(1, min(jobs, self.max_jobs, len(self.cores)))
+        return concurrent, self.fixed_threads or max(1, len(self.cores) // concurrent)
+
+    ###################################################################################################################
+    # Function that gives the calling thread's OCR job its share of the cores for the duration of a with block.
+    # Every tesseract call made on the thread meanwhile runs under the lease
+    # Parameters: the number of tesseract threads, or None for the scheduler's default share
+    # Returns: a context manager yielding the CoreLease
+    ###################################################################################################################
+    @contextmanager
+    def job(self, threads=None):
+        threads = min(threads or self.threads_per_job, len(self.cores))
+        cpus = ()
+        with self._lock:
+            if self.pin:
+                free = [core for core in self.cores if core not in self._busy]
+                if len(free) >= threads:
+                    cpus = tuple(free[:threads])
+                    self._busy.update(cpus)
+                else:
+                    self._unpinned += 1
+            self._running += 1
+            self._jobs += 1
+
+        lease = CoreLease(threads, cpus)
+        with assigned_lease(lease):
+            try:
+                yield lease
+            finally:
+                with self._lock:
+                    self._busy.difference_update(cpus)
+                    self._running -= 1
+
+    ###################################################################################################################
+    # Function that copies the scheduler's settings and metrics for reporting
+    # Returns: a dictionary of the cores, the per-job share and the running jobs
+    ###################################################################################################################
+    def snapshot(self):
+        with self._lock:
+            return {
+                "cores": len(self.cores),
+                "max_jobs": self.max_jobs,
+                "threads_per_job": self.threads_per_job,
+                "pinned": self.pin,
+                "running": self._running,
+                "busy_cores": len(self._busy),
+                "jobs": self._jobs,
+                "unpinned_jobs": self._unpinned,
+            }
+
+
+# the scheduler shared by every request of the app. by default the cores are divided evenly between the scans OCR
+# admission lets run at once. OCR_THREADS_PER_JOB fixes the share, and OCR_PIN_CPUS=1 pins each scan to its own cores
+ocr_scheduler = OcrScheduler(
+    available_cores(),
+    max_jobs=ocr_admission.max_concurrent,
+    threads_per_job=int(os.getenv("OCR_THREADS_PER_JOB", 0)) or None,
+    pin=os.getenv("OCR_PIN_CPUS", "").lower() in ("1", "true", "yes"),
+)
+
+# the lease of tesseract calls made outside a job, like the field re-reads of the confirmation page
+_default_lease = CoreLease(ocr_scheduler.threads_per_job)
+
+#######################################################################################################################
+# Function that picks the lease a tesseract call runs under: the calling thread's job, or the default share of the
+# cores outside a job. the thread limit only goes into tesseract's own environment, never the app's, and a limit set
+# for the whole app with OMP_THREAD_LIMIT is left alone outside jobs
+# Returns: the CoreLease, or None to run tesseract with the app's environment
+#######################################################################################################################
+def tesseract_lease():
+    lease = current_lease()
+    if lease is None and THREAD_LIMIT_VARIABLE not in os.environ:
+        return _default_lease
+    return lease
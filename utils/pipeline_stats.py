@@ -0,0 +1,125 @@
+######################################################################################################################
+# Project...............: Yugioh Card Library
+# Author................: Ben Stearns
+# Date..................: 12-4-25
+# Project Description...: This application creates a digital database library for storing and managing Yugioh cards
+# File Description......: defines instrumentation for the OCR pipeline: how long each stage takes, how often it runs
+#                         and how often it is skipped, both for a single scan and in total since the app started
+#######################################################################################################################
+
+import threading                        # for guarding the totals against concurrent scans
+import time                             # for timing stages
+from contextlib import contextmanager   # for timing a block of code with a with statement
+
+
+class PipelineStats:
+    # constructor for empty totals
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages = {}                   # stage name -> {"runs", "skipped", "seconds"}
+        self._counters = {}                 # counter name -> count (for events that aren't timed stages)
+
+    # returns the totals of a stage, creating them the first time. callers hold the lock
+    def _stage(self, name):
+        return self._stages.setdefault(name, {"runs": 0, "skipped": 0, "seconds": 0.0})
+
+    ###################################################################################################################
+    # Function that records one run of a stage
+    # Parameters: the stage name and how long it took in seconds
+    # Returns: void
+    ###################################################################################################################
+    def record_run(self, name, seconds):
+        with self._lock:
+            stage = self._stage(name)
+            stage["runs"] += 1
+            stage["seconds"] += seconds
+
+    ###################################################################################################################
+    # Function that records a stage that didn't need to run
+    # Parameters: the stage name
+    # Returns: void
+    ###################################################################################################################
+    def record_skip(self, name):
+        with self._lock:
+            self._stage(name)["skipped"] += 1
+
+    ###################################################################################################################
+    # Function that adds a scan's trace to the totals. used for scans run in worker processes, whose own totals
+    # aren't visible to the web app
+    # Parameters: the trace dictionary filled by timed_stage(), skip_stage() and count_event()
+    # Returns: void
+    ###################################################################################################################
+    def record_trace(self, trace):
+        for name, milliseconds in trace.get("stages", {}).items():
+            self.record_run(name, milliseconds / 1000)
+        for name in trace.get("skipped", []):
+            self.record_skip(name)
+        for name in trace.get("counters", []):
+            self.increment(name)
+
+    ###################################################################################################################
+    # Function that adds to a named counter
+    # Parameters: the counter name and how much to add
+    # Returns: void
+    ###################################################################################################################
+    def increment(self, name, amount=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    ###################################################################################################################
+    # Function that copies the totals for reporting
+    # Returns: a dictionary with every stage's runs, skips, total and average milliseconds, plus the counters
+    ###################################################################################################################
+    def snapshot(self):
+        with self._lock:
+            stages = {
+                name: {
+                    "runs": stage["runs"],
+                    "skipped": stage["skipped"],
+                    "total_ms": round(stage["seconds"] * 1000, 2),
+                    "avg_ms": round(stage["seconds"] * 1000 / stage["runs"], 2) if stage["runs"] else 0.0,
+                }
+                for name, stage in sorted(self._stages.items())
+            }
+            return {"stages": stages, "counters": dict(sorted(self._counters.items()))}
+
+
+#######################################################################################################################
+# Function that times a stage of a single scan and adds it to the totals
+# Parameters: the stage name and the scan's trace dictionary (or None if the caller doesn't want per-scan details)
+# Returns: a context manager wrapping the stage's code
+#######################################################################################################################
+@contextmanager
+def timed_stage(name, trace=None):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        pipeline_stats.record_run(name, seconds)
+        if trace is not None:
+            trace.setdefault("stages", {})[name] = round(seconds * 1000, 2)
+
+#######################################################################################################################
+# Function that records a stage a single scan skipped
+# Parameters: the stage name and the scan's trace dictionary (or None)
+# Returns: void
+#######################################################################################################################
+def skip_stage(name, trace=None):
+    pipeline_stats.record_skip(name)
+    if trace is not None:
+        trace.setdefault("skipped", []).append(name)
+
+#######################################################################################################################
+# Function that counts an event of a single scan (like which OCR tier read a field)
+# Parameters: the counter name and the scan's trace dictionary (or None)
+# Returns: void
+#######################################################################################################################
+def count_event(name, trace=None):
+    pipeline_stats.increment(name)
+    if trace is not None:
+        trace.setdefault("counters", []).append(name)
+
+
+# the totals shared by every scan of the app
+pipeline_stats = PipelineStats()
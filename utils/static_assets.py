@@ -0,0 +1,225 @@
+######################################################################################################################
+# Project...............: Yugioh Card Library
+# Author................: Ben Stearns
+# Date..................: 12-4-25
+# Project Description...: This application creates a digital database library for storing and managing Yugioh cards
+# File Description......: defines the build step and lookups for the app's stylesheets and scripts. The build copies
+#                         every .css/.js file of the static folder to static/dist under a name holding a hash of its
+#                         contents (bootstrap.min.css -> bootstrap.min.<hash>.css), next to gzip and brotli
+#                         compressed copies, and records the names in a manifest. Since a file's name changes whenever
+#                         its contents do, browsers can cache it for a year without asking whether it changed
+#######################################################################################################################
+
+import gzip                                     # for the gzip compressed copies
+import hashlib                                  # for the content hashes in the file names
+import json                                     # for reading and writing the manifest
+import os                                       # for walking the static folder and writing files
+import sys                                      # for the command line arguments
+import threading                                # for guarding the manifest against concurrent requests
+from flask import url_for
+
+# brotli compresses css and js smaller than gzip, but is an optional install
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# the folder Flask serves static files from, and the folder the build writes to inside it
+STATIC_FOLDER = "static"
+DIST_FOLDER = os.path.join(STATIC_FOLDER, "dist")
+MANIFEST_FILE = os.path.join(DIST_FOLDER, "manifest.json")
+
+# the file types that are built, and the folders of the static folder that are skipped (uploaded card images are
+# already stored under their content hash)
+ASSET_EXTENSIONS = (".css", ".js")
+SKIPPED_FOLDERS = ("dist", "images")
+
+# how many hex digits of the content hash go in a file name
+HASH_LENGTH = 12
+
+# files smaller than this aren't worth compressing
+MIN_COMPRESS_BYTES = 512
+
+# the compressed copies, in the order they are preferred when the browser accepts several
+ENCODINGS = {"br": ".br", "gzip": ".gz"}
+
+#######################################################################################################################
+# Function that writes a file so readers never see it half written (several app processes may build at once)
+# Parameters: the file path and the bytes to write
+# Returns: void
+#######################################################################################################################
+def write_atomically(path, data):
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "wb") as file:
+        file.write(data)
+    os.replace(temporary, path)
+
+#######################################################################################################################
+# Function that lists the files of the static folder the build covers
+# Parameters: the static folder
+# Returns: a sorted list of the files' paths relative to the static folder, with forward slashes
+#######################################################################################################################
+def source_assets(static_folder=STATIC_FOLDER):
+    sources = []
+    for folder, folders, filenames in os.walk(static_folder):
+        if folder == static_folder:
+            folders[:] = [name for name in folders if name not in SKIPPED_FOLDERS]
+        for filename in filenames:
+            if filename.endswith(ASSET_EXTENSIONS):
+                relative = os.path.relpath(os.path.join(folder, filename), static_folder)
+                sources.append(relative.replace(os.sep, "/"))
+    return sorted(sources)
+
+#######################################################################################################################
+# Function that builds the fingerprinted name of an asset
+# Parameters: the asset's path relative to the static folder and its contents
+# Returns: the path with the content hash inserted before the extension
+#######################################################################################################################
+def fingerprinted_name(relative, data):
+    stem, extension = os.path.splitext(relative)
+    return f"{stem}.{hashlib.sha256(data).hexdigest()[:HASH_LENGTH]}{extension}"
+
+#######################################################################################################################
+# Function that builds every asset: its fingerprinted copy, compressed copies and the manifest listing them. files
+# are never removed here since pages rendered by other app processes may still link to older builds
+# Parameters: the static folder and the folder to write to
+# Returns: the manifest as a dictionary of asset path -> {"file": fingerprinted path, "encodings": [...]}
+#######################################################################################################################
+def build_assets(static_folder=STATIC_FOLDER, dist_folder=DIST_FOLDER):
+    manifest = {}
+    for relative in source_assets(static_folder):
+        with open(os.path.join(static_folder, relative), "rb") as file:
+            data = file.read()
+        built = fingerprinted_name(relative, data)
+        path = os.path.join(dist_folder, built)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # the name changes with the contents, so a file that already exists is already correct
+        if not os.path.exists(path):
+            write_atomically(path, data)
+
+        # only keep compressed copies that are actually smaller. mtime=0 makes rebuilds byte for byte identical
+        encodings = []
+        if len(data) >= MIN_COMPRESS_BYTES:
+            variants = {"gzip": lambda: gzip.compress(data, compresslevel=9, mtime=0)}
+            if brotli is not None:
+                variants["br"] = lambda: brotli.compress(data, quality=11)
+            for encoding, compress in variants.items():
+                compressed_path = path + ENCODINGS[encoding]
+                if not os.path.exists(compressed_path):
+                    compressed = compress()
+                    if len(compressed) >= len(data):
+                        continue
+                    write_atomically(compressed_path, compressed)
+                encodings.append(encoding)
+
+        manifest[relative] = {"file": built, "encodings": sorted(encodings, key=list(ENCODINGS).index)}
+
+    os.makedirs(dist_folder, exist_ok=True)
+    write_atomically(os.path.join(dist_folder, "manifest.json"), json.dumps(manifest, indent=2).encode("utf-8"))
+    return manifest
+
+#######################################################################################################################
+# Function that removes built files the manifest no longer lists
+# Parameters: the manifest and the folder the build writes to
+# Returns: a list of the removed paths relative to the dist folder
+#######################################################################################################################
+def prune_assets(manifest, dist_folder=DIST_FOLDER):
+    keep = {"manifest.json"}
+    for entry in manifest.values():
+        keep.add(entry["file"])
+        keep.update(entry["file"] + ENCODINGS[encoding] for encoding in entry["encodings"])
+
+    removed = []
+    for folder, _, filenames in os.walk(dist_folder):
+        for filename in filenames:
+            relative = os.path.relpath(os.path.join(folder, filename), dist_folder).replace(os.sep, "/")
+            if relative not in keep:
+                os.remove(os.path.join(folder, filename))
+                removed.append(relative)
+    return removed
+
+
+class StaticAssets:
+    # constructor for the lookups of a static folder's built assets. the manifest is read by load()
+    def __init__(self, static_folder=STATIC_FOLDER, dist_folder=DIST_FOLDER):
+        self.static_folder = static_folder
+        self.dist_folder = dist_folder
+        self._lock = threading.Lock()
+        self._by_source = {}                    # asset path -> fingerprinted path
+        self._built = {}                        # fingerprinted path -> available encodings
+
+    ###################################################################################################################
+    # Function that checks whether any asset changed since the last build
+    # Returns: true if there is no manifest or an asset is newer than it
+    ###################################################################################################################
+    def is_stale(self):
+        manifest_path = os.path.join(self.dist_folder, "manifest.json")
+        if not os.path.exists(manifest_path):
+            return True
+        built_at = os.path.getmtime(manifest_path)
+        return any(os.path.getmtime(os.path.join(self.static_folder, relative)) > built_at
+                   for relative in source_assets(self.static_folder))
+
+    ###################################################################################################################
+    # Function that builds the assets if they changed since the last build, then reads the manifest. a build that
+    # fails leaves the assets served unfingerprinted from the static folder rather than stopping the app
+    # Returns: void
+    ###################################################################################################################
+    def ensure_built(self):
+        try:
+            manifest = build_assets(self.static_folder, self.dist_folder) if self.is_stale() else self._read_manifest()
+        except (OSError, ValueError) as e:
+            print(f"ASSET BUILD ERROR: {e}")
+            manifest = {}
+        with self._lock:
+            self._by_source = {relative: entry["file"] for relative, entry in manifest.items()}
+            self._built = {entry["file"]: tuple(entry["encodings"]) for entry in manifest.values()}
+
+    # reads the manifest written by the last build
+    def _read_manifest(self):
+        with open(os.path.join(self.dist_folder, "manifest.json"), encoding="utf-8") as file:
+            return json.load(file)
+
+    ###################################################################################################################
+    # Function that builds the url of a static file, taking the same arguments as Flask's url_for. built assets get
+    # their fingerprinted url, and every other endpoint or file is passed to url_for unchanged
+    # Parameters: the endpoint and its values (filename for the static endpoint)
+    # Returns: the url
+    ###################################################################################################################
+    def url_for(self, endpoint, **values):
+        if endpoint == "static":
+            with self._lock:
+                built = self._by_source.get(values.get("filename"))
+            if built is not None:
+                return url_for("serve_asset", **dict(values, filename=built))
+        return url_for(endpoint, **values)
+
+    ###################################################################################################################
+    # Function that finds how a fingerprinted file can be served
+    # Parameters: the fingerprinted path
+    # Returns: a tuple of the compressed copies available (most preferred first), or None if it isn't a built file
+    ###################################################################################################################
+    def encodings(self, built):
+        with self._lock:
+            return self._built.get(built)
+
+    # returns the number of built assets
+    def __len__(self):
+        with self._lock:
+            return len(self._built)
+
+
+# the assets of the app's static folder
+static_assets = StaticAssets()
+
+
+# if the script is run directly, build the assets and remove the files of older builds
+if __name__ == "__main__":
+    static_folder = sys.argv[1] if len(sys.argv) > 1 else STATIC_FOLDER
+    dist_folder = os.path.join(static_folder, "dist")
+    built_manifest = build_assets(static_folder, dist_folder)
+    for source, entry in built_manifest.items():
+        print(f"{source} -> {entry['file']} ({', '.join(entry['encodings']) or 'uncompressed'})")
+    for removed_file in prune_assets(built_manifest, dist_folder):
+        print(f"removed {removed_file}")